@@ -10,13 +10,15 @@ Created on Fri Dec  4 11:58:52 2015
 #import OCC.Core.Bnd
 from OCC.Core.Bnd import Bnd_B2d, Bnd_Box
 from OCC.Core.AIS import AIS_WireFrame, AIS_Shape
-from OCC.Core.Geom import Geom_BezierCurve
+from OCC.Core.Geom import (Geom_BezierCurve, Geom_BSplineCurve,
+                          Geom_BSplineSurface, Geom_Plane)
 from OCC.Core.GeomAPI import (GeomAPI_PointsToBSpline, GeomAPI_IntCS,
                               GeomAPI_Interpolate)
-from OCC.Core.BRepBndLib import brepbndlib_Add
+from OCC.Core.BRepBndLib import brepbndlib_Add, brepbndlib_AddOptimal
 from OCC.Core.TColgp import (TColgp_Array1OfPnt, TColgp_HArray1OfPnt,
-                             TColgp_Array1OfVec)
-from OCC.Core.TColStd import TColStd_HArray1OfBoolean
+                             TColgp_Array1OfVec, TColgp_Array2OfPnt)
+from OCC.Core.TColStd import (TColStd_HArray1OfBoolean, TColStd_Array1OfReal,
+                               TColStd_Array1OfInteger)
 from OCC.Core.BRepOffsetAPI import (BRepOffsetAPI_ThruSections,
                                     BRepOffsetAPI_MakePipeShell)
 from OCC.Core.BRepBuilderAPI import (BRepBuilderAPI_MakeWire,
@@ -24,16 +26,22 @@ from OCC.Core.BRepBuilderAPI import (BRepBuilderAPI_MakeWire,
                                      BRepBuilderAPI_Transform,
                                      BRepBuilderAPI_MakeFace,
                                      BRepBuilderAPI_GTransform,
-                                     BRepBuilderAPI_MakeVertex)
+                                     BRepBuilderAPI_MakeVertex,
+                                     BRepBuilderAPI_Sewing)
 from OCC.Core.BRepPrimAPI import (BRepPrimAPI_MakeBox, BRepPrimAPI_MakeCone,
                                   BRepPrimAPI_MakeHalfSpace,
                                   BRepPrimAPI_MakeSphere)
 from OCC.Core.BRepAlgoAPI import BRepAlgoAPI_Section, BRepAlgoAPI_Cut
-from OCC.Core.gp import (gp_Trsf, gp_Ax2, gp_Pnt, gp_Dir, gp_Vec, gp_Pln,
-                         gp_GTrsf, gp_Mat, gp_XYZ)
-from OCC.Core.GeomAbs import GeomAbs_C2
-from OCC.Core.TopoDS import TopoDS_Shape, topods_Vertex, topods_Face, topods_Edge
-from OCC.Core.TopAbs import TopAbs_EDGE, TopAbs_FACE, TopAbs_VERTEX
+from OCC.Core.gp import (gp_Trsf, gp_Ax2, gp_Ax3, gp_Pnt, gp_Dir, gp_Vec,
+                         gp_Pln, gp_GTrsf, gp_Mat, gp_XYZ)
+from OCC.Core.GeomAbs import (GeomAbs_C0, GeomAbs_G1, GeomAbs_C1, GeomAbs_G2,
+                              GeomAbs_C2, GeomAbs_C3)
+from OCC.Core.TopoDS import (TopoDS_Shape, TopoDS_Shell, TopoDS_Compound,
+                             topods_Vertex, topods_Face, topods_Edge,
+                             topods_Wire)
+from OCC.Core.BRep import BRep_Builder
+from OCC.Core.TopAbs import (TopAbs_EDGE, TopAbs_FACE, TopAbs_VERTEX,
+                             TopAbs_WIRE)
 from OCC.Core.TopExp import TopExp_Explorer
 from OCC.Core.GC import GC_MakeCircle, GC_MakeSegment
 from OCC.Core.Approx import Approx_ChordLength
@@ -42,7 +50,7 @@ from OCC.Core.GeomAdaptor import GeomAdaptor_Curve, GeomAdaptor_HCurve
 from OCC.Core.GeomPlate import (GeomPlate_CurveConstraint,
                                 GeomPlate_BuildPlateSurface,
                                 GeomPlate_MakeApprox)
-from OCC.Core.BRepAdaptor import BRepAdaptor_Curve
+from OCC.Core.BRepAdaptor import BRepAdaptor_Curve, BRepAdaptor_CompCurve
 from OCC.Core.BRepFeat import BRepFeat_SplitShape
 from OCC.Core.TopTools import TopTools_ListIteratorOfListOfShape
 from OCC.Core.BRepProj import BRepProj_Projection
@@ -65,8 +73,14 @@ from OCCUtils.Construct import make_edge, make_face, make_pipe, make_wire
 
 # Standard Python libraries
 #from six.moves import range
+import threading
+import weakref
+from collections import OrderedDict, namedtuple
 import numpy as np
 
+from . import bspline
+from . import profiling
+
 
 def coerce_handle(obj):
     '''
@@ -124,7 +138,153 @@ class assert_isdone(object):
 #    return None
 
 
-def ObjectsExtents(breps, tol=1e-6, as_vec=False):
+CacheInfo = namedtuple('CacheInfo',
+                       ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+
+
+# Bounding box algorithms accepted by ObjectsExtents
+BBOX_MODES = ('triangulation', 'fast', 'optimal')
+
+
+class BoundingBoxCache(object):
+    """Bounded, process-wide LRU cache of the bounding box extents of shapes.
+
+    Entries are keyed on the shape hash, the bounding box mode and the gap
+    tolerance. Shapes are compared with IsEqual (same underlying TShape,
+    location and orientation) on lookup, so a hash collision is a miss, and
+    a transformed copy of a shape is a new entry.
+
+    Only a weak reference to each shape is kept, so that the cache does not
+    keep shapes (and their geometry) alive: the entry of a shape which has
+    been garbage collected is a miss, and is discarded. Parts cache their
+    extents per modification instead (see AirconicsShape.Extents).
+
+    Parameters
+    ----------
+    maxsize : int (default 1024)
+        Maximum number of boxes to store. Least recently used entries are
+        evicted once this is exceeded
+
+    Attributes
+    ----------
+    hits, misses, evictions : int
+        Cache counters since creation (or the last call to clear)
+    """
+    def __init__(self, maxsize=1024):
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, newmaxsize):
+        with self._lock:
+            self._maxsize = newmaxsize
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, shape, mode, tol):
+        """Returns the extents (xmin, ymin, zmin, xmax, ymax, zmax) stored
+        for shape, or None"""
+        key = (hash(shape), mode, tol)
+        with self._lock:
+            entry = self._entries.get(key)
+            cached_shape = entry[0]() if entry is not None else None
+            if cached_shape is None or not cached_shape.IsEqual(shape):
+                if entry is not None and cached_shape is None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return entry[1]
+
+    def put(self, shape, mode, tol, extents):
+        if self._maxsize <= 0:
+            return
+        try:
+            ref = weakref.ref(shape)
+        except TypeError:
+            return
+        key = (hash(shape), mode, tol)
+        with self._lock:
+            self._entries[key] = (ref, extents)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def info(self):
+        """Returns a CacheInfo(hits, misses, evictions, maxsize, currsize)
+        named tuple"""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions,
+                             self._maxsize, len(self._entries))
+
+    def clear(self):
+        """Empties the cache and resets the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+# The cache used by ObjectsExtents
+BBOX_CACHE = BoundingBoxCache()
+
+
+def ShapeExtents(shape, tol=1e-6, mode='triangulation'):
+    """Computes the bounding box extents of a single shape (uncached)
+
+    Parameters
+    ----------
+    shape : TopoDS_Shape
+
+    tol : float (default=1e-6)
+        Gap added to the box on all sides
+
+    mode : string (default 'triangulation')
+        'triangulation': uses the triangulation of the shape where it exists
+            (otherwise its geometry)
+        'fast': uses the geometry, including the control points of NURBS:
+            cheapest, but the box may be larger than the shape
+        'optimal': the tightest box, from the exact geometry: slowest
+
+    Returns
+    -------
+    extents : tuple of float
+        (xmin, ymin, zmin, xmax, ymax, zmax), or None for an empty shape
+    """
+    bbox = Bnd_Box()
+    bbox.SetGap(tol)
+    if mode == 'triangulation':
+        brepbndlib_Add(shape, bbox, True)
+    elif mode == 'fast':
+        brepbndlib_Add(shape, bbox, False)
+    elif mode == 'optimal':
+        brepbndlib_AddOptimal(shape, bbox, False, False)
+        # AddOptimal does not apply the gap:
+        bbox.Enlarge(tol)
+    else:
+        raise ValueError("Unknown bounding box mode {}: expected any of {}"
+                         .format(mode, BBOX_MODES))
+    if bbox.IsVoid():
+        return None
+    return bbox.Get()
+
+
+@profiling.timed()
+def ObjectsExtents(breps, tol=1e-6, as_vec=False, mode='triangulation',
+                   use_cache=True):
     """Compute the extents in the X, Y and Z direction (in the current
     coordinate system) of the objects listed in the argument.
 
@@ -139,6 +299,13 @@ def ObjectsExtents(breps, tol=1e-6, as_vec=False):
     as_vec : bool (default=False)
         If true, returns minimum and maximum points as tuple of gp_Vec
 
+    mode : string (default 'triangulation')
+        The bounding box algorithm: 'triangulation', 'fast' or 'optimal' (see
+        ShapeExtents)
+
+    use_cache : bool (default=True)
+        Reuse the box of each shape from BBOX_CACHE if it was computed before
+
     Returns
     -------
     xmin, ymin, zmin, xmax, ymax, zmax : scalar
@@ -149,20 +316,30 @@ def ObjectsExtents(breps, tol=1e-6, as_vec=False):
 
     Notes
     -----
-    Due to the underlying OCC.Bnd.Bnd_Box functions, the bounding box is 
-    calculated via triangulation of the shapes to avoid inclusion of the 
-    control points of NURBS curves in bounding box calculation
+    By default, the bounding box is calculated from the triangulation of the
+    shapes (where it exists) to avoid inclusion of the control points of
+    NURBS curves in bounding box calculation. Use mode='optimal' for the
+    tightest box, or mode='fast' for a cheap, conservative one.
+
+    Boxes are cached per shape, so that repeated calls on unchanged shapes
+    (e.g. CutSect at many span stations) cost a dictionary lookup each.
     """
+    if mode not in BBOX_MODES:
+        raise ValueError("Unknown bounding box mode {}: expected any of {}"
+                         .format(mode, BBOX_MODES))
+    if isinstance(breps, TopoDS_Shape):
+        breps = [breps]
 
     bbox = Bnd_Box()
-    bbox.SetGap(tol)
-
-    try:
-        for shape in breps:
-            brepbndlib_Add(shape, bbox, True)
-    except TypeError:
-        # Assume not iterable:
-        brepbndlib_Add(breps, bbox, True)
+    for shape in breps:
+        extents = BBOX_CACHE.get(shape, mode, tol) if use_cache else None
+        if extents is None:
+            extents = ShapeExtents(shape, tol, mode)
+            if extents is None:
+                continue
+            if use_cache:
+                BBOX_CACHE.put(shape, mode, tol, extents)
+        bbox.Update(*extents)
 
     xmin, ymin, zmin, xmax, ymax, zmax = bbox.Get()
     if as_vec is False:
@@ -187,7 +364,8 @@ def point_array_to_TColgp_PntArrayType(array, _type=TColgp_Array1OfPnt):
     Parameters
     ----------
     array : array (Npts x 3) or list
-        Array of xyz points for which to fit a bspline
+        Array of xyz points for which to fit a bspline, or a sequence of
+        OCC.gp.gp_Pnt
 
     _type : type of TColgp array
         Tested inputs are,
@@ -205,27 +383,92 @@ def point_array_to_TColgp_PntArrayType(array, _type=TColgp_Array1OfPnt):
     USe TColgp_Harray when interpolating a curve from points with the
     GeomAPI_Interpolate. Use TColgp_Array when interpolating a curve
     from points with the GeomAPI_PointsToBspline
+
+    Numeric input is converted to nested Python floats in one pass
+    (ndarray.tolist) rather than row by row. A (3 x Npts) array is also
+    accepted (if Npts != 3), and is transposed. A (3 x 3) array is always
+    read as one point per row: earlier versions transposed it like a
+    (3 x Npts) array, so column-major arrays of three points must now be
+    transposed by the caller.
     """
-    try:
-        dims = np.shape(array)
-        # Attempt to tranpose if x, y, z points span columns (should span rows)
-        if dims[0] == 3:
-            array = array.T
-        elif dims[1] != 3:
-            raise ValueError("Array must have dimension Npnts x 3 (x, y, z)")
-        N = np.shape(array)[0]
-        pt_arr = _type(1, N)
-        for i, pt in enumerate(array):
-            pt_arr.SetValue(i + 1, gp_Pnt(*pt.tolist()))
-    except:
-        # Input pnts are likely to be a list of gp_Pnt:
-        N = len(array)
+    N = len(array)
+    if N > 0 and isinstance(array[0], gp_Pnt):
         pt_arr = _type(1, N)
-        for i, pt in enumerate(array):
-            pt_arr.SetValue(i + 1, pt)
+        for i, pt in enumerate(array, 1):
+            pt_arr.SetValue(i, pt)
+        return pt_arr
+
+    array = np.asarray(array, dtype=float)
+    if array.ndim != 2:
+        raise ValueError("Array must have dimension Npnts x 3 (x, y, z)")
+    if array.shape[1] != 3:
+        if array.shape[0] != 3:
+            raise ValueError("Array must have dimension Npnts x 3 (x, y, z)")
+        # x, y, z points span columns (should span rows)
+        array = array.T
+
+    N = array.shape[0]
+    pt_arr = _type(1, N)
+    SetValue = pt_arr.SetValue
+    for i, (x, y, z) in enumerate(array.tolist(), 1):
+        SetValue(i, gp_Pnt(x, y, z))
     return pt_arr
 
 
+def TColgp_PntArrayType_to_point_array(pt_arr):
+    """Returns the points of a TColgp_Array1OfPnt (or TColgp_HArray1OfPnt) as
+    an (Npts x 3) numpy array
+
+    Parameters
+    ----------
+    pt_arr : TColgp_Array1OfPnt or TColgp_HArray1OfPnt
+
+    Returns
+    -------
+    array : array of float, shape (Npts, 3)
+    """
+    Value = pt_arr.Value
+    return np.array([Value(i).Coord()
+                     for i in range(pt_arr.Lower(), pt_arr.Upper() + 1)],
+                    dtype=float).reshape(-1, 3)
+
+
+def bspline_to_arrays(crv):
+    """Reads the definition of an OCC B-spline curve into numpy arrays: the
+    inverse of bspline_from_arrays
+
+    Parameters
+    ----------
+    crv : OCC.Geom.Geom_BSplineCurve
+        A non-periodic curve
+
+    Returns
+    -------
+    poles : array of float, shape (Npoles, 3)
+
+    knots : array of float
+        The full knot vector (knots repeated according to multiplicity)
+
+    degree : int
+
+    weights : array of float, shape (Npoles,), or None
+        None if the curve is not rational
+    """
+    Pole = crv.Pole
+    npoles = crv.NbPoles()
+    poles = np.array([Pole(i).Coord() for i in range(1, npoles + 1)],
+                     dtype=float).reshape(-1, 3)
+    unique_knots = [crv.Knot(i) for i in range(1, crv.NbKnots() + 1)]
+    mults = [crv.Multiplicity(i) for i in range(1, crv.NbKnots() + 1)]
+    knots = bspline.multiplicities_to_knots(unique_knots, mults)
+    if crv.IsRational():
+        weights = np.array([crv.Weight(i) for i in range(1, npoles + 1)])
+    else:
+        weights = None
+    return poles, knots, crv.Degree(), weights
+
+
+@profiling.timed()
 def points_to_bspline(pnts, deg=3, periodic=False, tangents=None,
                       scale=False, continuity=GeomAbs_C2):
     """
@@ -307,6 +550,82 @@ def points_to_bspline(pnts, deg=3, periodic=False, tangents=None,
     return crv
 
 
+def bspline_from_arrays(poles, knots, degree, weights=None, periodic=False):
+    """Builds an OCC B-spline curve from numpy arrays of poles and knots
+
+    Parameters
+    ----------
+    poles : array of float, shape (Npoles, 3)
+
+    knots : array of float
+        The full knot vector (knots repeated according to multiplicity), see
+        airconics.bspline
+
+    degree : int
+
+    weights : array of float, shape (Npoles,) (default None)
+        Pole weights: a non-rational curve is built if None
+
+    periodic : bool (default False)
+
+    Returns
+    -------
+    crv : OCC.Geom.Geom_BSplineCurve
+    """
+    unique_knots, mults = bspline.knots_to_multiplicities(knots)
+    pole_arr = point_array_to_TColgp_PntArrayType(np.asarray(poles))
+    knot_arr = TColStd_Array1OfReal(1, len(unique_knots))
+    mult_arr = TColStd_Array1OfInteger(1, len(mults))
+    for i, (knot, mult) in enumerate(zip(unique_knots.tolist(),
+                                         mults.tolist())):
+        knot_arr.SetValue(i + 1, knot)
+        mult_arr.SetValue(i + 1, mult)
+    if weights is None:
+        return Geom_BSplineCurve(pole_arr, knot_arr, mult_arr, degree,
+                                 periodic)
+    weight_arr = TColStd_Array1OfReal(1, len(weights))
+    for i, w in enumerate(np.asarray(weights, dtype=float).tolist()):
+        weight_arr.SetValue(i + 1, w)
+    return Geom_BSplineCurve(pole_arr, weight_arr, knot_arr, mult_arr, degree,
+                             periodic)
+
+
+@profiling.timed()
+def points_to_bspline_lsq(pnts, params=None, deg=3, n_poles=None):
+    """Direct least-squares B-spline fit of an array of points.
+
+    Unlike points_to_bspline, which runs OCC's iterative approximation, the
+    poles are obtained from one matrix product with a fitting operator which
+    depends only on the parametrisation (see airconics.bspline.fit_operator).
+    The operator is cached, so that fitting many point sets with the same
+    layout (e.g. all sections of a wing) is cheap, and the fitted curves share
+    the same knot vector. The end points are interpolated.
+
+    Parameters
+    ----------
+    pnts : array of float, shape (Npts, 3)
+
+    params : array of float, shape (Npts,) (default None)
+        Strictly increasing parameter values of the points on [0, 1].
+        Defaults to the centripetal parametrisation of pnts
+
+    deg : int (default 3)
+        Degree of the fitted curve
+
+    n_poles : int (default None)
+        Number of poles (default Npts // 2)
+
+    Returns
+    -------
+    crv : OCC.Geom.Geom_BSplineCurve
+    """
+    pnts = np.asarray(pnts, dtype=float)
+    if params is None:
+        params = bspline.centripetal_parameters(pnts)
+    poles, knots = bspline.fit_poles(pnts, params, deg, n_poles)
+    return bspline_from_arrays(poles, knots, deg)
+
+
 def points_to_BezierCurve(pnts):
     """
     Creates a Bezier curve from an array of points.
@@ -328,6 +647,26 @@ def points_to_BezierCurve(pnts):
     return crv
 
 
+def transform_points(points, matrix):
+    """Applies a 4 by 4 homogeneous transformation matrix to an array of
+    points
+
+    Parameters
+    ----------
+    points : array of float, shape (N, 3)
+
+    matrix : array of float, shape (4, 4)
+        e.g. from airconics.primitives.Airfoil.PlacementMatrix
+
+    Returns
+    -------
+    points : array of float, shape (N, 3)
+    """
+    matrix = np.asarray(matrix, dtype=float)
+    return np.dot(points, matrix[:3, :3].T) + matrix[:3, 3]
+
+
+@profiling.timed()
 def scale_uniformal(brep, pnt, factor, copy=False):
     '''
     translate a brep over a vector : from pythonocc-utils
@@ -353,6 +692,7 @@ def scale_uniformal(brep, pnt, factor, copy=False):
     return brep_trns.Shape()
 
 
+@profiling.timed()
 def transform_nonuniformal(brep, factors, vec=[0, 0, 0], copy=False):
     """Nonuniformly scale brep with respect to pnt by the x y z scaling factors
     provided in 'factors', and translate by vector 'vec'
@@ -440,6 +780,7 @@ def ExtrudeFace(face, vec=gp_Vec(1, 0, 0)):
     return builder.Shape()
 
 
+@profiling.timed()
 def SplitShapeFromProjection(shape, wire, direction, return_section=True):
     """Splits shape by the projection of wire onto its face
 
@@ -503,8 +844,10 @@ def coslin(TransitionPoint, NCosPoints=24, NLinPoints=24):
 
     Parameters
     ----------
-    TransitionPoint : scalar
-        Point to transition from cosine to linear distribution in range (0, 1)
+    TransitionPoint : scalar or array of scalar
+        Point to transition from cosine to linear distribution in range (0, 1).
+        If an array of shape (N,) is given, one abscissa is generated per
+        transition point
 
     NCosPoints : int
         Number of points to space by cosine law between 0 and TransitionPoint
@@ -515,19 +858,22 @@ def coslin(TransitionPoint, NCosPoints=24, NLinPoints=24):
     Returns
     -------
     Abscissa : numpy array
-        The generated abscissa
+        The generated abscissa, shape (NCosPoints + NLinPoints,) or
+        (N, NCosPoints + NLinPoints) if TransitionPoint is an array
 
     NCosPoints : int
         Number of cosine points used (same as input)
     """
+    TransitionPoint = np.asarray(TransitionPoint, dtype=float)
     angles = np.linspace(0, np.pi / 2., NCosPoints)
-    cos_pts = TransitionPoint * (1. - np.cos(angles))
-    lin_pts = np.linspace(TransitionPoint, 1., NLinPoints + 1)
+    cos_pts = TransitionPoint[..., None] * (1. - np.cos(angles))
+    lin_pts = np.linspace(TransitionPoint, 1., NLinPoints + 1, axis=-1)
     # Combine points and Remove first linear point (already in cos_pts):
-    Abscissa = np.hstack((cos_pts, lin_pts[1:]))
+    Abscissa = np.concatenate((cos_pts, lin_pts[..., 1:]), axis=-1)
     return Abscissa, NCosPoints
 
 
+@profiling.timed()
 def export_STEPFile(shapes, filename):
     """Exports a .stp file containing the input shapes
 
@@ -564,6 +910,7 @@ def export_STEPFile(shapes, filename):
 #    return status
 
 
+@profiling.timed()
 def export_STEPFile_Airconics(AirconicsShapes, filename):
     """ Writes a Step file with names defined in the AirconicsShapes. This
     function is not fully tested and should not yet be used.
@@ -617,9 +964,170 @@ def export_STEPFile_Airconics(AirconicsShapes, filename):
 #    return status
 
 
+def compatible_bspline_sections(curves, tol=1e-9):
+    """Returns True if curves can be skinned directly (see
+    skin_bspline_sections): all are non-periodic, non-rational
+    Geom_BSplineCurves with the same degree and knot vector
+
+    Parameters
+    ----------
+    curves : list of OCC.Geom.Geom_BSplineCurve
+
+    tol : scalar (default 1e-9)
+        Tolerance on the knot values
+    """
+    reference = None
+    for crv in curves:
+        if not isinstance(crv, Geom_BSplineCurve):
+            return False
+        if crv.IsPeriodic() or crv.IsRational():
+            return False
+        knots = ([crv.Knot(i) for i in range(1, crv.NbKnots() + 1)],
+                 [crv.Multiplicity(i) for i in range(1, crv.NbKnots() + 1)])
+        if reference is None:
+            reference = (crv.Degree(), knots)
+        elif (crv.Degree() != reference[0] or
+                knots[1] != reference[1][1] or
+                not np.allclose(knots[0], reference[1][0], rtol=0, atol=tol)):
+            return False
+    return reference is not None
+
+
+def bspline_surface_from_arrays(poles, uknots, vknots, udegree, vdegree):
+    """Builds a non-rational OCC B-spline surface from numpy arrays
+
+    Parameters
+    ----------
+    poles : array of float, shape (NUpoles, NVpoles, 3)
+
+    uknots, vknots : array of float
+        Full knot vectors (see airconics.bspline)
+
+    udegree, vdegree : int
+
+    Returns
+    -------
+    surface : OCC.Geom.Geom_BSplineSurface
+    """
+    poles = np.asarray(poles, dtype=float)
+    NU, NV = poles.shape[:2]
+    pole_arr = TColgp_Array2OfPnt(1, NU, 1, NV)
+    for i, row in enumerate(poles.tolist()):
+        for j, pole in enumerate(row):
+            pole_arr.SetValue(i + 1, j + 1, gp_Pnt(*pole))
+
+    def knot_arrays(knots):
+        unique_knots, mults = bspline.knots_to_multiplicities(knots)
+        knot_arr = TColStd_Array1OfReal(1, len(unique_knots))
+        mult_arr = TColStd_Array1OfInteger(1, len(mults))
+        for i, (knot, mult) in enumerate(zip(unique_knots.tolist(),
+                                             mults.tolist())):
+            knot_arr.SetValue(i + 1, knot)
+            mult_arr.SetValue(i + 1, mult)
+        return knot_arr, mult_arr
+
+    uknot_arr, umult_arr = knot_arrays(uknots)
+    vknot_arr, vmult_arr = knot_arrays(vknots)
+    return Geom_BSplineSurface(pole_arr, uknot_arr, vknot_arr, umult_arr,
+                               vmult_arr, udegree, vdegree)
+
+
+def _shell_from_faces(faces):
+    """Sews faces and returns the resulting TopoDS_Shell"""
+    if len(faces) > 1:
+        sewing = BRepBuilderAPI_Sewing(1e-6)
+        for face in faces:
+            sewing.Add(face)
+        sewing.Perform()
+        sewed = sewing.SewedShape()
+        faces = []
+        explorer = TopExp_Explorer(sewed, TopAbs_FACE)
+        while explorer.More():
+            faces.append(topods_Face(explorer.Current()))
+            explorer.Next()
+    shell = TopoDS_Shell()
+    builder = BRep_Builder()
+    builder.MakeShell(shell)
+    for face in faces:
+        builder.Add(shell, face)
+    return shell
+
+
+@profiling.timed()
+def skin_bspline_sections(curves, max_degree=3, close_sections=True):
+    """Skins a B-spline surface through compatible section curves (see
+    compatible_bspline_sections), without approximation
+
+    The pole arrays of the sections are interpolated spanwise with numpy
+    (chord length parameters, degree min(max_degree, Nsections - 1)), and
+    the surface is built directly from the resulting poles.
+
+    Parameters
+    ----------
+    curves : list of OCC.Geom.Geom_BSplineCurve
+        The sections, in the order through which they should be lofted
+
+    max_degree : int (default 3)
+        The maximum spanwise degree of the surface
+
+    close_sections : bool (default True)
+        Adds a ruled (trailing edge) strip between the end points of the
+        sections if they are not closed, as AddSurfaceLoft
+
+    Returns
+    -------
+    shape : TopoDS_Shell
+        The surface (and trailing edge strip), sewn into one shell
+
+    Raises
+    ------
+    ValueError
+        If the sections are not compatible, or two sections coincide
+    """
+    assert(len(curves) >= 2), 'Loft Failed: Less than two input curves'
+    if not compatible_bspline_sections(curves):
+        raise ValueError("Sections are not compatible B-spline curves")
+    arrays = [bspline_to_arrays(crv) for crv in curves]
+    uknots, udegree = arrays[0][1], arrays[0][2]
+    sections = np.array([poles for poles, knots, degree, weights in arrays])
+
+    # Chord length spanwise parameters, from the mean distance between the
+    # poles of consecutive sections
+    steps = np.linalg.norm(np.diff(sections, axis=0), axis=2).mean(axis=1)
+    if np.any(steps <= 0):
+        raise ValueError("Coincident sections cannot be skinned")
+    params = np.hstack([0, np.cumsum(steps)])
+    params /= params[-1]
+
+    poles, vknots, vdegree = bspline.interpolate_poles(sections, params,
+                                                       max_degree)
+    # Surface poles are indexed (chordwise, spanwise):
+    poles = poles.transpose(1, 0, 2)
+    surface = bspline_surface_from_arrays(poles, uknots, vknots, udegree,
+                                          vdegree)
+    faces = [BRepBuilderAPI_MakeFace(surface, 1e-6).Face()]
+
+    if close_sections and not curves[0].IsClosed():
+        # The boundaries of the surface at the section ends are the spanwise
+        # curves through the end poles: join them with a ruled strip
+        TE_poles = np.array([poles[-1], poles[0]])
+        TE = bspline_surface_from_arrays(TE_poles, [0, 0, 1, 1], vknots, 1,
+                                         vdegree)
+        faces.append(BRepBuilderAPI_MakeFace(TE, 1e-6).Face())
+
+    return _shell_from_faces(faces)
+
+
+# Spanwise degree of a directly skinned surface for each continuity: the
+# interpolating B-spline of degree p (with simple knots) is C^(p-1)
+SKIN_DEGREES = {GeomAbs_C0: 1, GeomAbs_G1: 2, GeomAbs_C1: 2, GeomAbs_G2: 3,
+                GeomAbs_C2: 3, GeomAbs_C3: 4}
+
+
+@profiling.timed()
 def AddSurfaceLoft(objs, continuity=GeomAbs_C2, check_compatibility=True,
                    solid=True, first_vertex=None, last_vertex=None,
-                   max_degree=8, close_sections=True):
+                   max_degree=8, close_sections=True, direct=False):
     """Create a lift surface through curve objects
 
     Parameters
@@ -652,6 +1160,15 @@ def AddSurfaceLoft(objs, continuity=GeomAbs_C2, check_compatibility=True,
         Connects the start and end point of the loft rib curves if true. This
         has the same effect as adding an airfoil trailing edge.
 
+    direct : bool (default=False)
+        Skins the surface directly through the section poles (see
+        skin_bspline_sections) if possible: i.e. if solid is False, no
+        vertices are given and all sections are compatible B-spline curves.
+        The spanwise degree is then the lowest giving the requested
+        continuity (see SKIN_DEGREES, max_degree for GeomAbs_CN), up to
+        max_degree. The surface interpolates the section poles, so differs
+        from the ThruSections approximation
+
     Returns
     -------
     shape : TopoDS_Shape
@@ -659,11 +1176,20 @@ def AddSurfaceLoft(objs, continuity=GeomAbs_C2, check_compatibility=True,
 
     Notes
     -----
-    Uses OCC.BRepOffsetAPI.BRepOffsetAPI_ThruSections. This function is
-    ORDER DEPENDANT, i.e. add elements in the order through which they should
-    be lofted
+    Uses OCC.BRepOffsetAPI.BRepOffsetAPI_ThruSections, unless the surface is
+    skinned directly. This function is ORDER DEPENDANT, i.e. add elements in
+    the order through which they should be lofted
     """
     assert(len(objs) >= 2), 'Loft Failed: Less than two input curves'
+    if direct and not solid and first_vertex is None and last_vertex is None:
+        curves = [getattr(obj, 'Curve', obj) for obj in objs]
+        if compatible_bspline_sections(curves):
+            degree = min(SKIN_DEGREES.get(continuity, max_degree), max_degree)
+            try:
+                return skin_bspline_sections(curves, degree, close_sections)
+            except (ValueError, RuntimeError, np.linalg.LinAlgError):
+                # Fall back to ThruSections
+                pass
     # Note: This is to give a smooth loft.
     ruled = False
     pres3d = 1e-6
@@ -766,6 +1292,181 @@ def translate_topods_from_vector(brep_or_iterable, vec, copy=False):
         return [translate_topods_from_vector(brep_or_iterable, vec, copy) for i in brep_or_iterable]
 
 
+CurveSamples = namedtuple('CurveSamples', ['params', 'points', 'tangents',
+                                           'curvature'])
+
+
+class CurveSampler(object):
+    """Samples points, unit tangents and curvature of a curve into numpy
+    arrays.
+
+    The curve adaptor is built once, so that one sampler can serve any number
+    of sampling requests on the same curve.
+
+    Parameters
+    ----------
+    curve : OCC.Geom curve, TopoDS_Edge or TopoDS_Wire
+
+    Attributes
+    ----------
+    adaptor : GeomAdaptor_Curve, BRepAdaptor_Curve or BRepAdaptor_CompCurve
+
+    first, last : scalar
+        The parameter range of the curve
+    """
+    # Spacing of the sample points accepted by sample
+    SPACINGS = ('abscissa', 'parameter', 'curvature')
+
+    def __init__(self, curve):
+        if isinstance(curve, TopoDS_Shape):
+            if curve.ShapeType() == TopAbs_WIRE:
+                self.adaptor = BRepAdaptor_CompCurve(topods_Wire(curve))
+            else:
+                self.adaptor = BRepAdaptor_Curve(topods_Edge(curve))
+        else:
+            self.adaptor = GeomAdaptor_Curve(curve)
+        self.first = self.adaptor.FirstParameter()
+        self.last = self.adaptor.LastParameter()
+
+    def evaluate(self, params, tangents=False, curvature=False):
+        """Evaluates the curve at params
+
+        Parameters
+        ----------
+        params : array of float, shape (N,)
+
+        tangents, curvature : bool (default False)
+            Also evaluate the unit tangents and/or the curvature
+
+        Returns
+        -------
+        samples : CurveSamples named tuple
+            (params, points, tangents, curvature), with arrays of shape (N,),
+            (N, 3), (N, 3) and (N,). tangents and curvature are None unless
+            requested
+        """
+        params = np.asarray(params, dtype=float)
+        N = len(params)
+        points = np.empty([N, 3])
+        adaptor = self.adaptor
+        # Output arguments of the adaptor, reused for all points:
+        P, V1, V2 = gp_Pnt(), gp_Vec(), gp_Vec()
+        D1 = D2 = None
+        if curvature:
+            D1 = np.empty([N, 3])
+            D2 = np.empty([N, 3])
+            for i, u in enumerate(params.tolist()):
+                adaptor.D2(u, P, V1, V2)
+                points[i] = P.Coord()
+                D1[i] = V1.Coord()
+                D2[i] = V2.Coord()
+        elif tangents:
+            D1 = np.empty([N, 3])
+            for i, u in enumerate(params.tolist()):
+                adaptor.D1(u, P, V1)
+                points[i] = P.Coord()
+                D1[i] = V1.Coord()
+        else:
+            for i, u in enumerate(params.tolist()):
+                points[i] = adaptor.Value(u).Coord()
+
+        T = K = None
+        if D1 is not None:
+            speed = np.linalg.norm(D1, axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                if tangents:
+                    T = np.where(speed[:, None] > 0, D1 / speed[:, None], 0.)
+                if curvature:
+                    K = np.where(speed > 0,
+                                 np.linalg.norm(np.cross(D1, D2), axis=1) /
+                                 speed ** 3, 0.)
+        return CurveSamples(params, points, T, K)
+
+    def _arc_lengths(self, NDense):
+        """Returns dense uniform parameters, and the cumulative (polyline) arc
+        length and curvature at each"""
+        params = np.linspace(self.first, self.last, NDense)
+        samples = self.evaluate(params, curvature=True)
+        steps = np.linalg.norm(np.diff(samples.points, axis=0), axis=1)
+        return params, np.hstack([0, np.cumsum(steps)]), samples.curvature
+
+    def parameters(self, NPoints, spacing='abscissa'):
+        """Returns NPoints curve parameters, from first to last
+
+        Parameters
+        ----------
+        NPoints : int
+
+        spacing : string (default 'abscissa')
+            'abscissa': equal arc length between points
+            'parameter': equal parameter steps
+            'curvature': arc length steps shortened where the curve is curved:
+                the point density is proportional to (1 + L k), where L is
+                the curve length and k the curvature, so that e.g. an
+                airfoil leading edge is sampled densely
+
+        Returns
+        -------
+        params : array of float, shape (NPoints,)
+        """
+        if spacing == 'parameter':
+            return np.linspace(self.first, self.last, NPoints)
+        elif spacing == 'abscissa':
+            absc = GCPnts_UniformAbscissa(self.adaptor, NPoints)
+            if absc.IsDone() and absc.NbPoints() == NPoints:
+                return np.array([absc.Parameter(i)
+                                 for i in range(1, NPoints + 1)])
+            # Otherwise, invert the arc length of a dense polyline:
+            params, lengths, K = self._arc_lengths(max(8 * NPoints, 256))
+            return np.interp(np.linspace(0, lengths[-1], NPoints), lengths,
+                             params)
+        elif spacing == 'curvature':
+            params, lengths, K = self._arc_lengths(max(8 * NPoints, 256))
+            L = lengths[-1]
+            ds = np.diff(lengths)
+            weights = ds * (1 + L * 0.5 * (K[1:] + K[:-1]))
+            cumulative = np.hstack([0, np.cumsum(weights)])
+            return np.interp(np.linspace(0, cumulative[-1], NPoints),
+                             cumulative, params)
+        raise ValueError("Unknown spacing {}: expected any of {}"
+                         .format(spacing, self.SPACINGS))
+
+    def sample(self, NPoints, spacing='abscissa', tangents=False,
+               curvature=False):
+        """Samples NPoints on the curve (see parameters and evaluate)
+
+        Returns
+        -------
+        samples : CurveSamples named tuple
+            (params, points, tangents, curvature)
+        """
+        return self.evaluate(self.parameters(NPoints, spacing), tangents,
+                             curvature)
+
+    def sample_points(self, NPoints, spacing='abscissa'):
+        """Returns an array (shape (NPoints, 3)) of points on the curve"""
+        return self.sample(NPoints, spacing).points
+
+
+def sample_curve(curve, NPoints, spacing='abscissa'):
+    """Returns an array (shape (NPoints, 3)) of points on a curve
+
+    Parameters
+    ----------
+    curve : OCC.Geom curve, TopoDS_Edge or TopoDS_Wire
+
+    NPoints : int
+
+    spacing : string (default 'abscissa')
+        'abscissa', 'parameter' or 'curvature' (see CurveSampler.parameters)
+
+    See Also
+    --------
+    CurveSampler : for tangents, curvature, and many samplings of one curve
+    """
+    return CurveSampler(curve).sample_points(NPoints, spacing)
+
+
 def Uniform_Points_on_Curve(curve, NPoints):
     """Returns a list of uniformly spaced points on a curve
 
@@ -774,14 +1475,12 @@ def Uniform_Points_on_Curve(curve, NPoints):
     crv : OCC.Geom curve type
 
     NPoints : int
-        number of sampling points along the curve"""
-    try:
-        adapt = GeomAdaptor_Curve(curve)
-    except:
-        # Allow the algorithm to deal with TopoDS_Edge and Wire shapes:
-        adapt = BRepAdaptor_Curve(curve)
-    absc = GCPnts_UniformAbscissa(adapt, NPoints)
-    return [adapt.Value(absc.Parameter(i)) for i in range(1, NPoints + 1)]
+        number of sampling points along the curve
+
+    See Also
+    --------
+    sample_curve : returns the points as a numpy array"""
+    return [gp_Pnt(*pt) for pt in sample_curve(curve, NPoints).tolist()]
 
 
 def rotate(brep, axe, degree, copy=False):
@@ -811,6 +1510,7 @@ def rotate(brep, axe, degree, copy=False):
     return brep_trns.Shape()
 
 
+@profiling.timed()
 def mirror(brep, plane='xz', axe2=None, copy=False):
     """Originally from pythonocc-utils : might add dependency on this?
     Mirrors object
@@ -892,6 +1592,7 @@ def mirror(brep, plane='xz', axe2=None, copy=False):
 #        time.sleep(0.21)
 
 
+@profiling.timed()
 def make_pipe_shell(spine, profiles, support=None):
     try:
         spine = make_wire(make_edge(spine))
@@ -936,6 +1637,7 @@ def make_circle3pt(pt1, pt2, pt3):
     return GC_MakeCircle(pt1, pt2, pt3).Value()
 
 
+@profiling.timed()
 def CalculateSurfaceArea(shape):
     """Calculates the surface area of input shape
 
@@ -978,6 +1680,7 @@ def PlanarSurf(geomcurve):
     return face
 
 
+@profiling.timed()
 def project_curve_to_plane(curve, plane, direction):
     """
     Computes and returns the cylindrically projected curve onto input plane
@@ -1009,6 +1712,7 @@ def project_curve_to_plane(curve, plane, direction):
     return Hproj_curve
 
 
+@profiling.timed()
 def project_curve_to_surface(curve, surface, dir):
     '''
     Returns a curve as cylindrically projected onto the surface shape
@@ -1041,6 +1745,7 @@ def project_curve_to_surface(curve, surface, dir):
     return res_curve
 
 
+@profiling.timed()
 def points_from_intersection(plane, curve):
     '''
     Find intersection points between plane and curve.
@@ -1075,10 +1780,139 @@ def points_from_intersection(plane, curve):
             P = []
             for i in range(1, nb_results + 1):
                 P.append(intersector.Point(i))
+            return P
         else:
             return None
 
 
+def curve_to_arrays(curve):
+    """Reads a Bezier or non-periodic B-spline curve into numpy arrays (see
+    bspline_to_arrays)
+
+    Parameters
+    ----------
+    curve : OCC.Geom.Geom_BezierCurve or OCC.Geom.Geom_BSplineCurve
+
+    Returns
+    -------
+    poles, knots, degree, weights : see bspline_to_arrays
+        A Bezier curve is returned as a B-spline on [0, 1]
+
+    Raises
+    ------
+    TypeError
+        For any other (or a periodic) curve
+    """
+    if isinstance(curve, Geom_BSplineCurve) and not curve.IsPeriodic():
+        return bspline_to_arrays(curve)
+    elif isinstance(curve, Geom_BezierCurve):
+        npoles = curve.NbPoles()
+        poles = np.array([curve.Pole(i).Coord()
+                          for i in range(1, npoles + 1)], dtype=float)
+        degree = curve.Degree()
+        knots = np.hstack([np.zeros(degree + 1), np.ones(degree + 1)])
+        weights = None
+        if curve.IsRational():
+            weights = np.array([curve.Weight(i)
+                                for i in range(1, npoles + 1)])
+        return poles, knots, degree, weights
+    raise TypeError("Expected a Bezier or non-periodic B-spline curve, got {}"
+                    .format(type(curve)))
+
+
+@profiling.timed()
+def curve_plane_intersections(curve, values, axis=0):
+    """Intersects a curve with the planes normal to a coordinate axis at
+    several values, e.g. the planes x = X at an array of stations X.
+
+    Bezier and B-spline curves are intersected with all planes at once from
+    their poles (see bspline.solve_coordinate). Any other curve is
+    intersected with each plane by OCC.GeomAPI.GeomAPI_IntCS.
+
+    Parameters
+    ----------
+    curve : OCC.Geom curve
+
+    values : array of float, shape (K,)
+        Coordinates of the planes
+
+    axis : int (default 0)
+        The axis normal to the planes (0: x, 1: y, 2: z)
+
+    Returns
+    -------
+    index : array of int, shape (R,)
+        The index in values of each intersection
+
+    params : array of float, shape (R,)
+        The curve parameter of each intersection (NaN if intersected by
+        GeomAPI_IntCS)
+
+    points : array of float, shape (R, 3)
+        The intersection points
+
+    See Also
+    --------
+    points_at_coordinate : one intersection per plane
+    """
+    values = np.atleast_1d(np.asarray(values, dtype=float))
+    try:
+        poles, knots, degree, weights = curve_to_arrays(curve)
+    except TypeError:
+        direction = gp_Dir(*np.eye(3)[axis].tolist())
+        index, points = [], []
+        for k, value in enumerate(values.tolist()):
+            origin = gp_Pnt(*(np.eye(3)[axis] * value).tolist())
+            hits = points_from_intersection(
+                Geom_Plane(gp_Pln(origin, direction)), curve)
+            if hits is None:
+                continue
+            if isinstance(hits, gp_Pnt):
+                hits = [hits]
+            for pnt in hits:
+                index.append(k)
+                points.append(pnt.Coord())
+        return (np.array(index, dtype=int), np.full(len(index), np.nan),
+                np.array(points, dtype=float).reshape(-1, 3))
+
+    index, params = bspline.solve_coordinate(poles, knots, degree, values,
+                                             weights, axis)
+    points = bspline.evaluate(poles, knots, degree, params, weights)
+    # The solved coordinate is exact:
+    points[:, axis] = values[index]
+    return index, params, points
+
+
+def points_at_coordinate(curve, values, axis=0):
+    """Returns the first intersection (in curve parameter order) of a curve
+    with each of the planes normal to axis at values
+
+    Parameters
+    ----------
+    curve : OCC.Geom curve
+
+    values : array of float, shape (K,)
+
+    axis : int (default 0)
+
+    Returns
+    -------
+    points : array of float, shape (K, 3)
+        NaN for planes which do not intersect the curve
+
+    See Also
+    --------
+    curve_plane_intersections : all intersections
+    """
+    values = np.atleast_1d(np.asarray(values, dtype=float))
+    index, params, hits = curve_plane_intersections(curve, values, axis)
+    points = np.full([len(values), 3], np.nan)
+    # The first intersection of each plane (index is sorted):
+    first = np.hstack([True, np.diff(index) > 0]) if len(index) else []
+    points[index[first]] = hits[first]
+    return points
+
+
 # TODO: Network surface function needs fixing
 # def Add_Network_Surface(curvenet, deg=3, initsurf=None):
 #     '''Adds a surface from curve network using the OCC plate surface algorithm
@@ -1139,6 +1973,7 @@ def points_from_intersection(plane, curve):
 #         return face
 
 
+@profiling.timed()
 def CutSect(Shape, SpanStation):
     """
     Parameters
@@ -1157,6 +1992,10 @@ def CutSect(Shape, SpanStation):
 
     Chord : result of OCC.GC.GC_MakeSegment.Value (Geom_TrimmedCurve)
         The Chord line between x direction extremeties
+
+    See Also
+    --------
+    CutSections : chord and thickness arrays at many stations
     """
     (Xmin, Ymin, Zmin, Xmax, Ymax, Zmax) = ObjectsExtents([Shape])
 
@@ -1174,31 +2013,212 @@ def CutSect(Shape, SpanStation):
     I.Build()
     Section = I.Shape()
 
-    (Xmin, Ymin, Zmin, Xmax, Ymax, Zmax) = ObjectsExtents([Section])
-
 #     Currently assume only one edge exists in the intersection:
     exp = TopExp_Explorer(Section, TopAbs_EDGE)
     edge = topods_Edge(exp.Current())
 
 #    Find the apparent chord of the section (that is, the line connecting the
 #    fore most and aftmost points on the curve
-    DivPoints = Uniform_Points_on_Curve(edge, 200)
+    DivPoints = sample_curve(edge, 200)
 
-    Xs = np.array([pt.X() for pt in DivPoints])
-
-    min_idx = np.argmin(Xs)
-    LeadingPoint = gp_Pnt(Xs[min_idx], DivPoints[min_idx].Y(),
-                          DivPoints[min_idx].Z())
-
-    max_idx = np.argmax(Xs)
-    TrailingPoint = gp_Pnt(Xs[max_idx], DivPoints[max_idx].Y(),
-                           DivPoints[max_idx].Z())
+    LeadingPoint = gp_Pnt(*DivPoints[np.argmin(DivPoints[:, 0])].tolist())
+    TrailingPoint = gp_Pnt(*DivPoints[np.argmax(DivPoints[:, 0])].tolist())
 
     HChord = GC_MakeSegment(TrailingPoint, LeadingPoint).Value()
 #    Chord = HChord
     return Section, HChord
 
 
+SectionCuts = namedtuple('SectionCuts', ['stations', 'y', 'leading_edge',
+                                         'trailing_edge', 'chord',
+                                         'thickness'])
+
+
+def _order_contour(polylines):
+    """Chains polylines (arrays of shape (N, 3), e.g. points sampled on the
+    edges of a section, in any order and direction) end to end, into one
+    array of points ordered along the contour"""
+    polylines = [p for p in polylines if len(p)]
+    if not polylines:
+        return np.empty([0, 3])
+    contour = [polylines.pop(0)]
+    while polylines:
+        end = contour[-1][-1]
+        starts = np.array([p[0] for p in polylines])
+        ends = np.array([p[-1] for p in polylines])
+        gaps = np.hstack([np.linalg.norm(starts - end, axis=1),
+                          np.linalg.norm(ends - end, axis=1)])
+        i = int(np.argmin(gaps))
+        reverse = i >= len(polylines)
+        p = polylines.pop(i % len(polylines))
+        contour.append(p[::-1] if reverse else p)
+    return np.vstack(contour)
+
+
+def _section_points(Section, NPoints):
+    """Returns an array (shape (N, 3)) of points sampled on all edges of a
+    section, ordered along the section contour"""
+    polylines = []
+    exp = TopExp_Explorer(Section, TopAbs_EDGE)
+    while exp.More():
+        polylines.append(sample_curve(topods_Edge(exp.Current()), NPoints))
+        exp.Next()
+    return _order_contour(polylines)
+
+
+def section_chord_thickness(points, NStations=101):
+    """Finds the chord and thickness of an airfoil-like section from points
+    on its contour
+
+    Parameters
+    ----------
+    points : array of float, shape (N, 3)
+        Points ordered along the contour of the section (closed, or open at
+        the trailing edge), in a plane parallel to xz
+
+    NStations : int (default 101)
+        Number of chordwise stations at which the thickness is measured
+
+    Returns
+    -------
+    LE, TE : array of float, shape (3,)
+        The fore most and aft most points of the section
+
+    chord : scalar
+        Distance from LE to TE
+
+    thickness : scalar
+        Maximum distance between the upper and lower surfaces, measured
+        normal to the chord line at equal chordwise stations
+
+    Notes
+    -----
+    The surfaces are the two arcs of the contour between LE and TE, so that
+    the aft lower surface of a strongly cambered section, which may lie above
+    the chord line, is still treated as the lower surface.
+    """
+    iLE = np.argmin(points[:, 0])
+    iTE = np.argmax(points[:, 0])
+    LE = points[iLE]
+    TE = points[iTE]
+    chord_vec = TE - LE
+    chord = np.linalg.norm(chord_vec)
+    if chord == 0:
+        return LE, TE, 0., 0.
+    direction = chord_vec / chord
+    # Normal to the chord, in the section plane:
+    normal = np.array([-direction[2], 0., direction[0]])
+    s = (points - LE).dot(direction) / chord
+    d = (points - LE).dot(normal)
+    i0, i1 = sorted((iLE, iTE))
+    arcs = [np.arange(i0, i1 + 1), np.r_[i1:len(points), 0:i0 + 1]]
+    stations = np.linspace(0, 1, NStations)
+    surfaces = []
+    for arc in arcs:
+        order = np.argsort(s[arc], kind='stable')
+        surfaces.append(np.interp(stations, s[arc][order], d[arc][order]))
+    separation = surfaces[0] - surfaces[1]
+    if separation.sum() < 0:
+        # The first arc is the lower surface
+        separation = -separation
+    thickness = max(np.max(separation), 0.)
+    return LE, TE, chord, thickness
+
+
+@profiling.timed()
+def CutSections(Shape, SpanStations, NPoints=200):
+    """Cuts Shape with planes parallel to xz at several span stations, and
+    measures the leading edge, trailing edge, chord and thickness of each
+    section
+
+    Parameters
+    ----------
+    Shape : TopoDS_Shape
+        The Shape to cut, e.g. a LiftingSurface['Surface']
+
+    SpanStations : array of scalar in range (0, 1)
+        Fractions of the y extents of Shape at which to cut
+
+    NPoints : int (default 200)
+        Number of points sampled on each edge of the sections
+
+    Returns
+    -------
+    cuts : SectionCuts named tuple
+        with the array attributes:
+
+        * stations : the input SpanStations, shape (N,)
+        * y : the y coordinate of each cut, shape (N,)
+        * leading_edge, trailing_edge : the fore most and aft most points of
+          each section, shape (N, 3)
+        * chord : distance between the leading and trailing edges, shape (N,)
+        * thickness : maximum thickness normal to the chord, shape (N,)
+
+        Stations at which the shape is not cut are NaN
+
+    Notes
+    -----
+    All stations are cut in a single Boolean section of Shape against a
+    compound of planar faces, so that Shape is prepared for the intersection
+    (bounding boxes, face classification) once rather than once per station.
+    The bounding box of Shape is also computed once (and cached, see
+    ObjectsExtents). See CutSect for the section shape and chord line at one
+    station.
+    """
+    stations = np.atleast_1d(np.asarray(SpanStations, dtype=float))
+    (Xmin, Ymin, Zmin, Xmax, Ymax, Zmax) = ObjectsExtents([Shape])
+    Ys = Ymin + (Ymax - Ymin) * stations
+
+    N = len(stations)
+    leading_edge = np.full([N, 3], np.nan)
+    trailing_edge = np.full([N, 3], np.nan)
+    chord = np.full(N, np.nan)
+    thickness = np.full(N, np.nan)
+
+    # One planar face per distinct station, spanning the extents of Shape
+    # (the plane x axis is global x, and its y axis is global -z):
+    levels, index = np.unique(Ys, return_inverse=True)
+    Planes = TopoDS_Compound()
+    builder = BRep_Builder()
+    builder.MakeCompound(Planes)
+    for YStation in levels.tolist():
+        P = gp_Pln(gp_Ax3(gp_Pnt(0, YStation, 0), gp_Dir(0, 1, 0),
+                          gp_Dir(1, 0, 0)))
+        builder.Add(Planes, BRepBuilderAPI_MakeFace(P, Xmin - 1, Xmax + 1,
+                                                    -Zmax - 1,
+                                                    -Zmin + 1).Face())
+
+    I = BRepAlgoAPI_Section(Shape, Planes, False)
+    I.ComputePCurveOn1(False)
+    I.Approximation(True)
+    I.Build()
+    if not I.IsDone():
+        return SectionCuts(stations, Ys, leading_edge, trailing_edge, chord,
+                           thickness)
+
+    # Sort the section edges by station:
+    polylines = [[] for YStation in levels]
+    exp = TopExp_Explorer(I.Shape(), TopAbs_EDGE)
+    while exp.More():
+        points = sample_curve(topods_Edge(exp.Current()), NPoints)
+        polylines[np.argmin(np.abs(levels - points[:, 1].mean()))].append(
+            points)
+        exp.Next()
+
+    for j, level_polylines in enumerate(polylines):
+        points = _order_contour(level_polylines)
+        if len(points) == 0:
+            continue
+        LE, TE, level_chord, level_thickness = section_chord_thickness(points)
+        at_level = index == j
+        leading_edge[at_level] = LE
+        trailing_edge[at_level] = TE
+        chord[at_level] = level_chord
+        thickness[at_level] = level_thickness
+    return SectionCuts(stations, Ys, leading_edge, trailing_edge, chord,
+                       thickness)
+
+
 def AddCone(BasePoint, Radius, height, direction=gp_Dir(1, 0, 0)):
     """Generates a cone shape originating at BasePoint with base Radius
     and height (points in the direction of input 'direction)
@@ -1232,6 +2252,7 @@ def AddCone(BasePoint, Radius, height, direction=gp_Dir(1, 0, 0)):
     return cone.Shape()
 
 
+@profiling.timed()
 def TrimShapebyPlane(Shape, Plane, pnt=gp_Pnt(0, -10, 0)):
     """Trims an OCC shape by plane. Default trims the negative y side of the
     plane
@@ -1250,6 +2271,7 @@ def TrimShapebyPlane(Shape, Plane, pnt=gp_Pnt(0, -10, 0)):
     return trimmed_shape
 
 
+@profiling.timed()
 def boolean_cut(shapeToCutFrom, cuttingShape, debug=False):
     """Boolean cut tool from PythonOCC-Utils"""
     try:
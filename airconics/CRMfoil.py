@@ -3,177 +3,215 @@
 import numpy as np
 
 
-def CRMlinear(Epsilon):
-    XRoot = np.array([1,
-                      0.9497,
-                      0.8992,
-                      0.8487,
-                      0.798,
-                      0.7474,
-                      0.6967,
-                      0.646,
-                      0.5953,
-                      0.5445,
-                      0.4938,
-                      0.443,
-                      0.3922,
-                      0.3414,
-                      0.2906,
-                      0.2398,
-                      0.189,
-                      0.1382,
-                      0.0878,
-                      0.0384,
-                      0,
-                      0.0381,
-                      0.0863,
-                      0.136,
-                      0.1864,
-                      0.2371,
-                      0.2881,
-                      0.3394,
-                      0.3907,
-                      0.442,
-                      0.4931,
-                      0.5441,
-                      0.595,
-                      0.6457,
-                      0.6964,
-                      0.7469,
-                      0.7974,
-                      0.8478,
-                      0.8983,
-                      0.949,
-                      1])
+# Root and tip section coordinates, from the upper trailing edge round the
+# leading edge to the lower trailing edge. These module level tables are
+# read-only: CRMlinear and CRMlinearBatch return new arrays.
+XROOT = np.array([1,
+                  0.9497,
+                  0.8992,
+                  0.8487,
+                  0.798,
+                  0.7474,
+                  0.6967,
+                  0.646,
+                  0.5953,
+                  0.5445,
+                  0.4938,
+                  0.443,
+                  0.3922,
+                  0.3414,
+                  0.2906,
+                  0.2398,
+                  0.189,
+                  0.1382,
+                  0.0878,
+                  0.0384,
+                  0,
+                  0.0381,
+                  0.0863,
+                  0.136,
+                  0.1864,
+                  0.2371,
+                  0.2881,
+                  0.3394,
+                  0.3907,
+                  0.442,
+                  0.4931,
+                  0.5441,
+                  0.595,
+                  0.6457,
+                  0.6964,
+                  0.7469,
+                  0.7974,
+                  0.8478,
+                  0.8983,
+                  0.949,
+                  1])
+
+ZROOT = np.array([0.0014,
+                  0.0088,
+                  0.0145,
+                  0.0195,
+                  0.024,
+                  0.0282,
+                  0.032,
+                  0.0353,
+                  0.0382,
+                  0.0408,
+                  0.0431,
+                  0.0453,
+                  0.0471,
+                  0.0488,
+                  0.05,
+                  0.0505,
+                  0.0499,
+                  0.0472,
+                  0.0412,
+                  0.0293,
+                  0,
+                  -0.0314,
+                  -0.0488,
+                  -0.0616,
+                  -0.0716,
+                  -0.0794,
+                  -0.0847,
+                  -0.0873,
+                  -0.0874,
+                  -0.085,
+                  -0.0807,
+                  -0.0748,
+                  -0.0678,
+                  -0.06,
+                  -0.0516,
+                  -0.0428,
+                  -0.0334,
+                  -0.0238,
+                  -0.0144,
+                  -0.0063,
+                  -0.0009])
+
+XTIP = np.array([1,
+                 0.9502,
+                 0.9001,
+                 0.85,
+                 0.7998,
+                 0.7496,
+                 0.6993,
+                 0.6489,
+                 0.5985,
+                 0.548,
+                 0.4975,
+                 0.447,
+                 0.3965,
+                 0.346,
+                 0.2956,
+                 0.2451,
+                 0.1948,
+                 0.1445,
+                 0.0944,
+                 0.0446,
+                 0,
+                 0.0436,
+                 0.0935,
+                 0.1437,
+                 0.194,
+                 0.2444,
+                 0.2949,
+                 0.3454,
+                 0.3959,
+                 0.4464,
+                 0.4969,
+                 0.5473,
+                 0.5977,
+                 0.6479,
+                 0.6981,
+                 0.7483,
+                 0.7985,
+                 0.8487,
+                 0.8991,
+                 0.9496,
+                 1])
 
-    ZRoot = np.array([0.0014,
-                      0.0088,
-                      0.0145,
-                      0.0195,
-                      0.024,
-                      0.0282,
-                      0.032,
-                      0.0353,
-                      0.0382,
-                      0.0408,
-                      0.0431,
-                      0.0453,
-                      0.0471,
-                      0.0488,
-                      0.05,
-                      0.0505,
-                      0.0499,
-                      0.0472,
-                      0.0412,
-                      0.0293,
-                      0,
-                      -0.0314,
-                      -0.0488,
-                      -0.0616,
-                      -0.0716,
-                      -0.0794,
-                      -0.0847,
-                      -0.0873,
-                      -0.0874,
-                      -0.085,
-                      -0.0807,
-                      -0.0748,
-                      -0.0678,
-                      -0.06,
-                      -0.0516,
-                      -0.0428,
-                      -0.0334,
-                      -0.0238,
-                      -0.0144,
-                      -0.0063,
-                      -0.0009])
+ZTIP = np.array([0.0028,
+                 0.0112,
+                 0.0178,
+                 0.024,
+                 0.0299,
+                 0.0353,
+                 0.04,
+                 0.0439,
+                 0.0469,
+                 0.049,
+                 0.0502,
+                 0.0505,
+                 0.0499,
+                 0.0484,
+                 0.0462,
+                 0.0431,
+                 0.0392,
+                 0.0342,
+                 0.028,
+                 0.0195,
+                 0,
+                 -0.0207,
+                 -0.0287,
+                 -0.0346,
+                 -0.0391,
+                 -0.0424,
+                 -0.0446,
+                 -0.0456,
+                 -0.0454,
+                 -0.0441,
+                 -0.0416,
+                 -0.0381,
+                 -0.0337,
+                 -0.0285,
+                 -0.0228,
+                 -0.0168,
+                 -0.0108,
+                 -0.0055,
+                 -0.0015,
+                 0.0003,
+                 -0.0019])
 
-    XTip = np.array([1,
-                     0.9502,
-                     0.9001,
-                     0.85,
-                     0.7998,
-                     0.7496,
-                     0.6993,
-                     0.6489,
-                     0.5985,
-                     0.548,
-                     0.4975,
-                     0.447,
-                     0.3965,
-                     0.346,
-                     0.2956,
-                     0.2451,
-                     0.1948,
-                     0.1445,
-                     0.0944,
-                     0.0446,
-                     0,
-                     0.0436,
-                     0.0935,
-                     0.1437,
-                     0.194,
-                     0.2444,
-                     0.2949,
-                     0.3454,
-                     0.3959,
-                     0.4464,
-                     0.4969,
-                     0.5473,
-                     0.5977,
-                     0.6479,
-                     0.6981,
-                     0.7483,
-                     0.7985,
-                     0.8487,
-                     0.8991,
-                     0.9496,
-                     1])
+for _table in (XROOT, ZROOT, XTIP, ZTIP):
+    _table.flags.writeable = False
+del _table
 
-    ZTip = np.array([0.0028,
-                     0.0112,
-                     0.0178,
-                     0.024,
-                     0.0299,
-                     0.0353,
-                     0.04,
-                     0.0439,
-                     0.0469,
-                     0.049,
-                     0.0502,
-                     0.0505,
-                     0.0499,
-                     0.0484,
-                     0.0462,
-                     0.0431,
-                     0.0392,
-                     0.0342,
-                     0.028,
-                     0.0195,
-                     0,
-                     -0.0207,
-                     -0.0287,
-                     -0.0346,
-                     -0.0391,
-                     -0.0424,
-                     -0.0446,
-                     -0.0456,
-                     -0.0454,
-                     -0.0441,
-                     -0.0416,
-                     -0.0381,
-                     -0.0337,
-                     -0.0285,
-                     -0.0228,
-                     -0.0168,
-                     -0.0108,
-                     -0.0055,
-                     -0.0015,
-                     0.0003,
-                     -0.0019])
 
+def CRMlinear(Epsilon):
+    """Linearly interpolates the CRM section at spanwise location Epsilon
+    (0 at the root, 1 at the tip)
+
+    Returns
+    -------
+    x, z : array of float
+        The section coordinates
+    """
     # Linearly interpolate curve X,Z points at spanwise location epsilon:
-    x = XRoot * (1 - Epsilon) + XTip * Epsilon
-    z = ZRoot * (1 - Epsilon) + ZTip * Epsilon
+    x = XROOT * (1 - Epsilon) + XTIP * Epsilon
+    z = ZROOT * (1 - Epsilon) + ZTIP * Epsilon
 
     return x, z
+
+
+def CRMlinearBatch(Epsilons):
+    """Vectorised CRMlinear: interpolates the CRM sections at all spanwise
+    locations in Epsilons at once
+
+    Parameters
+    ----------
+    Epsilons : array of float, shape (N,)
+        Spanwise locations (0 at the root, 1 at the tip)
+
+    Returns
+    -------
+    points : array of float, shape (N, M, 2)
+        The x, z coordinates of each section: points[i] is equal to
+        np.column_stack(CRMlinear(Epsilons[i]))
+    """
+    Epsilons = np.asarray(Epsilons, dtype=float).reshape(-1, 1)
+    points = np.empty([len(Epsilons), len(XROOT), 2])
+    points[:, :, 0] = XROOT * (1 - Epsilons) + XTIP * Epsilons
+    points[:, :, 1] = ZROOT * (1 - Epsilons) + ZTIP * Epsilons
+    return points
@@ -12,13 +12,14 @@ Created on Mon Apr 18 10:26:22 2016
 """
 from abc import abstractmethod
 from collections import MutableMapping
+from contextlib import contextmanager
 import os
 from . import AirCONICStools as act
 from OCC.Core.Graphic3d import Graphic3d_NOM_ALUMINIUM
 from OCC.Core.TopoDS import TopoDS_Shape
 from OCC.Core.StlAPI import StlAPI_Writer
 from OCC.Core.AIS import AIS_Shape
-from OCC.Core.gp import gp_Pnt
+from OCC.Core.gp import gp_Pnt, gp_Vec
 
 
 class AirconicsBase(MutableMapping, object):
@@ -116,6 +117,14 @@ class AirconicsShape(AirconicsBase):
 
     Attributes
     ----------
+    defer_build : bool (default False)
+        If True, parameter changes which would rebuild the geometry are only
+        recorded, and the geometry is rebuilt once by FlushBuild (see also
+        DeferBuild)
+
+    RebuildsSaved : int
+        Total number of rebuilds avoided by deferring them
+
     _Components : Airconics Container
         Mapping of name(string):component(TopoDS_Shape) pairs. Note that
         this should not be interacted with directly, and instead users should
@@ -140,6 +149,20 @@ class AirconicsShape(AirconicsBase):
     --------
     AirconicsCollection
     """
+    defer_build = False
+    RebuildsSaved = 0
+    # Number of rebuilds requested while deferred, and depth of nested
+    # DeferBuild contexts
+    _pendingBuilds = 0
+    _deferDepth = 0
+    # Attributes defining the geometry, and non-shape results of Build, used
+    # by the persistent part cache (see airconics.part_cache.cached_build)
+    CacheAttributes = ()
+    CacheOutputs = ()
+    use_part_cache = True
+    # Incremented on every change of a component: used to invalidate the
+    # cached Extents
+    _modCount = 0
 
     def __init__(self, components={}, construct_geometry=False,
                  *args, **kwargs):
@@ -169,9 +192,11 @@ class AirconicsShape(AirconicsBase):
             if not isinstance(component, TopoDS_Shape):
                     raise TypeError('Component must be a TopoDS_Shape or None')
         self._Components[name] = component
+        self._modCount += 1
 
     def __delitem__(self, name):
         del self._Components[name]
+        self._modCount += 1
 
     def __iter__(self):
         return iter(self._Components)
@@ -200,6 +225,64 @@ class AirconicsShape(AirconicsBase):
         print("Attempting to construct {} geometry...".format(
             type(self).__name__))
 
+    def _RestoreFromCache(self):
+        """Called by the part cache after the components and CacheOutputs of
+        this shape were restored from a previous Build instead of building.
+        Derived classes should redefine this to restore any other state which
+        Build would have set"""
+        pass
+
+    def _Rebuild(self):
+        """Rebuilds the geometry after a parameter change (if
+        construct_geometry is True), or records the rebuild for later if
+        rebuilds are deferred"""
+        if not self.construct_geometry:
+            return
+        if self.defer_build or self._deferDepth:
+            self._pendingBuilds += 1
+        else:
+            self.Build()
+
+    def FlushBuild(self):
+        """Rebuilds the geometry once if any rebuilds were deferred
+
+        Returns
+        -------
+        saved : int
+            The number of rebuilds avoided
+        """
+        pending = self._pendingBuilds
+        if not pending:
+            return 0
+        self._pendingBuilds = 0
+        self.Build()
+        saved = pending - 1
+        self.RebuildsSaved += saved
+        return saved
+
+    @contextmanager
+    def DeferBuild(self):
+        """Context manager which collects parameter changes and rebuilds the
+        geometry once, on exit
+
+        If an exception is raised inside the context, the rebuild is left
+        pending (see FlushBuild).
+
+        :Example:
+            >>> with Wing.DeferBuild():
+            >>>     Wing.SweepFunct = mySweepFunct
+            >>>     Wing.ChordFunct = myChordFunct
+            >>> Wing.RebuildsSaved
+            1
+        """
+        self._deferDepth += 1
+        try:
+            yield self
+        finally:
+            self._deferDepth -= 1
+        if not (self._deferDepth or self.defer_build):
+            self.FlushBuild()
+
     def AddComponent(self, component, name=None):
         """Adds a component to self
 
@@ -229,7 +312,7 @@ class AirconicsShape(AirconicsBase):
         outstring += self.__str__()
         print(outstring)
 
-    def Extents(self, tol=1e-6, as_vec=False):
+    def Extents(self, tol=1e-6, as_vec=False, mode='triangulation'):
         """Returns the extents of the bounding box encapsulating all shapes in
         self.__Components__
 
@@ -241,14 +324,33 @@ class AirconicsShape(AirconicsBase):
         as_vec : bool (default True)
             Returns two OCC.gp.gp_Vec objects if True
 
+        mode : string (default 'triangulation')
+            The bounding box algorithm: see act.ObjectsExtents
+
         Returns
         -------
         extents : tuple of scalar or OCC.gp.gp_Vec
             Type depends on input 'as_vec'. If as_vec is false, this returns
             a tuple xmin, ymin, zmin, xmax, ymax, zmax; otherwise, the min and
             max vectors will be returned as OCC types.
+
+        Notes
+        -----
+        The extents are stored until a component is changed
         """
-        return act.ObjectsExtents(self.values(), tol=tol, as_vec=as_vec)
+        key = (tol, mode)
+        cache = self.__dict__.setdefault('_extentsCache', {})
+        entry = cache.get(key)
+        if entry is not None and entry[0] == self._modCount:
+            extents = entry[1]
+        else:
+            extents = act.ObjectsExtents(
+                [shape for shape in self.values() if shape is not None],
+                tol=tol, mode=mode)
+            cache[key] = (self._modCount, extents)
+        if as_vec is False:
+            return extents
+        return gp_Vec(*extents[:3]), gp_Vec(*extents[3:])
 
     def DisplayBBox(self, display, single=True):
         """Displays the bounding box on input display.
@@ -0,0 +1,478 @@
+# -*- coding: utf-8 -*-
+"""
+NumPy B-spline utilities: knot vectors, basis matrices, evaluation and direct
+least-squares fitting.
+
+These functions work on plain arrays of poles and knots (full knot vectors,
+i.e. with knots repeated according to their multiplicity) and do not depend
+on OCC. See airconics.AirCONICStools.bspline_from_arrays for conversion of
+the results to an OCC Geom_BSplineCurve.
+"""
+import numpy as np
+from collections import OrderedDict
+
+
+# Least-squares fitting operators, keyed on the sampling layout
+_FIT_OPERATORS = OrderedDict()
+_FIT_OPERATORS_MAXSIZE = 128
+
+
+def clamped_knots(n_poles, degree):
+    """Returns the full, clamped knot vector with uniformly spaced interior
+    knots on [0, 1]
+
+    Parameters
+    ----------
+    n_poles : int
+        Number of control points
+
+    degree : int
+
+    Returns
+    -------
+    knots : array of float, length n_poles + degree + 1
+    """
+    assert(n_poles > degree), \
+        "At least degree + 1 poles are required, found {}".format(n_poles)
+    inner = np.linspace(0, 1, n_poles - degree + 1)
+    return np.hstack([np.zeros(degree), inner, np.ones(degree)])
+
+
+def knots_to_multiplicities(knots, tol=1e-12):
+    """Converts a full knot vector to unique knots and multiplicities (the
+    representation used by OCC)
+
+    Returns
+    -------
+    unique_knots : array of float
+
+    mults : array of int
+    """
+    knots = np.asarray(knots, dtype=float)
+    new = np.hstack([True, np.diff(knots) > tol])
+    starts = np.flatnonzero(new)
+    mults = np.diff(np.hstack([starts, len(knots)]))
+    return knots[starts], mults
+
+
+def multiplicities_to_knots(unique_knots, mults):
+    """Inverse of knots_to_multiplicities: returns the full knot vector"""
+    return np.repeat(np.asarray(unique_knots, dtype=float),
+                     np.asarray(mults, dtype=int))
+
+
+def basis_matrix(params, knots, degree):
+    """Evaluates all B-spline basis functions at params (Cox-de Boor
+    recursion, vectorised over params)
+
+    Parameters
+    ----------
+    params : array of float, shape (M,)
+        Parameter values, within the range of knots
+
+    knots : array of float
+        Full knot vector
+
+    degree : int
+
+    Returns
+    -------
+    N : array of float, shape (M, len(knots) - degree - 1)
+        N[i, j] is the j'th basis function evaluated at params[i]
+    """
+    params = np.asarray(params, dtype=float)
+    knots = np.asarray(knots, dtype=float)
+    u = params[:, None]
+    N = ((knots[:-1] <= u) & (u < knots[1:])).astype(float)
+    # The last parameter value belongs to the last non-empty knot span:
+    last_span = np.flatnonzero(knots[:-1] < knots[1:])[-1]
+    at_end = params >= knots[-1]
+    N[at_end] = 0.
+    N[at_end, last_span] = 1.
+
+    for k in range(1, degree + 1):
+        left = knots[k:-1] - knots[:-k - 1]
+        right = knots[k + 1:] - knots[1:-k]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = np.where(left > 0, (u - knots[:-k - 1]) / left, 0.)
+            b = np.where(right > 0, (knots[k + 1:] - u) / right, 0.)
+        N = a * N[:, :-1] + b * N[:, 1:]
+    return N
+
+
+def evaluate(poles, knots, degree, params, weights=None):
+    """Evaluates a (possibly rational) B-spline curve at params
+
+    Parameters
+    ----------
+    poles : array of float, shape (n_poles, dim)
+
+    knots : array of float
+        Full knot vector
+
+    degree : int
+
+    params : array of float, shape (M,)
+
+    weights : array of float, shape (n_poles,) (default None)
+        Pole weights of a rational curve
+
+    Returns
+    -------
+    points : array of float, shape (M, dim)
+    """
+    N = basis_matrix(params, knots, degree)
+    poles = np.asarray(poles, dtype=float)
+    if weights is None:
+        return N.dot(poles)
+    weights = np.asarray(weights, dtype=float)
+    Nw = N * weights
+    return Nw.dot(poles) / Nw.sum(axis=1)[:, None]
+
+
+def centripetal_parameters(points):
+    """Returns centripetal parameter values in [0, 1] for a polyline of
+    points (shape (M, dim))"""
+    steps = np.sqrt(np.linalg.norm(np.diff(points, axis=0), axis=1))
+    params = np.hstack([0, np.cumsum(steps)])
+    return params / params[-1]
+
+
+def airfoil_parameters(x):
+    """Returns curve parameter values in [0, 1] for airfoil points ordered from
+    the upper trailing edge, round the leading edge, to the lower trailing
+    edge.
+
+    The parametrisation depends on the chordwise abscissa only,
+    u = (1 -/+ sqrt(x')) / 2 on the upper/lower surface, where x' is the
+    normalised abscissa. This follows the arc length closely around a round
+    leading edge, and is identical for all airfoils sampled on the same
+    abscissa (e.g. NACA4 profiles sampled with act.coslin), so that they
+    share the same fitting operator.
+
+    Parameters
+    ----------
+    x : array of float, shape (M,)
+        Chordwise abscissa of the airfoil points (or of the sampling layout)
+
+    Returns
+    -------
+    params : array of float, shape (M,)
+    """
+    x = np.asarray(x, dtype=float)
+    iLE = np.argmin(x)
+    s = np.sqrt(np.clip((x - x[iLE]) / (np.max(x) - x[iLE]), 0, 1))
+    return np.where(np.arange(len(x)) <= iLE, (1 - s) / 2., (1 + s) / 2.)
+
+
+def _fit_operator(params_bytes, n_points, degree, n_poles):
+    params = np.frombuffer(params_bytes, dtype=float, count=n_points)
+    knots = clamped_knots(n_poles, degree)
+    N = basis_matrix(params, knots, degree)
+
+    # The end poles interpolate the end points. The interior poles are the
+    # least-squares solution of
+    #    N[:, 1:-1] P = Q - N[:, 0] Q_0 - N[:, -1] Q_end,
+    # which is linear in the points Q: store it as one (n_poles, n_points)
+    # matrix so that poles = operator.dot(Q)
+    rhs = np.eye(n_points)
+    rhs[:, 0] -= N[:, 0]
+    rhs[:, -1] -= N[:, -1]
+    operator = np.zeros([n_poles, n_points])
+    operator[0, 0] = 1.
+    operator[-1, -1] = 1.
+    operator[1:-1] = np.linalg.pinv(N[:, 1:-1]).dot(rhs)
+
+    knots.flags.writeable = False
+    operator.flags.writeable = False
+    return knots, operator
+
+
+def fit_operator(params, degree=3, n_poles=None):
+    """Returns the knot vector and least-squares fitting operator for a
+    sampling layout.
+
+    The operator is computed once per (params, degree, n_poles) and cached,
+    so that fitting any number of point sets sampled on the same layout
+    costs a single matrix product each, and all fits share one knot vector.
+
+    Parameters
+    ----------
+    params : array of float, shape (M,)
+        Strictly increasing parameter values of the points, from 0 to 1
+
+    degree : int (default 3)
+
+    n_poles : int (default None)
+        Number of poles of the fitted curve. Defaults to M // 2 (but at least
+        degree + 1)
+
+    Returns
+    -------
+    knots : array of float
+        Full clamped knot vector (read-only)
+
+    operator : array of float, shape (n_poles, M)
+        poles = operator.dot(points) (read-only)
+    """
+    params = np.ascontiguousarray(params, dtype=float)
+    n_points = len(params)
+    if n_poles is None:
+        n_poles = max(n_points // 2, degree + 1)
+    assert(degree < n_poles <= n_points), \
+        "Need degree < n_poles <= number of points"
+    assert(np.all(np.diff(params) > 0)), \
+        "Parameter values must be strictly increasing"
+
+    key = (params.tobytes(), n_points, degree, n_poles)
+    try:
+        result = _FIT_OPERATORS.pop(key)
+    except KeyError:
+        result = _fit_operator(*key)
+    _FIT_OPERATORS[key] = result
+    while len(_FIT_OPERATORS) > _FIT_OPERATORS_MAXSIZE:
+        _FIT_OPERATORS.popitem(last=False)
+    return result
+
+
+def fit_poles(points, params, degree=3, n_poles=None):
+    """Least-squares B-spline fit of points sampled at params, interpolating
+    the end points.
+
+    Parameters
+    ----------
+    points : array of float, shape (M, dim)
+
+    params : array of float, shape (M,)
+        see fit_operator
+
+    degree, n_poles : int
+        see fit_operator
+
+    Returns
+    -------
+    poles : array of float, shape (n_poles, dim)
+
+    knots : array of float
+        Full knot vector
+    """
+    knots, operator = fit_operator(params, degree, n_poles)
+    return operator.dot(np.asarray(points, dtype=float)), knots
+
+
+def averaged_knots(params, degree):
+    """Returns the full, clamped knot vector for interpolation of points at
+    params, with interior knots averaged from the parameters (Piegl & Tiller,
+    The NURBS Book, eq. 9.8), so that the interpolation system is well
+    conditioned
+
+    Parameters
+    ----------
+    params : array of float, shape (M,)
+        Strictly increasing parameter values from 0 to 1
+
+    degree : int
+        Less than M
+
+    Returns
+    -------
+    knots : array of float, length M + degree + 1
+    """
+    params = np.asarray(params, dtype=float)
+    n = len(params)
+    assert(degree < n), "Need more points than the degree"
+    inner = [np.mean(params[j:j + degree]) for j in range(1, n - degree)]
+    return np.hstack([np.zeros(degree + 1), inner, np.ones(degree + 1)])
+
+
+def interpolate_poles(points, params, degree=3):
+    """B-spline interpolation of points at params
+
+    Parameters
+    ----------
+    points : array of float, shape (M, ...)
+        Points (or any arrays of values, e.g. the pole arrays of M compatible
+        curves, shape (M, Npoles, 3)) to interpolate
+
+    params : array of float, shape (M,)
+        Strictly increasing parameter values from 0 to 1
+
+    degree : int (default 3)
+        Reduced to M - 1 if there are too few points
+
+    Returns
+    -------
+    poles : array of float, same shape as points
+
+    knots : array of float
+        Full knot vector (see averaged_knots)
+
+    degree : int
+        The degree used
+    """
+    points = np.asarray(points, dtype=float)
+    degree = min(degree, len(points) - 1)
+    knots = averaged_knots(params, degree)
+    N = basis_matrix(params, knots, degree)
+    poles = np.linalg.solve(N, points.reshape(len(points), -1))
+    return poles.reshape(points.shape), knots, degree
+
+
+def derivative(poles, knots, degree):
+    """Returns the poles, knots and degree of the derivative of a
+    (non-rational) B-spline curve
+
+    Parameters
+    ----------
+    poles : array of float, shape (n_poles, ...)
+
+    knots : array of float
+        Full knot vector
+
+    degree : int
+
+    Returns
+    -------
+    poles : array of float, shape (n_poles - 1, ...)
+
+    knots : array of float
+
+    degree : int
+    """
+    poles = np.asarray(poles, dtype=float)
+    knots = np.asarray(knots, dtype=float)
+    if degree == 0:
+        return np.zeros_like(poles[:1]), knots[1:-1], 0
+    spans = (knots[degree + 1:-1] - knots[1:-degree - 1])
+    spans = spans.reshape((-1,) + (1,) * (poles.ndim - 1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dpoles = np.where(spans > 0, degree * np.diff(poles, axis=0) / spans,
+                          0.)
+    return dpoles, knots[1:-1], degree - 1
+
+
+def _value_and_derivative(t, numerator, denominator, d_numerator,
+                          d_denominator, knots, degree):
+    """Evaluates x(t) = A(t) / W(t) and x'(t) for the coordinate splines A
+    and W (W is None for a non-rational curve)"""
+    N = basis_matrix(t, knots, degree)
+    a = N.dot(numerator)
+    if degree > 0:
+        da = basis_matrix(t, knots[1:-1], degree - 1).dot(d_numerator)
+    else:
+        da = np.zeros_like(a)
+    if denominator is None:
+        return a, da
+    w = N.dot(denominator)
+    dw = (basis_matrix(t, knots[1:-1], degree - 1).dot(d_denominator)
+          if degree > 0 else np.zeros_like(w))
+    x = a / w
+    return x, (da - x * dw) / w
+
+
+def solve_coordinate(poles, knots, degree, values, weights=None, axis=0,
+                     tol=1e-12, max_iterations=60):
+    """Finds all parameters at which one coordinate of a (possibly rational)
+    B-spline curve takes each of several values: e.g. the intersections of a
+    curve with planes x = X for an array of stations X.
+
+    Roots are bracketed by the sign changes of the coordinate sampled
+    densely in every knot span, then refined for all brackets at once with a
+    vectorised, bisection-safeguarded Newton iteration.
+
+    Parameters
+    ----------
+    poles : array of float, shape (n_poles, dim)
+
+    knots : array of float
+        Full knot vector
+
+    degree : int
+
+    values : array of float, shape (K,)
+        Target values of the coordinate
+
+    weights : array of float, shape (n_poles,) (default None)
+        Pole weights of a rational curve
+
+    axis : int (default 0)
+        The coordinate to solve for (0: x)
+
+    tol : scalar (default 1e-12)
+        Relative convergence tolerance on the parameter
+
+    max_iterations : int (default 60)
+
+    Returns
+    -------
+    index : array of int, shape (R,)
+        The index in values of each root, in increasing order
+
+    params : array of float, shape (R,)
+        The curve parameter of each root (increasing for each index)
+
+    Notes
+    -----
+    Roots at which the curve only touches the value (without crossing it)
+    between two samples are not found.
+    """
+    poles = np.asarray(poles, dtype=float)
+    knots = np.asarray(knots, dtype=float)
+    values = np.atleast_1d(np.asarray(values, dtype=float))
+    coordinate = poles[:, axis]
+    if weights is None:
+        numerator, denominator = coordinate, None
+        d_denominator = None
+    else:
+        denominator = np.asarray(weights, dtype=float)
+        numerator = coordinate * denominator
+        d_denominator = derivative(denominator, knots, degree)[0]
+    d_numerator = derivative(numerator, knots, degree)[0]
+
+    # Dense samples in each non-empty knot span:
+    unique = np.unique(knots[degree:len(knots) - degree])
+    per_span = np.linspace(0, 1, 4 * degree + 2)[:-1]
+    grid = (unique[:-1, None] + np.diff(unique)[:, None] * per_span).ravel()
+    grid = np.hstack([grid, unique[-1]])
+    x, dx = _value_and_derivative(grid, numerator, denominator,
+                                  d_numerator, d_denominator, knots, degree)
+
+    f = x[None, :] - values[:, None]
+    # Exact roots at samples, and brackets of sign changes:
+    k0, j0 = np.nonzero(f == 0)
+    k1, j1 = np.nonzero(f[:, :-1] * f[:, 1:] < 0)
+    lo = grid[j1].copy()
+    hi = grid[j1 + 1].copy()
+    f_lo = f[k1, j1]
+    target = values[k1]
+
+    scale = tol * max(unique[-1] - unique[0], 1.)
+    t = 0.5 * (lo + hi)
+    active = np.ones(len(t), dtype=bool)
+    for iteration in range(max_iterations):
+        if not np.any(active):
+            break
+        ft, dft = _value_and_derivative(t[active], numerator, denominator,
+                                        d_numerator, d_denominator, knots,
+                                        degree)
+        ft = ft - target[active]
+        a, b, fa = lo[active], hi[active], f_lo[active]
+        # Shrink the brackets:
+        same = np.sign(ft) == np.sign(fa)
+        a = np.where(same, t[active], a)
+        fa = np.where(same, ft, fa)
+        b = np.where(same, b, t[active])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = t[active] - ft / dft
+        inside = np.isfinite(newton) & (newton > a) & (newton < b)
+        t_new = np.where(inside, newton, 0.5 * (a + b))
+        converged = (np.abs(t_new - t[active]) < scale) | (ft == 0)
+        lo[active], hi[active], f_lo[active] = a, b, fa
+        t[active] = np.where(ft == 0, t[active], t_new)
+        idx = np.flatnonzero(active)
+        active[idx[converged]] = False
+
+    index = np.hstack([k0, k1]).astype(int)
+    params = np.hstack([grid[j0], t])
+    order = np.lexsort((params, index))
+    return index[order], params[order]
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+Design of experiments (parameter sweep) runner for parametric parts and
+aircraft
+
+A factory function (e.g. one building a LiftingSurface, Fuselage or a whole
+aircraft Topology from a few design variables) is called for every design in
+a parameter grid or sample set. The builds are spread over a process pool,
+and one row of metrics per design is appended to a CSV file as soon as the
+design finishes:
+
+>>> from airconics import doe
+>>> designs = doe.parameter_grid(ChordFactor=[0.8, 1.0, 1.2],
+...                              ScaleFactor=[40, 45, 50])
+>>> doe.run_doe(my_wing_factory, designs, 'wing_doe.csv', export=['step'])
+
+Each row records the design parameters, the metrics, the status of the build
+('ok', 'failed' for an exception in the factory, or 'crashed' if the build
+killed its worker process) and the build time. A failed design does not stop
+the batch, and running the same DOE again skips the designs already in the
+file, so that an interrupted run is resumed where it stopped.
+
+The factory must be picklable (a module level function) unless the designs
+are run in process (max_workers=0).
+"""
+import os
+import csv
+import time
+import itertools
+import traceback
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from .part_cache import stable_hash
+
+
+# Lifting surface metrics, recorded by default (attributes which a part does
+# not have are left empty)
+DEFAULT_METRICS = ('LSP_area', 'AR', 'ActualSemiSpan', 'RootChord', 'SA')
+
+# Columns of the output file before the parameters and metrics
+RESULT_COLUMNS = ('design_id', 'status', 'build_time', 'error')
+
+# File extension of each export format
+EXPORT_EXTENSIONS = {'step': '.stp', 'stp': '.stp', 'stl': '.stl'}
+
+
+def parameter_grid(**levels):
+    """Returns the full factorial set of designs of the given parameter
+    levels
+
+    Parameters
+    ----------
+    **levels : sequence
+        The values of each parameter
+
+    Returns
+    -------
+    designs : list of dict
+        One mapping of parameter name to value per design
+
+    Examples
+    --------
+    >>> parameter_grid(ChordFactor=[1, 1.2], ScaleFactor=[40, 50])
+    [{'ChordFactor': 1, 'ScaleFactor': 40}, {'ChordFactor': 1,
+      'ScaleFactor': 50}, ...]
+    """
+    names = list(levels)
+    return [dict(zip(names, values))
+            for values in itertools.product(*[levels[name]
+                                              for name in names])]
+
+
+def latin_hypercube(n_samples, seed=None, **bounds):
+    """Returns n_samples designs in a latin hypercube of the parameter bounds
+
+    Parameters
+    ----------
+    n_samples : int
+
+    seed : int (default None)
+        Seed of the random number generator, for repeatable (and therefore
+        resumable) sample sets
+
+    **bounds : tuple of float
+        (lower, upper) bound of each parameter
+
+    Returns
+    -------
+    designs : list of dict
+        One mapping of parameter name to value per design
+    """
+    rng = np.random.RandomState(seed)
+    names = list(bounds)
+    lower, upper = np.array([bounds[name] for name in names], dtype=float).T
+    # One sample in each of n_samples equal intervals of every parameter,
+    # with the intervals randomly paired between parameters:
+    strata = np.array([rng.permutation(n_samples) for name in names]).T
+    unit = (strata + rng.uniform(size=strata.shape)) / n_samples
+    samples = lower + unit * (upper - lower)
+    return [dict(zip(names, row)) for row in samples.tolist()]
+
+
+def design_id(params):
+    """Returns the identifier of a design: a hash of its parameters, which is
+    used to recognise designs already in the output file when resuming"""
+    return stable_hash(sorted(params.items()))[:16]
+
+
+def _run_design(factory, params, identifier, metrics, evaluate, export,
+                export_dir):
+    """Builds and evaluates one design. Exceptions are caught and reported in
+    the returned row, so that one bad design does not end the batch"""
+    row = {'design_id': identifier}
+    row.update(params)
+    t0 = time.perf_counter()
+    try:
+        part = factory(**params)
+        if evaluate is None:
+            row.update((name, getattr(part, name, None)) for name in metrics)
+        else:
+            values = evaluate(part)
+            row.update((name, values.get(name)) for name in metrics)
+        for fmt in export:
+            filename = os.path.join(export_dir,
+                                    identifier + EXPORT_EXTENSIONS[fmt])
+            part.Write(filename, single_export=(fmt != 'stl'))
+        row['status'] = 'ok'
+    except Exception as e:
+        row['status'] = 'failed'
+        row['error'] = traceback.format_exception_only(type(e), e)[-1].strip()
+    row['build_time'] = time.perf_counter() - t0
+    return row
+
+
+class _ResultsFile(object):
+    """Appends rows to the CSV output, flushing after every row"""
+    def __init__(self, filename, columns, resume):
+        self.columns = list(columns)
+        self.done = {}
+        if resume and os.path.isfile(filename):
+            with open(filename, 'r', newline='') as fin:
+                reader = csv.reader(fin)
+                header = next(reader, None)
+                if header is not None and header != self.columns:
+                    raise ValueError(
+                        "Columns of existing file {} do not match this DOE: "
+                        "use another output file, or resume=False to "
+                        "overwrite it".format(filename))
+                for row in reader:
+                    # A row cut short by a crash is ignored (and rerun)
+                    if len(row) == len(self.columns):
+                        self.done[row[0]] = row[1]
+            with open(filename, 'rb') as fin:
+                fin.seek(0, os.SEEK_END)
+                if fin.tell():
+                    fin.seek(-1, os.SEEK_END)
+                    partial_line = fin.read(1) != b'\n'
+                else:
+                    partial_line = False
+            self._file = open(filename, 'a', newline='')
+            if partial_line:
+                self._file.write('\n')
+            if header is None:
+                self._write(self.columns)
+        else:
+            self._file = open(filename, 'w', newline='')
+            self._write(self.columns)
+
+    def _write(self, values):
+        csv.writer(self._file).writerow(values)
+        self._file.flush()
+
+    def append(self, row):
+        self._write(['' if row.get(name) is None else row[name]
+                     for name in self.columns])
+        self.done[row['design_id']] = row['status']
+
+    def close(self):
+        self._file.close()
+
+
+def run_doe(factory, designs, filename, metrics=DEFAULT_METRICS,
+            evaluate=None, max_workers=None, export=(), export_dir=None,
+            resume=True, retry_failed=False):
+    """Builds every design with factory in a process pool, and streams the
+    metrics of each design to a CSV file as it finishes
+
+    Parameters
+    ----------
+    factory : callable
+        Called as factory(**params) for the params of each design, returning
+        the built part (an AirconicsShape or AirconicsCollection e.g. a
+        Topology). Must be picklable if max_workers is not 0
+
+    designs : list of dict
+        Mapping of parameter name to value for each design, e.g. from
+        parameter_grid or latin_hypercube
+
+    filename : string
+        The output CSV file. Columns are RESULT_COLUMNS, then the parameter
+        names (in order of first appearance in designs), then the metrics
+
+    metrics : sequence of string (default DEFAULT_METRICS)
+        Names of the metrics to record: by default, attributes of the part
+
+    evaluate : callable (default None)
+        If given, called as evaluate(part) to return a dict of metric name to
+        value instead of reading the metrics from part attributes. Must be
+        picklable if max_workers is not 0
+
+    max_workers : int (default None)
+        Number of worker processes (default: the number of processors). If
+        0, designs are built one after another in this process
+
+    export : sequence of string (default ())
+        Geometry formats to write for each successful design, any of 'step'
+        and 'stl'. Files are named by design_id
+
+    export_dir : string (default None)
+        Directory for the exported geometry. Defaults to the directory of
+        filename
+
+    resume : bool (default True)
+        If True, and filename exists, designs already recorded in it are not
+        rebuilt. Otherwise the file is overwritten
+
+    retry_failed : bool (default False)
+        If resuming, rebuild the designs recorded as failed or crashed
+
+    Returns
+    -------
+    status : dict
+        Mapping of design_id to status of all designs in the file
+
+    Notes
+    -----
+    A worker process which dies during a build (e.g. a segmentation fault in
+    OCC) breaks the process pool, and all unfinished designs (running or
+    queued) are lost. These are split in two halves, each run in a fresh
+    pool of max_workers processes, and any half which breaks the pool again
+    is split again, until the design which crashes is run on its own: it is
+    then recorded with status 'crashed'. The designs which do not crash are
+    therefore still built in parallel.
+    """
+    export = [fmt.lower() for fmt in export]
+    for fmt in export:
+        if fmt not in EXPORT_EXTENSIONS:
+            raise ValueError("Unknown export format {}: expected any of {}"
+                             .format(fmt, sorted(EXPORT_EXTENSIONS)))
+    if export_dir is None:
+        export_dir = os.path.dirname(os.path.abspath(filename))
+    if export and not os.path.isdir(export_dir):
+        os.makedirs(export_dir)
+
+    metrics = list(metrics)
+    param_names = []
+    for params in designs:
+        param_names.extend(name for name in params if name not in param_names)
+    columns = list(RESULT_COLUMNS) + param_names + metrics
+
+    results = _ResultsFile(filename, columns, resume)
+    try:
+        skip = ('ok',) if retry_failed else ('ok', 'failed', 'crashed')
+        pending = []
+        for params in designs:
+            identifier = design_id(params)
+            if results.done.get(identifier) not in skip:
+                pending.append((identifier, params))
+        # Remove duplicate designs
+        pending = list(dict(pending).items())
+
+        if max_workers == 0:
+            for identifier, params in pending:
+                results.append(_run_design(factory, params, identifier,
+                                           metrics, evaluate, export,
+                                           export_dir))
+            return dict(results.done)
+
+        # Batches of designs to run in one pool: the unfinished designs of a
+        # batch which broke the pool are bisected (see Notes)
+        batches = deque([pending] if pending else [])
+        while batches:
+            batch = batches.popleft()
+            workers = 1 if len(batch) == 1 else max_workers
+
+            broken = set()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(_run_design, factory, params,
+                                           identifier, metrics, evaluate,
+                                           export, export_dir): identifier
+                           for identifier, params in batch}
+                for future in as_completed(futures):
+                    try:
+                        results.append(future.result())
+                    except BrokenProcessPool:
+                        broken.add(futures[future])
+
+            if not broken:
+                continue
+            elif len(batch) == 1:
+                identifier, params = batch[0]
+                row = {'design_id': identifier, 'status': 'crashed',
+                       'error': 'Worker process died during the build'}
+                row.update(params)
+                results.append(row)
+            else:
+                unfinished = [(identifier, params)
+                              for identifier, params in batch
+                              if identifier in broken]
+                half = (len(unfinished) + 1) // 2
+                batches.extend(part for part in (unfinished[:half],
+                                                 unfinished[half:]) if part)
+    finally:
+        results.close()
+    return dict(results.done)
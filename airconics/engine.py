@@ -9,6 +9,8 @@ Created on Wed Feb 10 16:38:47 2016
 from . import primitives, AirCONICStools as act
 from .liftingsurface import LiftingSurface
 from .base import AirconicsShape
+from . import part_cache
+from . import profiling
 import numpy as np
 from .examples import wing_example_transonic_airliner as wingex
 from OCC.Core.gp import gp_Pnt, gp_Vec, gp_OY, gp_Dir
@@ -63,6 +65,10 @@ class Engine(AirconicsShape):
     airconics.base.AirconicsShape, airconics.primitives.Airfoil
     """
 
+    # Parameters of Build used by the part cache
+    CacheAttributes = ('HChord', 'CentreLocation', 'ScarfAngle',
+                       'HighlightRadius', 'MeanNacelleLength')
+
     def __init__(self,
                  HChord=0,
                  CentreLocation=[0, 0, 0],
@@ -88,17 +94,22 @@ class Engine(AirconicsShape):
                                      MeanNacelleLength=MeanNacelleLength,
                                      )
 
+    @profiling.timed()
+    @part_cache.cached_build
     def Build(self):
         """Currently only calls BuildTurbofanNacelle.
 
         Notes
         -----
-        May add options for other engine types
+        May add options for other engine types. The result is restored from
+        the part cache (see airconics.part_cache) if an identical engine was
+        built before
         """
         super(Engine, self).Build()
         self.BuildTurbofanNacelle()
         return None
 
+    @profiling.timed()
     def BuildTurbofanNacelle(self):
         """
         The defaults yield a nacelle similar to that of an RR Trent 1000 / GEnx
@@ -164,8 +175,7 @@ class Engine(AirconicsShape):
                                              gp_Vec(HighlightDepth, 0, 0))
 
 #         Build the actual airfoil sections to define the nacelle
-        HighlightPointVector = act.Uniform_Points_on_Curve(
-            Highlight, SectionNo)
+        HighlightPoints = act.sample_curve(Highlight, SectionNo)
 
         Sections = []
         TailPoints = []
@@ -174,9 +184,9 @@ class Engine(AirconicsShape):
 
         Rotations = np.linspace(0, 360, SectionNo)
 
-        for i, pt in enumerate(HighlightPointVector):
-            AfChord = MeanNacelleLength - pt.X()
-            Af = primitives.Airfoil([pt.X(), pt.Y(), pt.Z()], AfChord,
+        for i, pt in enumerate(HighlightPoints.tolist()):
+            AfChord = MeanNacelleLength - pt[0]
+            Af = primitives.Airfoil(pt, AfChord,
                                     Rotations[i], Twist,
                                     SeligProfile=AirfoilSeligName).Curve
             Sections.append(Af)
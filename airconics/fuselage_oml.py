@@ -20,6 +20,8 @@ from six.moves import range
 from . import AirCONICStools as act
 import numpy as np
 from .base import AirconicsShape
+from . import part_cache
+from . import profiling
 
 from OCC.Core.gp import gp_Pnt, gp_Vec, gp_Pln, gp_Dir, gp_Ax2
 from OCC.Core.Geom import Geom_BSplineCurve, Geom_Plane
@@ -64,6 +66,12 @@ class Fuselage(AirconicsShape):
     BuildFuselageOML function
     """
 
+    # Parameters and outputs of Build stored by the part cache
+    CacheAttributes = ('NoseLengthRatio', 'TailLengthRatio', 'Scaling',
+                       'NoseCoordinates', 'CylindricalMidSection',
+                       'SimplificationReqd', 'Max_attempt')
+    CacheOutputs = ('BowPoint', 'SternPoint')
+
     def __init__(self, NoseLengthRatio=0.182,
                  TailLengthRatio=0.293,
                  Scaling=[55.902, 55.902, 55.902],
@@ -85,10 +93,18 @@ class Fuselage(AirconicsShape):
                                        Max_attempt=Maxi_attempt,
                                        construct_geometry=construct_geometry)
 
+    @profiling.timed()
+    @part_cache.cached_build
     def Build(self):
         """Overrides the AirconicsShape empty Build method.
 
         Calls BuildFuselageOML, which has been maintained for older versions.
+
+        Notes
+        -----
+        The result is restored from the part cache (see airconics.part_cache)
+        if an identical fuselage was built before, in which case the
+        construction curves (_Lguides, _Csections) are not generated.
         """
         super(Fuselage, self).Build()
         self.BuildFuselageOML(self.Max_attempt)
@@ -160,6 +176,7 @@ class Fuselage(AirconicsShape):
 
         return AFSVUpper, AFSVLower
 
+    @profiling.timed()
     def FuselageLongitudinalGuideCurves(self, NoseLengthRatio,
                                         TailLengthRatio):
         """Internal function. Defines the four longitudinal curves that outline
@@ -272,6 +289,7 @@ class Fuselage(AirconicsShape):
         return (HStarboardCurve, HPortCurve, FSVUCurve, FSVLCurve,
                 FSVMeanCurve, NoseEndX, TailStartX, EndX)
 
+    @profiling.timed()
     def BuildFuselageOML(self, Max_attempt=5):
         """Builds the Fuselage outer mould line
         Notes
@@ -336,24 +354,29 @@ class Fuselage(AirconicsShape):
             C = []
             FirstTime = True
 
-            for i, XStation in enumerate(StationRange[1:]):
-                # Create plane normal to x direction
-                P = Geom_Plane(gp_Pln(gp_Pnt(XStation, 0, 0),
-                                      gp_Dir(gp_Vec(1, 0, 0))))
-                # Make into a face for visualisation/debugging
-                try:
-                    IPoint2 = act.points_from_intersection(P, FSVUCurve)
-                    IPoint3 = act.points_from_intersection(P, PortCurve)
-                    IPoint4 = act.points_from_intersection(P, FSVLCurve)
-                    IPoint1 = act.points_from_intersection(P, StarboardCurve)
-#
-                    IPointCentre = act.points_from_intersection(P,
-                                                                FSVMeanCurve)
-                except RuntimeError:
+            # Intersect the guide curves with the planes normal to x at all
+            # stations at once: one (Nstations, 3) array per curve
+            Stations = StationRange[1:]
+            UpperPoints, PortPoints, LowerPoints, StarboardPoints, \
+                CentrePoints = [act.points_at_coordinate(curve, Stations)
+                                for curve in [FSVUCurve, PortCurve,
+                                              FSVLCurve, StarboardCurve,
+                                              FSVMeanCurve]]
+            Found = np.all(np.isfinite(np.hstack(
+                [UpperPoints, PortPoints, LowerPoints, StarboardPoints,
+                 CentrePoints])), axis=1)
+
+            for i, XStation in enumerate(Stations):
+                if not Found[i]:
                     print("Intersection Points at Section X={} Not Found"
                           .format(XStation))
                     print("Skipping this plane location")
                     continue
+                IPoint2 = gp_Pnt(*UpperPoints[i].tolist())
+                IPoint3 = gp_Pnt(*PortPoints[i].tolist())
+                IPoint4 = gp_Pnt(*LowerPoints[i].tolist())
+                IPoint1 = gp_Pnt(*StarboardPoints[i].tolist())
+                IPointCentre = gp_Pnt(*CentrePoints[i].tolist())
 
                 PseudoDiameter = abs(IPoint4.Z() - IPoint2.Z())
                 if self.CylindricalMidSection and\
@@ -437,6 +460,7 @@ class Fuselage(AirconicsShape):
         # Shouldnt get here
         return None
 
+    @profiling.timed()
     def TransformOML(self):
         """Use parameters defined in self to scale and translate the fuselage
         """
@@ -593,6 +617,8 @@ if __name__ == '__main__':
     from OCC.Display.SimpleGui import init_display
     display, start_display, add_menu, add_function_to_menu = init_display()
 
+    # The construction curves displayed below are not stored in the cache:
+    Fuselage.use_part_cache = False
     Fus = Fuselage(NoseLengthRatio=0.182,
                    TailLengthRatio=0.293,
                    Scaling=[55.902, 55.902, 55.902],
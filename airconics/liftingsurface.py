@@ -14,10 +14,19 @@ Created on Fri Dec 18 15:52:58 2015
 @author: pchambers
 """
 from six.moves import range
+import time
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from functools import wraps
+import heapq
 import numpy as np
 from .base import AirconicsShape
 from .primitives import Airfoil
 from . import AirCONICStools as act
+from . import part_cache
+from . import profiling
 
 from OCC.Core.gp import gp_Pnt, gp_Vec, gp_XOY, gp_Ax3, gp_Dir
 from OCC.Core.GeomAbs import GeomAbs_C2
@@ -64,11 +73,18 @@ def airfoilfunct(ProfileFunct):
 
     Where mySweepFunct has been previously defined.
 
+    AirfoilFunct takes the name of ProfileFunct, so that a module level
+    decorated function can be pickled, and the input profile function is
+    available as AirfoilFunct.ProfileFunct: this allows LiftingSurface to
+    generate the sections in worker processes (see LiftingSurface
+    max_workers).
+
     See Also
     --------
     airconics.primitives.Airfoil,
     core examples liftingsurface_airfoilfunct_decorator
     """
+    @wraps(ProfileFunct)
     def AirfoilFunct(Epsilon, LEPoint, ChordFunct, ChordFactor,
                      DihedralFunct, TwistFunct):
         # Wraps ProfileFunct
@@ -82,6 +98,7 @@ def airfoilfunct(ProfileFunct):
                      Twist=TwistFunct(Epsilon),
                      **Profile_Dict)
         return Af
+    AirfoilFunct.ProfileFunct = ProfileFunct
     return AirfoilFunct
 
     def uniform_parametric_function(epsilon):
@@ -91,6 +108,323 @@ def airfoilfunct(ProfileFunct):
     return uniform_parametric_function
 
 
+def _section_curve_arrays(AirfoilFunct, kwargs):
+    """Generates a section with AirfoilFunct(**kwargs) and returns its fitted
+    curve as arrays (see act.bspline_to_arrays): run by the worker processes
+    of LiftingSurface._GenerateSectionsParallel.
+
+    AirfoilFunct may be given as a tuple (ProfileFunct,), in which case it is
+    recreated here with the airfoilfunct decorator"""
+    if isinstance(AirfoilFunct, tuple):
+        AirfoilFunct = airfoilfunct(*AirfoilFunct)
+    Af = AirfoilFunct(**kwargs)
+    return act.bspline_to_arrays(Af.Curve)
+
+
+# The worker pool of _GenerateSectionsParallel, shared by all lifting surfaces
+_SECTION_EXECUTOR = None
+_SECTION_EXECUTOR_WORKERS = None
+_SECTION_EXECUTOR_LOCK = threading.Lock()
+
+
+def _section_executor(max_workers):
+    """Returns the process pool used to generate sections in parallel,
+    creating it on first use or if max_workers has changed. The pool is kept
+    for later builds, so that the worker start-up cost is only paid once"""
+    global _SECTION_EXECUTOR, _SECTION_EXECUTOR_WORKERS
+    with _SECTION_EXECUTOR_LOCK:
+        if (_SECTION_EXECUTOR is None or
+                _SECTION_EXECUTOR_WORKERS != max_workers):
+            if _SECTION_EXECUTOR is not None:
+                _SECTION_EXECUTOR.shutdown(wait=False)
+            _SECTION_EXECUTOR = ProcessPoolExecutor(max_workers=max_workers)
+            _SECTION_EXECUTOR_WORKERS = max_workers
+        return _SECTION_EXECUTOR
+
+
+def shutdown_section_workers():
+    """Shuts down the worker processes kept for parallel section generation
+    (see LiftingSurface max_workers). A new pool is started by the next
+    parallel build"""
+    global _SECTION_EXECUTOR, _SECTION_EXECUTOR_WORKERS
+    with _SECTION_EXECUTOR_LOCK:
+        if _SECTION_EXECUTOR is not None:
+            _SECTION_EXECUTOR.shutdown()
+        _SECTION_EXECUTOR = None
+        _SECTION_EXECUTOR_WORKERS = None
+
+
+class _TabulatedFunct(object):
+    """Spanwise function which returns a tabulated value at Epsilon, and
+    evaluates Funct anywhere else (see LiftingSurface._SectionFuncts)"""
+    def __init__(self, Funct, Epsilon, Value):
+        self.Funct = Funct
+        self.Epsilon = Epsilon
+        self.Value = Value
+
+    def __call__(self, Epsilon):
+        if np.ndim(Epsilon) == 0 and Epsilon == self.Epsilon:
+            return self.Value
+        return self.Funct(Epsilon)
+
+
+class SpanwiseTable(object):
+    """Values of the spanwise functional parameters of a lifting surface at
+    the section stations and at the segment midpoints
+
+    Each function is evaluated in a single call over all stations and
+    midpoints if it accepts numpy arrays, or element by element if it does
+    not: this is probed once per function. A function is only reevaluated if
+    it, or the stations, change, or after Reset.
+
+    Attributes
+    ----------
+    Stations : array of float, shape (N,)
+        Spanwise coordinate epsilon of each section
+
+    Midpoints : array of float, shape (N - 1,)
+        Spanwise coordinate epsilon of the midpoint of each segment
+
+    Vectorised : dict
+        Mapping of function name to True if the function accepts arrays
+    """
+    def __init__(self):
+        self.Stations = np.zeros(0)
+        self.Midpoints = np.zeros(0)
+        self.Vectorised = {}
+        self._functs = {}
+        self._values = {}
+
+    def Update(self, Stations, **functs):
+        """Sets the stations and the spanwise functions, and evaluates any
+        that have changed
+
+        Parameters
+        ----------
+        Stations : array of float
+            Spanwise coordinates epsilon of the sections, increasing
+
+        **functs : function
+            Spanwise functions by name, e.g. Chord=myChordFunct
+
+        Returns
+        -------
+        updated : list of string
+            Names of the functions which were evaluated
+        """
+        Stations = np.asarray(Stations, dtype=float)
+        if not np.array_equal(Stations, self.Stations):
+            self.Stations = Stations
+            self.Midpoints = (Stations[:-1] + Stations[1:]) / 2.
+            self._values.clear()
+
+        updated = []
+        for name, funct in functs.items():
+            if self._functs.get(name) is not funct:
+                self._functs[name] = funct
+                self.Vectorised.pop(name, None)
+                self._values.pop(name, None)
+            if name not in self._values:
+                self._values[name] = self._Evaluate(name, funct)
+                updated.append(name)
+        return updated
+
+    def Reset(self):
+        """Discards the tabulated values, so that all functions are
+        reevaluated by the next Update (e.g. if their output depends on
+        mutable state)"""
+        self._values.clear()
+
+    def _Evaluate(self, name, funct):
+        Eps = np.hstack([self.Stations, self.Midpoints])
+        if self.Vectorised.get(name, True):
+            try:
+                values = funct(Eps)
+            except (TypeError, ValueError):
+                values = None
+            # If the shape of the output does not match the input, the
+            # function is not numpy compatible: use a for loop instead
+            self.Vectorised[name] = np.shape(values) == Eps.shape
+            if self.Vectorised[name]:
+                return np.asarray(values, dtype=float)
+        return np.array([funct(eps) for eps in Eps.tolist()], dtype=float)
+
+    def Values(self, name, midpoints=False):
+        """Returns the values of function name at the stations (or at the
+        segment midpoints if midpoints is True)"""
+        values = self._values[name]
+        n = len(self.Stations)
+        return values[n:] if midpoints else values[:n]
+
+
+def _leading_edge_points(Table):
+    """Returns the leading edge points (unit span, apex at the origin) at the
+    stations of a SpanwiseTable, from the sweep and dihedral angles at the
+    segment midpoints"""
+    SegmentLengths = np.diff(Table.Stations)
+
+#       We are essentially reconstructing a curve from known slopes at
+#       known curve length stations - a sort of Hermite interpolation
+#       without knowing the ordinate values. If NSegments -> Inf, the
+#       actual slope at each point -> the sweep angle specified by
+#       SweepFunct. The slopes are evaluated at the segment midpoints
+    Tilt_array = Table.Values('Dihedral', midpoints=True)
+    Sweep_array = Table.Values('Sweep', midpoints=True)
+
+    DeltaXs = SegmentLengths * np.sin(Sweep_array * (np.pi / 180.))
+    DeltaYs = SegmentLengths * np.cos(Tilt_array * np.pi / 180.) * \
+        np.cos(Sweep_array * np.pi / 180.)
+    DeltaZs = DeltaYs * np.tan(Tilt_array * np.pi / 180.)
+
+#    Initialise LE coordinate arrays and add first OCC gp_pnt at [0,0,0]:
+#    Note: Might be faster to bypass XLE arrays and use local x only
+    LEPoints = np.zeros((len(Table.Stations), 3))
+
+    Deltas = np.vstack([DeltaXs, DeltaYs, DeltaZs]).T
+    LEPoints[1:, :] = np.cumsum(Deltas, axis=0)
+    return LEPoints
+
+
+def adaptive_station_indices(Stations, Values, tolerance, max_segments):
+    """Selects a subset of finely sampled spanwise stations, such that linear
+    interpolation between the selected stations reproduces Values to within
+    tolerance.
+
+    The segment with the largest error is split at its worst sampled station
+    until all errors are within tolerance, or until there are max_segments
+    segments (i.e. Douglas-Peucker refinement, worst segment first).
+
+    Parameters
+    ----------
+    Stations : array of float, shape (N,)
+        Increasing spanwise coordinates of the samples
+
+    Values : array of float, shape (N, M)
+        The sampled quantities (e.g. leading edge coordinates, chord): the
+        error of a sample is the norm of its M interpolation errors
+
+    tolerance : scalar
+
+    max_segments : int
+
+    Returns
+    -------
+    indices : array of int
+        Sorted indices of the selected stations, including the first and last
+    """
+    Stations = np.asarray(Stations, dtype=float)
+    Values = np.asarray(Values, dtype=float).reshape(len(Stations), -1)
+
+    def worst(i, j):
+        if j - i < 2:
+            return 0., None
+        t = (Stations[i + 1:j] - Stations[i]) / (Stations[j] - Stations[i])
+        interp = Values[i] + t[:, None] * (Values[j] - Values[i])
+        errors = np.linalg.norm(Values[i + 1:j] - interp, axis=1)
+        k = np.argmax(errors)
+        return errors[k], i + 1 + k
+
+    last = len(Stations) - 1
+    selected = [0, last]
+    error, k = worst(0, last)
+    heap = [(-error, 0, last, k)]
+    while heap and len(selected) - 1 < max_segments:
+        error, i, j, k = heapq.heappop(heap)
+        if -error <= tolerance:
+            break
+        selected.append(k)
+        for a, b in [(i, k), (k, j)]:
+            error, split = worst(a, b)
+            if split is not None:
+                heapq.heappush(heap, (-error, a, b, split))
+    return np.array(sorted(selected))
+
+
+def _projected_chords_area(LE, TE):
+    """Returns the sum of the areas of the quadrilaterals (LE_i, TE_i,
+    TE_i+1, LE_i+1) projected on the xy plane (shoelace formula)"""
+    x = np.column_stack([LE[:-1, 0], TE[:-1, 0], TE[1:, 0], LE[1:, 0]])
+    y = np.column_stack([LE[:-1, 1], TE[:-1, 1], TE[1:, 1], LE[1:, 1]])
+    areas = 0.5 * np.abs(np.sum(x * np.roll(y, -1, axis=1) -
+                                y * np.roll(x, -1, axis=1), axis=1))
+    return float(np.sum(areas))
+
+
+def planform_metrics(LEPoints, ChordLengths, Twists, Perimeters,
+                     YRange=None, ScaleFactor=1):
+    """Computes the planform metrics of a lifting surface from its sections,
+    with numpy only (no OCC geometry is built)
+
+    Parameters
+    ----------
+    LEPoints : array of float, shape (N, 3)
+        Leading edge point of each section, before scaling
+
+    ChordLengths : array of float, shape (N,)
+        Chord length of each section (see primitives.Airfoil.ChordLength)
+
+    Twists : array of float, shape (N,)
+        Twist of each section, degrees
+
+    Perimeters : array of float, shape (N,)
+        Perimeter of each section
+
+    YRange : tuple of scalar (default None)
+        Minimum and maximum y coordinates of the sections. Defaults to the
+        range of the leading edge y coordinates
+
+    ScaleFactor : scalar (default 1)
+
+    Returns
+    -------
+    metrics : dict
+        'LSP_area' : projected area on the xy plane (see
+            LiftingSurface.CalculateProjectedArea)
+        'ActualSemiSpan' : y extent
+        'AR' : ActualSemiSpan ** 2 / LSP_area
+        'RootChord' : streamwise chord of the first section
+        'MAC' : mean aerodynamic chord, integral(c^2 ds) / integral(c ds),
+            with c the streamwise chord and s the distance between sections
+            in the yz plane
+        'SA' : approximate wetted area, the integral of the perimeter over s
+
+    Notes
+    -----
+    The sections are assumed to be linearly interpolated between stations,
+    so that the wetted area neglects the curvature of the surface between
+    sections.
+    """
+    LE = np.asarray(LEPoints, dtype=float)
+    ChordLengths = np.asarray(ChordLengths, dtype=float)
+    Perimeters = np.asarray(Perimeters, dtype=float)
+    t = np.radians(Twists)
+
+    # The chord is rotated about y by -Twist (see primitives.Airfoil)
+    TE = LE + ChordLengths[:, None] * np.column_stack(
+        [np.cos(t), np.zeros_like(t), np.sin(t)])
+    LSP_area = _projected_chords_area(LE, TE)
+
+    if YRange is None:
+        YRange = (np.min(LE[:, 1]), np.max(LE[:, 1]))
+    SemiSpan = YRange[1] - YRange[0]
+
+    # Integrals over the segments, assuming linear variation:
+    ds = np.linalg.norm(np.diff(LE[:, 1:], axis=0), axis=1)
+    c = ChordLengths * np.cos(t)
+    c1, c2 = c[:-1], c[1:]
+    area = np.sum(ds * (c1 + c2) / 2.)
+    MAC = (np.sum(ds * (c1 ** 2 + c1 * c2 + c2 ** 2) / 3.) / area
+           if area else c[0])
+    SA = np.sum(ds * (Perimeters[:-1] + Perimeters[1:]) / 2.)
+
+    return {'LSP_area': float(LSP_area * ScaleFactor ** 2),
+            'ActualSemiSpan': float(SemiSpan * ScaleFactor),
+            'AR': float(SemiSpan ** 2 / LSP_area) if LSP_area else None,
+            'RootChord': float(c[0] * ScaleFactor),
+            'MAC': float(MAC * ScaleFactor),
+            'SA': float(SA * ScaleFactor ** 2)}
+
+
 class LiftingSurface(AirconicsShape):
     """Airconics class for defining lifting surface shapes
 
@@ -132,7 +466,7 @@ class LiftingSurface(AirconicsShape):
 
     ScaleFactor - int (default = 1)
         Scaling factor applied in all directions (uniform). Updating will
-        rebuild the geometry.
+        scale the existing geometry (w.r.t. the ApexPoint).
 
     OptimizeChordScale - int or bool (default = 0)
         TODO: Not yet used.
@@ -141,9 +475,22 @@ class LiftingSurface(AirconicsShape):
         TODO:
 
     NSegments - int (default = 11)
-        Number of segments to sample the wing defined by input functions.
+        Number of segments to sample the wing defined by input functions
+        (the maximum number of segments if StationTolerance is set).
         Updating will rebuild the geometry.
 
+    StationTolerance - scalar (default None)
+        If None, the sections are spaced uniformly in epsilon. Otherwise, the
+        sections are placed adaptively where the leading edge, chord, twist
+        and dihedral vary fastest, with the fewest segments (up to NSegments)
+        for which linear interpolation between sections reproduces them to
+        within StationTolerance (see adaptive_station_indices). The
+        tolerance is in units of the unscaled leading edge (i.e. of a unit
+        span), with the twist and dihedral measured by the chordwise
+        displacement they produce. The airfoil profile is not sampled, so
+        that profile transitions should coincide with a change in one of
+        these functions. Updating will rebuild the geometry.
+
     TipRequired - bool (default = False)
         TODO: Not yet used
         adds the wing tip face to components if true
@@ -151,10 +498,25 @@ class LiftingSurface(AirconicsShape):
     max_degree - (default = 8)
         maximum degree of the fitted NURBS surface
 
+    max_workers - int (default None)
+        If greater than 1, the section curves are generated and fitted by a
+        pool of max_workers processes. This requires picklable (e.g. module
+        level) spanwise functions: otherwise the sections are generated
+        serially. Section order is preserved. The worker processes are
+        started by the first parallel build and reused by later builds (see
+        shutdown_section_workers)
+
     continuity - OCC.GeomAbs.GeomAbs_XX Type
         the order of continuity i.e. C^0, C^1, C^2... would be
         GeomAbs_C0, GeomAbs_C1, GeomAbs_C2 ...
 
+    direct_loft - bool (default False)
+        If True, and the sections are compatible B-spline curves (e.g. all
+        fitted with Airfoil.FitMethod = 'lsq'), the surface is skinned
+        directly through the section poles instead of lofted with
+        ThruSections (see act.AddSurfaceLoft). This is faster, but gives a
+        (slightly) different surface
+
     construct_geometry : bool
         If true, Build method will be called on construction
 
@@ -184,10 +546,30 @@ class LiftingSurface(AirconicsShape):
     ActualSemiSpan : Scalar
         Calculated semi span of the lifting surface. Updated on call to Build
 
+    BuildStages : tuple of string
+        The stages of Build, in order. Updating a parameter reruns only the
+        first stage it affects and the stages after it (the leading edge is
+        not recomputed by ChordFunct, TwistFunct, AirfoilFunct or ChordFactor)
+
+    StageTimings : dict
+        Mapping of stage name (see BuildStages) to the time in seconds taken
+        by its last run
+
+    Table : SpanwiseTable
+        The values of the sweep, dihedral, twist and chord functions at the
+        section stations and segment midpoints, from which the leading edge,
+        sections and metrics are built. Each function is evaluated once per
+        change of the function or of NSegments
+
     Notes
     -----
     * Output surface is stored in self['Surface']
-    *
+    * To change several parameters with a single rebuild, make the changes
+      inside a DeferBuild context (or set defer_build and call FlushBuild):
+
+      >>> with Wing.DeferBuild():
+      >>>     Wing.ChordFactor = 1.2
+      >>>     Wing.NSegments = 21
     * See airconics.examples.wing_example_transonic_airliner for
       example input functions
 
@@ -197,6 +579,23 @@ class LiftingSurface(AirconicsShape):
     airconics.examples.wing_example_transonic_airliner
     """
 
+    # Build stages, in order: changing a parameter reruns the stage it
+    # affects and all later stages
+    BuildStages = ('SpanwiseTable', 'LeadingEdge', 'Sections', 'Loft',
+                   'Placement', 'Metrics')
+
+    # Number of samples from which adaptive stations are chosen (see
+    # AdaptiveStations)
+    AdaptiveSamples = 256
+
+    # Parameters and outputs of Build stored by the part cache
+    CacheAttributes = ('_ApexPoint', '_SweepFunct', '_DihedralFunct',
+                       '_TwistFunct', '_ChordFunct', '_AirfoilFunct',
+                       '_ChordFactor', '_ScaleFactor', '_NSegments',
+                       '_StationTolerance', 'AdaptiveSamples', 'TipRequired',
+                       'max_degree', 'Cont', 'direct_loft')
+    CacheOutputs = ('LSP_area', 'AR', 'ActualSemiSpan', 'RootChord', 'SA')
+
     def __init__(self, ApexPoint=gp_Pnt(0, 0, 0),
                  SweepFunct=False,
                  DihedralFunct=False,
@@ -212,6 +611,9 @@ class LiftingSurface(AirconicsShape):
                  max_degree=8,
                  continuity=GeomAbs_C2,
                  construct_geometry=True,
+                 max_workers=None,
+                 StationTolerance=None,
+                 direct_loft=False,
                  ):
         # convert ApexPoint from list if necessary
         try:
@@ -238,6 +640,11 @@ class LiftingSurface(AirconicsShape):
                                              _ChordFactor=ChordFactor,
                                              _ScaleFactor=ScaleFactor,
                                              _Sections=[],
+                                             _dirtyStages=set(self.BuildStages),
+                                             Table=SpanwiseTable(),
+                                             _fineTable=SpanwiseTable(),
+                                             _StationTolerance=StationTolerance,
+                                             StageTimings={},
                                              LSP_area=None,
                                              AR=None,
                                              ActualSemiSpan=None,
@@ -249,6 +656,8 @@ class LiftingSurface(AirconicsShape):
                                              TipRequired=TipRequired,
                                              max_degree=max_degree,
                                              Cont=continuity,
+                                             max_workers=max_workers,
+                                             direct_loft=direct_loft,
                                              construct_geometry=construct_geometry
                                              )
 
@@ -275,9 +684,9 @@ class LiftingSurface(AirconicsShape):
         # Maybe add some tests here
         self._SweepFunct = newSweepFunct
         # Only rebuild if Build was previously successful (if some components
-        # have been created in self)
-        if self.construct_geometry:
-            self.Build()
+        # have been created in self). The sweep only affects the leading edge
+        # and downstream stages
+        self._Invalidate('LeadingEdge')
 
     # Dihedral
     @property
@@ -288,8 +697,7 @@ class LiftingSurface(AirconicsShape):
     def DihedralFunct(self, newDihedralFunct):
         # Maybe add some tests here
         self._DihedralFunct = newDihedralFunct
-        if self.construct_geometry:
-            self.Build()
+        self._Invalidate('LeadingEdge')
 
     # Twist
     @property
@@ -300,8 +708,7 @@ class LiftingSurface(AirconicsShape):
     def TwistFunct(self, newTwistFunct):
         # Maybe add some tests here
         self._TwistFunct = newTwistFunct
-        if self.construct_geometry:
-            self.Build()
+        self._Invalidate('Sections')
 
     # Chord
     @property
@@ -312,8 +719,7 @@ class LiftingSurface(AirconicsShape):
     def ChordFunct(self, newChordFunct):
         # Maybe add some tests here
         self._ChordFunct = newChordFunct
-        if self.construct_geometry:
-            self.Build()
+        self._Invalidate('Sections')
 
     # Airfoil
     @property
@@ -324,8 +730,7 @@ class LiftingSurface(AirconicsShape):
     def AirfoilFunct(self, newAirfoilFunct):
         # Maybe add some tests here
         self._AirfoilFunct = newAirfoilFunct
-        if self.construct_geometry:
-            self.Build()
+        self._Invalidate('Sections')
 
     @property
     def NSegments(self):
@@ -334,8 +739,16 @@ class LiftingSurface(AirconicsShape):
     @NSegments.setter
     def NSegments(self, newNSegments):
         self._NSegments = newNSegments
-        if self.construct_geometry:
-            self.Build()
+        self._Invalidate('LeadingEdge')
+
+    @property
+    def StationTolerance(self):
+        return self._StationTolerance
+
+    @StationTolerance.setter
+    def StationTolerance(self, newStationTolerance):
+        self._StationTolerance = newStationTolerance
+        self._Invalidate('LeadingEdge')
 
     @property
     def ChordFactor(self):
@@ -344,9 +757,8 @@ class LiftingSurface(AirconicsShape):
     @ChordFactor.setter
     def ChordFactor(self, newChordFactor):
         self._ChordFactor = newChordFactor
-        # Note: may eventually try to scale rather than rebuild here for speed
-        if self.construct_geometry:
-            self.Build()
+        # The leading edge is unchanged: only the sections are regenerated
+        self._Invalidate('Sections')
 
     @property
     def ScaleFactor(self):
@@ -354,9 +766,28 @@ class LiftingSurface(AirconicsShape):
 
     @ScaleFactor.setter
     def ScaleFactor(self, newScaleFactor):
+        oldScaleFactor = self._ScaleFactor
         self._ScaleFactor = newScaleFactor
-        # No need to rebuild surface here, just scale w.r.t Apex
-        self.ScaleComponents_Uniformal(self._ScaleFactor, self.ApexPoint)
+        if 'Placement' in self._dirtyStages:
+            # The pending (or first) build places the surface at the new scale
+            return
+        if oldScaleFactor == 0:
+            # The components were collapsed to a point and cannot be
+            # rescaled: reloft and place them at the new scale
+            self._Invalidate('Loft')
+            return
+        ratio = float(newScaleFactor) / oldScaleFactor
+        # No need to rebuild surface here, just scale the existing components
+        # w.r.t Apex by the change in scale, and the metrics to match
+        self.ScaleComponents_Uniformal(ratio, self.ApexPoint)
+        if self.LSP_area is not None:
+            self.LSP_area *= ratio ** 2
+        if self.SA is not None:
+            self.SA *= ratio ** 2
+        if self.ActualSemiSpan is not None:
+            self.ActualSemiSpan *= ratio
+        if self.RootChord is not None:
+            self.RootChord *= ratio
 
     @property
     def Sections(self):
@@ -365,6 +796,29 @@ class LiftingSurface(AirconicsShape):
         return self._Sections
     # ----------------------------------------------------------------------
 
+    def _Invalidate(self, stage):
+        """Marks stage, and all stages downstream of it, for rebuilding, and
+        rebuilds (or defers the rebuild, see AirconicsShape.DeferBuild)"""
+        i = self.BuildStages.index(stage)
+        self._dirtyStages.update(self.BuildStages[i:])
+        # The table is always refreshed: it only reevaluates functions which
+        # have changed
+        self._dirtyStages.add('SpanwiseTable')
+        self._Rebuild()
+
+    def _BuildSpanwiseTable(self):
+        Stations = self.Table.Stations
+        self.UpdateSpanwiseTable()
+        if not np.array_equal(Stations, self.Table.Stations):
+            # Adaptive stations have moved: everything must be rebuilt
+            self._dirtyStages.update(self.BuildStages)
+
+    def _BuildLeadingEdge(self):
+        self.GenerateLeadingEdge()
+
+    def _BuildSections(self):
+        self._GenerateSections(self.LEPoints)
+
     def CreateConstructionGeometry(self):
         """
         Creates the plane and vector used for projecting wetted area
@@ -372,6 +826,16 @@ class LiftingSurface(AirconicsShape):
         self.XoY_Plane = Geom_Plane(gp_Ax3(gp_XOY()))
         self.ProjVectorZ = gp_Dir(0, 0, 1)
 
+    def _RestoreFromCache(self):
+        """Regenerates the leading edge and sections (which are not stored in
+        the part cache) after the surface was restored from the cache"""
+        self.construct_geometry = True
+        for stage in ('SpanwiseTable', 'LeadingEdge', 'Sections'):
+            getattr(self, '_Build' + stage)()
+        self._dirtyStages.clear()
+
+    @profiling.timed()
+    @part_cache.cached_build
     def Build(self):
         """Builds the section curves and lifting surface using the current
 
@@ -383,6 +847,16 @@ class LiftingSurface(AirconicsShape):
         -----
         Called on initialisation of a lifting surface class.
 
+        Only the stages (see BuildStages) invalidated by parameter changes
+        since the last build are rerun: e.g. changing the ChordFunct reuses
+        the leading edge, but regenerates the sections, the loft, and
+        everything downstream. If no parameter was changed, all stages are
+        rerun and all spanwise functions are reevaluated. The time taken by
+        each stage in its last run is stored in StageTimings.
+
+        The surface and metrics are restored from the part cache (see
+        airconics.part_cache) if an identical surface was built before.
+
         :Example:
             >>> Wing = liftingsurface.LiftingSurface(P,
                                                 mySweepAngleFunction,
@@ -408,55 +882,102 @@ class LiftingSurface(AirconicsShape):
         # rebuild geometry via the setter property functions
         self.construct_geometry = True
 
-        self.GenerateSectionCurves()
-        self.GenerateLiftingSurface()
+        # An explicit Build with no parameter changes rebuilds everything
+        if not self._dirtyStages:
+            self._dirtyStages.update(self.BuildStages)
+        if self._dirtyStages.issuperset(self.BuildStages):
+            # A full build resamples the spanwise functions, whose output may
+            # depend on mutable state (e.g. closures or globals)
+            self.Table.Reset()
+            self._fineTable.Reset()
+
+        for stage in self.BuildStages:
+            if stage not in self._dirtyStages:
+                continue
+            t0 = time.perf_counter()
+            with profiling.span(stage):
+                getattr(self, '_Build' + stage)()
+            self.StageTimings[stage] = time.perf_counter() - t0
+            self._dirtyStages.discard(stage)
 
         # Also store the tip leading edge point (for fitting tip devices)?
         # self.TipLE = self.Sections[-1].Chord.
 
+    def UpdateSpanwiseTable(self):
+        """Evaluates the spanwise functions at the section stations and
+        segment midpoints (see SpanwiseTable), if they have changed
+
+        Returns
+        -------
+        Table : SpanwiseTable
+        """
+        return self._UpdateTables(self.Table, self._fineTable)
+
+    def _UpdateTables(self, Table, Fine):
+        """Updates Table (at the section stations) and, if the stations are
+        adaptive, Fine (at the samples they are chosen from), and returns
+        Table"""
+        if self.StationTolerance is None:
+            Stations = np.linspace(0, 1, self.NSegments + 1)
+        else:
+            Stations = self._AdaptiveStations(Fine)
+        Table.Update(Stations,
+                     Sweep=self.SweepFunct,
+                     Dihedral=self.DihedralFunct,
+                     Twist=self.TwistFunct,
+                     Chord=self.ChordFunct)
+        return Table
+
+    def AdaptiveStations(self):
+        """Returns the section stations for the current StationTolerance
+        (see StationTolerance and adaptive_station_indices).
+
+        The stations are chosen from AdaptiveSamples uniformly spaced
+        samples (or 4 * NSegments, if greater), at which the spanwise
+        functions are evaluated once per change.
+
+        Returns
+        -------
+        Stations : array of float
+        """
+        return self._AdaptiveStations(self._fineTable)
+
+    def _AdaptiveStations(self, Fine):
+        NSamples = max(self.AdaptiveSamples, 4 * self.NSegments)
+        Fine.Update(np.linspace(0, 1, NSamples + 1),
+                    Sweep=self.SweepFunct,
+                    Dihedral=self.DihedralFunct,
+                    Twist=self.TwistFunct,
+                    Chord=self.ChordFunct)
+        Chords = Fine.Values('Chord') * self.ChordFactor
+        Values = np.column_stack([
+            _leading_edge_points(Fine),
+            Chords,
+            Chords * np.radians(Fine.Values('Twist')),
+            Chords * np.radians(Fine.Values('Dihedral'))])
+        indices = adaptive_station_indices(Fine.Stations, Values,
+                                           self.StationTolerance,
+                                           self.NSegments)
+        return Fine.Stations[indices]
+
     def GenerateLeadingEdge(self):
         """Epsilon coordinate attached to leading edge defines sweep
          Returns airfoil leading edge points
          """
-        SegmentLength = 1.0 / self.NSegments
-
-#       Array of epsilon at segment midpoints (will evaluate curve here)
-        Epsilon_midpoints = np.linspace(SegmentLength / 2.,
-                                        1 - (SegmentLength / 2.),
-                                        self.NSegments)
-
-#       We are essentially reconstructing a curve from known slopes at
-#       known curve length stations - a sort of Hermite interpolation
-#       without knowing the ordinate values. If NSegments -> Inf, the
-#       actual slope at each point -> the sweep angle specified by
-#       SweepFunct
-        Tilt_array = self.DihedralFunct(Epsilon_midpoints)
-        Sweep_array = self.SweepFunct(Epsilon_midpoints)
-
-        # If length of Tilt array and epsilon midpoints does not match, then
-        # the input function is not numpy compatible: use a for loop instead
-        if np.shape(Tilt_array) != Epsilon_midpoints.shape:
-            Tilt_array = np.zeros_like(Epsilon_midpoints)
-            Sweep_array = np.zeros_like(Epsilon_midpoints)
-            for i, eps_mid in enumerate(Epsilon_midpoints):
-                Tilt_array[i] = self.DihedralFunct(eps_mid)
-                Sweep_array[i] = self.SweepFunct(eps_mid)
+        Table = self.UpdateSpanwiseTable()
+        self.LEPoints = self._LeadingEdgePoints(Table, self._fineTable)
 
-        DeltaXs = SegmentLength * np.sin(Sweep_array * (np.pi / 180.))
-        DeltaYs = SegmentLength * np.cos(Tilt_array * np.pi / 180.) * \
-            np.cos(Sweep_array * np.pi / 180.)
-        DeltaZs = DeltaYs * np.tan(Tilt_array * np.pi / 180.)
+        return self.LEPoints
 
-#        Initialise LE coordinate arrays and add first OCC gp_pnt at [0,0,0]:
-#        Note: Might be faster to bypass XLE arrays and use local x only
-        LEPoints = np.zeros((self.NSegments + 1, 3))
-
-        Deltas = np.vstack([DeltaXs, DeltaYs, DeltaZs]).T
-        LEPoints[1:, :] = np.cumsum(Deltas, axis=0)
-
-        self.LEPoints = LEPoints
-
-        return LEPoints
+    def _LeadingEdgePoints(self, Table, Fine):
+        """Returns the leading edge points at the stations of Table (see
+        _UpdateTables)"""
+        if self.StationTolerance is None:
+            return _leading_edge_points(Table)
+        # The adaptive stations are a subset of the fine samples: use the
+        # more accurate leading edge reconstructed from the samples
+        return _leading_edge_points(Fine)[
+            np.searchsorted(Fine.Stations, Table.Stations)]
 
     def GenerateSectionCurves(self):
         """Generates the loft section curves  based on the current
@@ -469,21 +990,98 @@ class LiftingSurface(AirconicsShape):
         -------
         None
         """
+        LEPoints = self.GenerateLeadingEdge()
+        self._GenerateSections(LEPoints)
+
+    def _GenerateSections(self, LEPoints):
+        """Generates the section curves at the leading edge points LEPoints
+        (see GenerateSectionCurves)"""
         # Empty the current geometry
         self._Sections = []
 
-        LEPoints = self.GenerateLeadingEdge()
+        SectionArgs = self._SectionArgs(LEPoints)
+
+        if self.max_workers and self.max_workers > 1:
+            if self._GenerateSectionsParallel(SectionArgs):
+                return
+
+        for kwargs in SectionArgs:
+            Af = self.AirfoilFunct(**kwargs)
+            self._Sections.append(Af)
 
-        Eps = np.linspace(0, 1, self.NSegments + 1)
+    def _SectionArgs(self, LEPoints, Table=None):
+        """Returns the list of AirfoilFunct keyword arguments of each section.
+
+        The spanwise functions are passed as _TabulatedFunct objects, which
+        return the values from Table (default: the updated self.Table) at the
+        section station, so that the user functions are not evaluated again
+        for each section"""
+        if Table is None:
+            Table = self.UpdateSpanwiseTable()
+        Chords = Table.Values('Chord').tolist()
+        Dihedrals = Table.Values('Dihedral').tolist()
+        Twists = Table.Values('Twist').tolist()
+        SectionArgs = []
+        for i, eps in enumerate(Table.Stations.tolist()):
+            SectionArgs.append(dict(
+                Epsilon=eps,
+                LEPoint=LEPoints[i],
+                ChordFunct=_TabulatedFunct(self.ChordFunct, eps, Chords[i]),
+                ChordFactor=self.ChordFactor,
+                DihedralFunct=_TabulatedFunct(self.DihedralFunct, eps,
+                                              Dihedrals[i]),
+                TwistFunct=_TabulatedFunct(self.TwistFunct, eps, Twists[i])))
+        return SectionArgs
+
+    def _GenerateSectionsParallel(self, SectionArgs):
+        """Generates the sections with keyword arguments SectionArgs (see
+        _SectionArgs) in the shared pool of max_workers processes (see
+        _section_executor).
+
+        The workers return the fitted section curves as arrays, which are
+        attached (in order) to sections generated in this process: the
+        sections' own curve fitting is then skipped.
 
-        for i, eps in enumerate(Eps):
-            Af = self.AirfoilFunct(Epsilon=eps,
-                                   LEPoint=LEPoints[i],
-                                   ChordFunct=self.ChordFunct,
-                                   ChordFactor=self.ChordFactor,
-                                   DihedralFunct=self.DihedralFunct,
-                                   TwistFunct=self.TwistFunct)
+        Returns
+        -------
+        success : bool
+            False if the spanwise functions cannot be sent to the workers, or
+            the workers fail, in which case no sections are generated
+        """
+        # The AirfoilFunct is sent directly if it can be pickled, otherwise
+        # the profile function it was created from (see airfoilfunct)
+        candidates = [self.AirfoilFunct]
+        if hasattr(self.AirfoilFunct, 'ProfileFunct'):
+            candidates.append((self.AirfoilFunct.ProfileFunct,))
+        WorkerAirfoilFunct = None
+        for candidate in candidates:
+            try:
+                pickle.dumps((candidate, SectionArgs))
+            except (pickle.PicklingError, AttributeError, TypeError) as e:
+                error = e
+                continue
+            WorkerAirfoilFunct = candidate
+            break
+        if WorkerAirfoilFunct is None:
+            print("Generating sections serially: {}".format(error))
+            return False
+
+        executor = _section_executor(self.max_workers)
+        try:
+            curve_arrays = list(executor.map(_section_curve_arrays,
+                                             repeat(WorkerAirfoilFunct),
+                                             SectionArgs))
+        except Exception as e:
+            # e.g. a broken pool, or workers started before the functions
+            # were defined: start a fresh pool for the next build
+            shutdown_section_workers()
+            print("Generating sections serially: {}".format(e))
+            return False
+        for kwargs, arrays in zip(SectionArgs, curve_arrays):
+            Af = self.AirfoilFunct(**kwargs)
+            Af.Curve = act.bspline_from_arrays(*arrays)
             self._Sections.append(Af)
+        return True
 
     # def ChordScaleOptimizer(self):
     #     """
@@ -529,12 +1127,21 @@ class LiftingSurface(AirconicsShape):
         -----
         Adds a ('Surface': Shape) key value pair to self.
         """
+        self._BuildLoft()
+        self._BuildPlacement()
+        self._BuildMetrics()
+        return None
+
+    def _BuildLoft(self):
+        """Lofts the unscaled surface through self.Sections, and adds it to
+        self as the 'Surface' component"""
         x0 = [self.ChordFactor, self.ScaleFactor]
 
         LS = act.AddSurfaceLoft(self._Sections,
                                 max_degree=self.max_degree,
                                 continuity=self.Cont,
-                                solid=False)
+                                solid=False,
+                                direct=self.direct_loft)
 
         # TODO: Optimize chord scale ...
         # if self.OptimizeChordScale:
@@ -550,15 +1157,15 @@ class LiftingSurface(AirconicsShape):
         #  Update instance components:
         self.AddComponent(LS, 'Surface')
 
-        # Calculate projected area
-        self.LSP_area = self.CalculateProjectedArea()
-
         if self.TipRequired:
             # TODO: retrieve wing tip
             print("Warning: Tip Required currently does nothing")
             WingTip = None
             # self["Tip"] = WingTip
 
+    def _BuildPlacement(self):
+        """Scales the lofted components by ScaleFactor and translates them to
+        the ApexPoint"""
         # Scaling (w.r.t. origin)
         if self.ScaleFactor != 1:
             self.ScaleComponents_Uniformal(self.ScaleFactor)
@@ -567,8 +1174,14 @@ class LiftingSurface(AirconicsShape):
         vec = gp_Vec(gp_Pnt(0., 0., 0.), self.ApexPoint)
         self.TranslateComponents(vec)
 
+    def _BuildMetrics(self):
+        """Calculates the projected area, root chord, semi span, aspect ratio
+        and wetted area of the placed surface"""
+        # Calculate projected area
+        self.LSP_area = self.CalculateProjectedArea()
+
         # Calculate some parameters
-        self.RootChord = (self.ChordFunct(0) * self.ChordFactor *
+        self.RootChord = (self.Table.Values('Chord')[0] * self.ChordFactor *
                           self.ScaleFactor)
         self.ActualSemiSpan = self.CalculateSemiSpan()
         self.AR = self.CalculateAspectRatio()
@@ -582,16 +1195,97 @@ class LiftingSurface(AirconicsShape):
     Root chord: {}\n""".format(self.LSP_area, self.SA, self.ActualSemiSpan,
                                self.AR, self.RootChord))
 
-        return None
+    def CalculateMetrics(self, PerimeterRatio=None):
+        """Computes the projected area, semi span, aspect ratio, root chord,
+        mean aerodynamic chord and approximate wetted area without building
+        any OCC geometry (see planform_metrics).
+
+        This does not require Build, and does not change the attributes set
+        by Build (LSP_area, LEPoints, Table etc.), so that it can be used to
+        evaluate many candidate planforms quickly, e.g. on a LiftingSurface
+        created with construct_geometry=False.
+
+        Parameters
+        ----------
+        PerimeterRatio : scalar (default None)
+            The section perimeter, as a multiple of the chord. If None, the
+            sections are generated by the AirfoilFunct (without fitting any
+            curves), and their perimeters, chords, twists and y extents are
+            measured from their points. Otherwise, the sections are not
+            generated, and their chord lengths are assumed to be
+            ChordFactor * ChordFunct / cos(TwistFunct), as for AirfoilFuncts
+            created by airfoilfunct: this is much faster. A ratio of about
+            2 + 0.7 * thickness/chord suits conventional airfoils
 
-    def CalculateProjectedArea(self):
+        Returns
+        -------
+        metrics : dict
+            see planform_metrics. Values are scaled by the ScaleFactor
+        """
+        # Tabulate the functions in local tables, so that the state of a
+        # built surface (Table, LEPoints) is not changed
+        Table = SpanwiseTable()
+        Fine = SpanwiseTable()
+        self._UpdateTables(Table, Fine)
+        LEPoints = self._LeadingEdgePoints(Table, Fine)
+        if PerimeterRatio is None:
+            Sections = [self.AirfoilFunct(**kwargs)
+                        for kwargs in self._SectionArgs(LEPoints, Table)]
+            LEPoints = np.array([section.LE for section in Sections],
+                                dtype=float)
+            ChordLengths = np.array([section.ChordLength
+                                     for section in Sections], dtype=float)
+            Twists = np.array([section.Twist for section in Sections],
+                              dtype=float)
+            Perimeters = ChordLengths * np.array(
+                [np.sum(np.linalg.norm(np.diff(section.points, axis=0),
+                                       axis=1))
+                 for section in Sections])
+            Y = np.hstack([section.PlacedPoints()[:, 1]
+                           for section in Sections])
+            YRange = (np.min(Y), np.max(Y))
+        else:
+            Twists = Table.Values('Twist')
+            ChordLengths = (self.ChordFactor * Table.Values('Chord') /
+                            np.cos(np.radians(Twists)))
+            Perimeters = PerimeterRatio * ChordLengths
+            YRange = None
+        return planform_metrics(LEPoints, ChordLengths, Twists, Perimeters,
+                                YRange=YRange, ScaleFactor=self.ScaleFactor)
+
+    def CalculateProjectedArea(self, method='polygon'):
         """Calculates the projected area of the current lifting surface
 
+        Parameters
+        ----------
+        method : string (default 'polygon')
+            'polygon' : The section chords are projected onto the xy plane,
+                and the area of the quadrilateral between each pair of
+                adjacent chords is summed (shoelace formula, numpy only).
+            'loft' : The projected chords are lofted segment by segment with
+                OCC, and the surface areas summed. Slower: intended for
+                validation
+
+        Returns
+        -------
+        LSP_area : scalar
+            Projected area, scaled by ScaleFactor ** 2
+
+        Notes
+        -----
         From Airconics documentation: In some cases the projected section
         cannot all be lofted in one go (it happens when parts of the wing fold
         back onto themselves), so we loft them section by section and compute
-        the area as a sum.
+        the area as a sum. The polygon method sums the segment areas in the
+        same way.
         """
+        if method == 'polygon':
+            return (self._ProjectedAreaPolygon() *
+                    self.ScaleFactor ** 2.0)
+        elif method != 'loft':
+            raise ValueError("Unknown projected area method '{}': expected "
+                             "'polygon' or 'loft'".format(method))
+
         assert(self['Surface']), 'No wing surface found. Try running Build.'
 
         # First project the section chords onto the xy plane:
@@ -605,7 +1299,7 @@ class LiftingSurface(AirconicsShape):
         try:
             # Loft a section for each projected segment and get its area
             LSP_area = 0
-            for i in range(self.NSegments):
+            for i in range(len(ProjectedSections) - 1):
 
                 LSPsegment = act.AddSurfaceLoft(ProjectedSections[i: i + 2],
                                                 close_sections=False)
@@ -614,13 +1308,27 @@ class LiftingSurface(AirconicsShape):
         except:
             print("""Failed to compute projected area. Using half of surface
                 area instead.""")
-            LS_area = act.CalculateSurfaceArea(self['Surface'])
+            # Note: the surface has already been scaled by ScaleFactor
+            LS_area = (act.CalculateSurfaceArea(self['Surface']) /
+                       self.ScaleFactor ** 2.0)
             LSP_area = 0.5 * LS_area
 
         # Scale the area
         LSP_area *= self.ScaleFactor ** 2.0
         return LSP_area
 
+    def _ProjectedAreaPolygon(self):
+        """Returns the unscaled projected area of the sections: the sum of
+        the areas of the quadrilaterals (LE_i, TE_i, TE_i+1, LE_i+1) in the
+        xy plane"""
+        # The chord runs from LE (the translation of the placement) to
+        # LE + the first column of the placement matrix:
+        placements = np.array([section.PlacementMatrix()
+                               for section in self.Sections])
+        LE = placements[:, :2, 3]
+        TE = LE + placements[:, :2, 0]
+        return _projected_chords_area(LE, TE)
+
     def CalculateSemiSpan(self):
         """Calculates and returns the span of this lifting surface.
 
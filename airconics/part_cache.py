@@ -0,0 +1,496 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent, content addressed cache of built part geometry
+
+The components of a part (e.g. a LiftingSurface, Fuselage or Engine) are
+stored on disk after Build, keyed by a stable hash of the parameters the part
+was built from: the values of its CacheAttributes, including the code, default
+arguments, closure values and referenced globals of functional parameters,
+the source code of the airconics package and the global settings which affect
+the geometry (see build_settings). Building an identical part again (in this
+or any later process) then reads the components back instead of redoing the
+OCC operations.
+
+Each entry is a directory holding one BRep file per component (binary BRep
+via BinTools where available, otherwise the text BRep format of BRepTools)
+and a manifest of the component names and non-shape outputs of Build (see
+AirconicsShape.CacheOutputs). The total size of the cache is limited, and the
+least recently used entries are removed first.
+
+The cache is configured with environment variables:
+
+* AIRCONICS_PART_CACHE=0 disables the cache
+* AIRCONICS_PART_CACHE_DIR sets the cache directory (default
+  $XDG_CACHE_HOME/airconics/parts or ~/.cache/airconics/parts)
+* AIRCONICS_PART_CACHE_SIZE sets the size limit in megabytes (default 1024)
+
+or through the attributes of PART_CACHE. Set use_part_cache = False on a part
+class or instance to always build it.
+"""
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import sysconfig
+import functools
+import numpy as np
+from collections import namedtuple
+
+from . import selig_database
+
+from OCC.Core.BRep import BRep_Builder
+from OCC.Core.BRepTools import breptools_Write, breptools_Read
+from OCC.Core.TopoDS import TopoDS_Shape
+from OCC.Core.gp import gp_Pnt
+
+try:
+    from OCC.Core.BinTools import bintools_Write, bintools_Read
+except ImportError:
+    bintools_Write = bintools_Read = None
+
+
+# Changing this invalidates all existing entries
+CACHE_FORMAT = 1
+
+MANIFEST_FILENAME = 'manifest.json'
+
+CacheInfo = namedtuple('CacheInfo',
+                       ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+
+
+class UnhashableParameter(TypeError):
+    """Raised by stable_hash for values without a stable representation"""
+    pass
+
+
+# ----------------------------------------------------------------------------
+# Stable hashing
+# ----------------------------------------------------------------------------
+_PACKAGE_HASH = None
+
+
+def package_source_hash():
+    """Returns a hash of the source code of all airconics modules, so that
+    cache entries built by a different version of the code are not used"""
+    global _PACKAGE_HASH
+    if _PACKAGE_HASH is None:
+        h = hashlib.sha256()
+        root = os.path.dirname(os.path.abspath(__file__))
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.endswith('.py'):
+                    path = os.path.join(dirpath, filename)
+                    h.update(os.path.relpath(path, root).encode())
+                    with open(path, 'rb') as fin:
+                        h.update(fin.read())
+        _PACKAGE_HASH = h.hexdigest()
+    return _PACKAGE_HASH
+
+
+def build_settings():
+    """Returns the settings outside the attributes of a part which change
+    its geometry: the class level Airfoil fit settings and the signature of
+    the Selig coordinate files"""
+    from .primitives import Airfoil
+    return [('Airfoil.FitMethod', Airfoil.FitMethod),
+            ('Airfoil.FitDegree', int(Airfoil.FitDegree)),
+            ('Airfoil.FitContinuity', int(Airfoil.FitContinuity)),
+            ('selig_data', selig_database.data_signature())]
+
+
+_LIBRARY_PATHS = None
+
+
+def _is_library_function(funct):
+    """True if funct is defined in an installed library (the standard
+    library or site-packages), whose code is assumed not to change between
+    builds"""
+    global _LIBRARY_PATHS
+    if _LIBRARY_PATHS is None:
+        paths = sysconfig.get_paths()
+        _LIBRARY_PATHS = tuple(set(
+            os.path.join(os.path.realpath(paths[name]), '')
+            for name in ('stdlib', 'platstdlib', 'purelib', 'platlib')
+            if name in paths))
+    filename = os.path.realpath(funct.__code__.co_filename)
+    return filename.startswith(_LIBRARY_PATHS)
+
+
+def _global_names(code):
+    """Names of the globals referenced by code and its nested code objects"""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            names |= _global_names(const)
+    return names
+
+
+def _update_code(h, code):
+    h.update(b'code')
+    h.update(code.co_code)
+    h.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            _update_code(h, const)
+        else:
+            h.update(repr((type(const).__name__, const)).encode())
+
+
+def _update(h, value, seen):
+    """Feeds a stable representation of value to the hash object h"""
+    if value is None or isinstance(value, (bool, int, float, complex, str,
+                                           bytes)):
+        h.update(repr((type(value).__name__, value)).encode())
+    elif isinstance(value, np.generic):
+        _update(h, value.item(), seen)
+    elif isinstance(value, np.ndarray):
+        if value.dtype == object:
+            raise UnhashableParameter("Object arrays cannot be hashed")
+        h.update(repr(('ndarray', value.dtype.str, value.shape)).encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)):
+        h.update(repr((type(value).__name__, len(value))).encode())
+        for item in value:
+            _update(h, item, seen)
+    elif isinstance(value, dict):
+        h.update(repr(('dict', len(value))).encode())
+        for key in sorted(value, key=repr):
+            _update(h, key, seen)
+            _update(h, value[key], seen)
+    elif isinstance(value, functools.partial):
+        h.update(b'partial')
+        _update(h, (value.func, value.args, value.keywords or {}), seen)
+    elif hasattr(value, '__code__'):
+        _update_function(h, value, seen)
+    elif isinstance(value, type):
+        h.update(repr(('type', value.__module__,
+                       value.__qualname__)).encode())
+    elif type(value).__name__ == 'module':
+        h.update(repr(('module', value.__name__)).encode())
+    elif callable(value) and hasattr(value, '__name__'):
+        # Compiled (library) functions, e.g. numpy ufuncs: hashed by name
+        h.update(repr(('callable', getattr(value, '__module__', None),
+                       getattr(value, '__qualname__', value.__name__))
+                      ).encode())
+    elif hasattr(value, 'Coord'):
+        # gp_Pnt, gp_Vec, gp_Dir, gp_XYZ...
+        h.update(repr((type(value).__name__, value.Coord())).encode())
+    elif (hasattr(value, 'FirstParameter') and
+            hasattr(value, 'LastParameter') and hasattr(value, 'Value')):
+        # OCC curves: represented by points sampled along the curve
+        u0, u1 = value.FirstParameter(), value.LastParameter()
+        h.update(repr(type(value).__name__).encode())
+        for u in np.linspace(u0, u1, 9).tolist():
+            h.update(repr(value.Value(u).Coord()).encode())
+    else:
+        raise UnhashableParameter(
+            "No stable hash for a value of type {}".format(type(value)))
+
+
+def _update_function(h, funct, seen):
+    if id(funct) in seen:
+        # Recursive reference: the code is already part of the hash
+        h.update(repr(('recursion', funct.__qualname__)).encode())
+        return
+    seen.add(id(funct))
+    h.update(repr(('function', funct.__module__,
+                   funct.__qualname__)).encode())
+    if _is_library_function(funct) and funct.__closure__ is None:
+        return
+    code = funct.__code__
+    _update_code(h, code)
+    _update(h, funct.__defaults__, seen)
+    _update(h, funct.__kwdefaults__, seen)
+    for cell in funct.__closure__ or ():
+        try:
+            contents = cell.cell_contents
+        except ValueError:
+            # Empty cell
+            h.update(b'empty cell')
+            continue
+        _update(h, contents, seen)
+    # The values of any globals the function uses, e.g. helper functions or
+    # module level constants
+    functs_globals = getattr(funct, '__globals__', {})
+    for name in sorted(_global_names(code)):
+        if name in functs_globals:
+            h.update(name.encode())
+            _update(h, functs_globals[name], seen)
+
+
+def stable_hash(*values):
+    """Returns a hash of values which is stable between processes.
+
+    Functions are hashed by their code, default arguments, closure values and
+    the values of the globals they reference (recursively), so that two
+    functions hash equal if they compute the same result. Functions of
+    installed libraries (e.g. numpy) are hashed by name only.
+
+    Parameters
+    ----------
+    *values : numbers, strings, numpy arrays, lists, tuples, dicts, functions,
+        OCC points, vectors and curves
+
+    Returns
+    -------
+    digest : string
+
+    Raises
+    ------
+    UnhashableParameter
+        If any value has no stable representation
+    """
+    h = hashlib.sha256()
+    _update(h, values, set())
+    return h.hexdigest()
+
+
+# ----------------------------------------------------------------------------
+# Serialisation
+# ----------------------------------------------------------------------------
+def _encode(value):
+    """JSON compatible form of a Build output value"""
+    if isinstance(value, np.ndarray):
+        return {'__ndarray__': value.tolist()}
+    elif isinstance(value, np.generic):
+        return value.item()
+    elif isinstance(value, gp_Pnt):
+        return {'__gp_Pnt__': list(value.Coord())}
+    elif isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if '__ndarray__' in value:
+            return np.array(value['__ndarray__'])
+        elif '__gp_Pnt__' in value:
+            return gp_Pnt(*value['__gp_Pnt__'])
+    elif isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+
+def _write_shape(shape, path):
+    if bintools_Write is not None:
+        return bintools_Write(shape, path)
+    return breptools_Write(shape, path)
+
+
+def _read_shape(path):
+    shape = TopoDS_Shape()
+    if path.endswith('.bin'):
+        ok = bintools_Read(shape, path)
+    else:
+        ok = breptools_Read(shape, path, BRep_Builder())
+    if ok is False or shape.IsNull():
+        raise IOError("Could not read shape from {}".format(path))
+    return shape
+
+
+# ----------------------------------------------------------------------------
+# The cache
+# ----------------------------------------------------------------------------
+class PartCache(object):
+    """On-disk cache of part components (see module docstring)
+
+    Parameters
+    ----------
+    directory : string (default None)
+        Defaults to $AIRCONICS_PART_CACHE_DIR, or the parts subdirectory of
+        the user cache directory
+
+    maxsize : int (default None)
+        Size limit in bytes. Defaults to $AIRCONICS_PART_CACHE_SIZE megabytes,
+        or 1024 megabytes
+
+    enabled : bool (default None)
+        Defaults to False if $AIRCONICS_PART_CACHE is '0', True otherwise
+    """
+    def __init__(self, directory=None, maxsize=None, enabled=None):
+        if directory is None:
+            directory = os.environ.get(
+                'AIRCONICS_PART_CACHE_DIR',
+                os.path.join(selig_database.user_cache_directory(), 'parts'))
+        if maxsize is None:
+            maxsize = int(float(os.environ.get('AIRCONICS_PART_CACHE_SIZE',
+                                               1024)) * 2 ** 20)
+        if enabled is None:
+            enabled = os.environ.get('AIRCONICS_PART_CACHE', '1') != '0'
+        self.directory = directory
+        self.maxsize = maxsize
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, part):
+        """Returns the cache key of part, or None if any of its
+        CacheAttributes cannot be hashed (the part is then not cached)"""
+        cls = type(part)
+        try:
+            return stable_hash(CACHE_FORMAT, package_source_hash(),
+                               build_settings(), cls.__module__,
+                               cls.__qualname__,
+                               [(name, getattr(part, name))
+                                for name in part.CacheAttributes])
+        except UnhashableParameter:
+            return None
+
+    def _entry_directory(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """Returns the (components, outputs) stored under key, or None
+
+        Returns
+        -------
+        components : dict
+            Mapping of component name to TopoDS_Shape (or None)
+
+        outputs : dict
+            Mapping of attribute name to value
+        """
+        entry = self._entry_directory(key)
+        manifest_path = os.path.join(entry, MANIFEST_FILENAME)
+        try:
+            with open(manifest_path, 'r') as fin:
+                manifest = json.load(fin)
+            components = {}
+            for name, filename in manifest['components']:
+                if filename is None:
+                    components[name] = None
+                else:
+                    components[name] = _read_shape(os.path.join(entry,
+                                                                filename))
+            outputs = {name: _decode(value)
+                       for name, value in manifest['outputs'].items()}
+            # Mark as recently used:
+            os.utime(manifest_path, None)
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return components, outputs
+
+    def put(self, key, components, outputs):
+        """Stores the components (mapping of name to TopoDS_Shape) and outputs
+        (mapping of attribute name to value) under key, then evicts the least
+        recently used entries if the cache exceeds maxsize"""
+        entry = self._entry_directory(key)
+        if os.path.isdir(entry):
+            return
+        extension = '.bin' if bintools_Write is not None else '.brep'
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            tmp = tempfile.mkdtemp(dir=self.directory, suffix='.tmp')
+        except (IOError, OSError):
+            return
+        try:
+            manifest = {'components': [], 'outputs': {}}
+            for i, (name, shape) in enumerate(sorted(components.items())):
+                if shape is None or shape.IsNull():
+                    manifest['components'].append([name, None])
+                    continue
+                filename = '{}{}'.format(i, extension)
+                if _write_shape(shape, os.path.join(tmp, filename)) is False:
+                    raise IOError("Could not write component {}".format(name))
+                manifest['components'].append([name, filename])
+            for name, value in outputs.items():
+                manifest['outputs'][name] = _encode(value)
+            with open(os.path.join(tmp, MANIFEST_FILENAME), 'w') as fout:
+                json.dump(manifest, fout)
+            os.rename(tmp, entry)
+        except (IOError, OSError, TypeError, ValueError):
+            # Failure to cache (including a concurrent write of the same
+            # entry) is not an error
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        self._evict()
+
+    def _entries(self):
+        """Returns a list of (last use time, size, path) of all entries"""
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            path = os.path.join(self.directory, name)
+            manifest_path = os.path.join(path, MANIFEST_FILENAME)
+            if name.endswith('.tmp') or not os.path.isfile(manifest_path):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(path, f))
+                           for f in os.listdir(path))
+                entries.append((os.path.getmtime(manifest_path), size, path))
+            except OSError:
+                continue
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.maxsize:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            self.evictions += 1
+
+    def info(self):
+        """Returns a CacheInfo(hits, misses, evictions, maxsize, currsize)
+        named tuple, where currsize is the total size in bytes"""
+        currsize = sum(size for _, size, _ in self._entries())
+        return CacheInfo(self.hits, self.misses, self.evictions,
+                         self.maxsize, currsize)
+
+    def clear(self):
+        """Removes all entries and resets the counters"""
+        for _, _, path in self._entries():
+            shutil.rmtree(path, ignore_errors=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+# The cache used by all parts
+PART_CACHE = PartCache()
+
+
+def cached_build(Build):
+    """Decorator for the Build method of AirconicsShape derived classes:
+    restores the components and CacheOutputs from PART_CACHE if an identical
+    part was built before, otherwise builds and stores them.
+
+    On a cache hit, part._RestoreFromCache() is called after the components
+    and outputs have been restored.
+    """
+    @functools.wraps(Build)
+    def CachedBuild(self, *args, **kwargs):
+        key = None
+        if PART_CACHE.enabled and self.use_part_cache:
+            key = PART_CACHE.key(self)
+        if key is not None:
+            entry = PART_CACHE.get(key)
+            if entry is not None:
+                components, outputs = entry
+                for name, component in components.items():
+                    self[name] = component
+                for name, value in outputs.items():
+                    setattr(self, name, value)
+                self._RestoreFromCache()
+                return None
+
+        result = Build(self, *args, **kwargs)
+
+        if key is not None:
+            PART_CACHE.put(key, dict(self.items()),
+                           {name: getattr(self, name, None)
+                            for name in self.CacheOutputs})
+        return result
+    return CachedBuild
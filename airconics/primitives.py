@@ -7,16 +7,128 @@ Created on Fri Dec  4 13:31:35 2015
 @author: pchambers
 """
 from OCC.Core.GC import GC_MakeSegment
-from OCC.Core.gp import gp_Pnt, gp_Vec, gp_OX, gp_OY
+from OCC.Core.gp import gp_Pnt, gp_Vec, gp_OX, gp_OY, gp_Trsf
+from OCC.Core.Geom import Geom_BSplineCurve
+from OCC.Core.GeomAbs import GeomAbs_C2
 
 from . import CRMfoil
+from . import bspline
+from . import selig_database
 from . import AirCONICStools as act
 from pkg_resources import resource_string, resource_exists
+from .AirCONICStools import CacheInfo
+from collections import OrderedDict
+import threading
 import numpy as np
 
 
 # Classes
 # -----------------------------------------------------------------------------
+class FittedCurveCache(object):
+    """Bounded, process-wide LRU cache of fitted unit chord airfoil curves.
+
+    Entries are keyed on the normalised profile definition (see
+    FittedCurveCache.key) and store the airfoil points and the fitted curve
+    before any scaling, rotation or translation is applied. The stored
+    curve is never handed out directly: get returns a copy which the caller
+    is free to transform.
+
+    Parameters
+    ----------
+    maxsize : int (default 256)
+        Maximum number of curves to store. Least recently used entries are
+        evicted once this is exceeded
+
+    Attributes
+    ----------
+    hits, misses, evictions : int
+        Cache counters since creation (or the last call to clear)
+    """
+    def __init__(self, maxsize=256):
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(Profile, EnforceSharpTE, degree, continuity, args=(),
+            method='approximate'):
+        """Returns the hashable cache key of a normalised profile definition,
+        or None if the profile cannot be used as a key.
+
+        args are the (hashable) arguments from which the profile points are
+        generated, e.g. the signed camber of a flipped NACA4 profile. method
+        is the Airfoil.FitMethod used to fit the curve"""
+        try:
+            key = (tuple(sorted(Profile.items())), tuple(args),
+                   bool(EnforceSharpTE), degree, continuity, method)
+            hash(key)
+        except (AttributeError, TypeError):
+            return None
+        return key
+
+    @property
+    def maxsize(self):
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, newmaxsize):
+        with self._lock:
+            self._maxsize = newmaxsize
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        """Returns a copy of the (points, Curve) pair stored under key, or None
+        if key is not in the cache"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        points, curve = entry
+        return points.copy(), Geom_BSplineCurve.DownCast(curve.Copy())
+
+    def put(self, key, points, curve):
+        """Stores copies of the unit chord airfoil points and curve"""
+        if self._maxsize <= 0:
+            return
+        points = np.array(points)
+        points.flags.writeable = False
+        entry = (points, Geom_BSplineCurve.DownCast(curve.Copy()))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def info(self):
+        """Returns a CacheInfo(hits, misses, evictions, maxsize, currsize)
+        named tuple"""
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions,
+                             self._maxsize, len(self._entries))
+
+    def clear(self):
+        """Empties the cache and resets the counters"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+# The cache shared by all Airfoil instances
+FITTED_CURVE_CACHE = FittedCurveCache()
+
+
 class Airfoil(object):
     """Class for defining a range of spline-fitted airfoil curves
 
@@ -84,13 +196,29 @@ class Airfoil(object):
         EnforceSharpTE : bool
             Enforces sharp trailing edge (NACA airfoils only)
 
+        FitMethod : string (default None)
+            'approximate' fits the curve with OCC's GeomAPI_PointsToBSpline,
+            'lsq' uses a direct least-squares fit with a cached basis (see
+            act.points_to_bspline_lsq). If None, the class attribute
+            Airfoil.FitMethod is used
+
+        PointsOnly : bool (default False)
+            If True, only the airfoil points are generated: Curve is None and
+            no curve is ever fitted. Use this for screening or interpolating
+            sections with numpy only
+
         Attributes
         ----------
         points : array of scalar, shape (N, 2)
             The x-z coordinates of points on the airfoils surface
 
         Curve - OCC.Geom.Geom_BsplineCurve
-            The generated airfoil spline
+            The generated airfoil spline. Fitted and transformed on first
+            access
+
+        ChordLine - OCC.Geom.Geom_TrimmedCurve
+            The chord line segment from the leading to the trailing edge.
+            Built on first access
 
         Notes
         -----
@@ -100,10 +228,25 @@ class Airfoil(object):
           building the Airfoil i.e. pass all physical definitions as class
           arguments.
 
-        * Although the physical attributes can changed i.e. rotation, twist,
-          ChordLength, LeadingEdgePoint etc., it is the users responsibility
-          to rebuild the Airfoil with the 'Add***Airfoil' afterwards
+        * Curve and ChordLine are built lazily and cached. Changing the
+          points, rotation, twist, ChordLength or LE invalidates them, and
+          they are rebuilt on next access
+
+        * Fitted unit chord curves of Selig, NACA4 and CRM profiles are
+          shared between instances through FITTED_CURVE_CACHE
+
+        * With FitMethod='lsq', the fit is a single matrix product and all
+          airfoils with the same number of points share one knot vector.
+          NACA4 profiles are parametrised on their chordwise sampling layout,
+          so that all NACA4 sections with the same camber location also share
+          the fitting operator
         """
+    # Degree and continuity of the B-spline fitted to the airfoil points
+    FitDegree = 3
+    FitContinuity = GeomAbs_C2
+    # Default fitting method: 'approximate' or 'lsq'
+    FitMethod = 'approximate'
+
     def __init__(self,
                  LeadingEdgePoint=[0., 0., 0.],
                  ChordLength=1,
@@ -116,7 +259,9 @@ class Airfoil(object):
                  CRM_Epsilon=0.,
                  InterpProfile=None,
                  Epsilon=0, Af1=None, Af2=None, Eps1=0, Eps2=1,
-                 EnforceSharpTE=False):
+                 EnforceSharpTE=False,
+                 FitMethod=None,
+                 PointsOnly=False):
 
         if CRM_Epsilon:
             CRMProfile = True
@@ -125,14 +270,28 @@ class Airfoil(object):
         assert(sum([1 for prof in Profiles if prof]) < 2),\
             "Ambiguous airfoil: More than one profile has been specified"
 
-        self.LE = LeadingEdgePoint
-        self.ChordLength = ChordLength
-        self.Rotation = Rotation
-        self.Twist = Twist
+        # Lazily built geometry (see the Curve and ChordLine properties)
+        self._curve = None
+        self._chordLine = None
+        self._unitCurve = None
+        self._placement = None
+
+        self._LE = LeadingEdgePoint
+        self._ChordLength = ChordLength
+        self._Rotation = Rotation
+        self._Twist = Twist
         self._EnforceSharpTE = EnforceSharpTE
+        if FitMethod is not None:
+            assert(FitMethod in ('approximate', 'lsq')), \
+                "Unknown FitMethod '{}'".format(FitMethod)
+            self.FitMethod = FitMethod
+        self.PointsOnly = PointsOnly
 
         # Initialise the x and z airfoil surface points as None
         self._points = None
+        # Sampling layout and FITTED_CURVE_CACHE arguments of the points
+        self._layout = None
+        self._fitArgs = None
 
         self._make_airfoil(SeligProfile, Naca4Profile, Naca5Profile,
                            CRMProfile, CRM_Epsilon,
@@ -144,10 +303,95 @@ class Airfoil(object):
 
     @points.setter
     def points(self, newpoints):
-        # Updating this value recalls the _fitAirfoiltoPoints function. Does
-        # not transform the airfoil
-        self._points = newpoints
-        self._fitAirfoiltoPoints()
+        # Updating the points refits the curve on next access
+        self._setPoints(np.asarray(newpoints, dtype=float))
+
+    @property
+    def LE(self):
+        return self._LE
+
+    @LE.setter
+    def LE(self, newLE):
+        self._LE = newLE
+        self._invalidateGeometry()
+
+    @property
+    def ChordLength(self):
+        return self._ChordLength
+
+    @ChordLength.setter
+    def ChordLength(self, newChordLength):
+        self._ChordLength = newChordLength
+        self._invalidateGeometry()
+
+    @property
+    def Rotation(self):
+        return self._Rotation
+
+    @Rotation.setter
+    def Rotation(self, newRotation):
+        self._Rotation = newRotation
+        self._invalidateGeometry()
+
+    @property
+    def Twist(self):
+        return self._Twist
+
+    @Twist.setter
+    def Twist(self, newTwist):
+        self._Twist = newTwist
+        self._invalidateGeometry()
+
+    @property
+    def Curve(self):
+        if (self._curve is None and self._points is not None and
+                not self.PointsOnly):
+            Curve = Geom_BSplineCurve.DownCast(self._fitUnitCurve().Copy())
+            self._curve = self._TransformAirfoil(Curve)
+        return self._curve
+
+    @Curve.setter
+    def Curve(self, newCurve):
+        # Overrides the fitted curve until the airfoil is next changed
+        self._curve = newCurve
+
+    @property
+    def ChordLine(self):
+        if self._chordLine is None and self._points is not None:
+            # Can assume that the chord is from 0,0,0 to 1,0,0 before
+            # transformation
+            ChordLine = GC_MakeSegment(gp_Pnt(0, 0, 0),
+                                       gp_Pnt(1, 0, 0)).Value()
+            self._chordLine = self._TransformAirfoil(ChordLine)
+        return self._chordLine
+
+    def _invalidateGeometry(self):
+        """Discards the transformed Curve and ChordLine"""
+        self._curve = None
+        self._chordLine = None
+        self._placement = None
+
+    def _setPoints(self, points, layout=None, fitArgs=None):
+        """Sets the unit chord airfoil points, and discards all geometry
+        fitted to the previous points.
+
+        Parameters
+        ----------
+        points : array of float, shape (N, 2)
+
+        layout : array of float (default None)
+            see _fitAirfoiltoPoints
+
+        fitArgs : tuple (default None)
+            The hashable arguments from which the points of self.Profile were
+            generated: used to share the fitted curve through
+            FITTED_CURVE_CACHE. None if the points should not be cached
+        """
+        self._points = points
+        self._layout = layout
+        self._fitArgs = fitArgs
+        self._unitCurve = None
+        self._invalidateGeometry()
 
     def _make_airfoil(self, SeligProfile, Naca4Profile, Naca5Profile,
                       CRMProfile, CRM_Epsilon,
@@ -167,15 +411,22 @@ class Airfoil(object):
         else:
             # 'Empty' Profile
             print("No Profile specified: Creating 'empty' Airfoil")
-            self.Curve = None
             self.Profile = None
 
-    def _fitAirfoiltoPoints(self):
+    def _fitAirfoiltoPoints(self, layout=None):
         """ Fits an OCC curve to current airfoil.points.
 
         airfoil.points should be N by 2, the array of x, z points on the
         airfoil's surface.
 
+        Parameters
+        ----------
+        layout : array of float, length N (default None)
+            Chordwise abscissa of the sampling layout from which the points
+            were generated: used to parametrise the points if
+            self.FitMethod is 'lsq' (default: the x coordinates of the
+            points)
+
         Returns
         -------
         Curve : OCC.Geom.Geom_BSplineCurve
@@ -184,15 +435,45 @@ class Airfoil(object):
         N = np.shape(self._points)[0]
         y = np.zeros(N)
         points3d = np.column_stack([self._points[:, 0], y, self._points[:, 1]])
-        Curve = act.points_to_bspline(points3d)
+        if self.FitMethod == 'lsq':
+            params = AirfoilParameters(self._points, layout)
+            Curve = act.points_to_bspline_lsq(points3d, params,
+                                              deg=self.FitDegree)
+        else:
+            Curve = act.points_to_bspline(points3d, deg=self.FitDegree,
+                                          continuity=self.FitContinuity)
         return Curve
 
+    def _fitUnitCurve(self):
+        """Returns the unit chord curve fitted to the current points,
+        reusing a previous fit from FITTED_CURVE_CACHE if one exists for
+        self.Profile. The result is stored on the instance: callers should
+        transform a copy"""
+        if self._unitCurve is None:
+            if self._fitArgs is not None:
+                key = FITTED_CURVE_CACHE.key(
+                    self.Profile, self._EnforceSharpTE, self.FitDegree,
+                    self.FitContinuity, self._fitArgs, self.FitMethod)
+            else:
+                key = None
+            cached = FITTED_CURVE_CACHE.get(key) if key is not None else None
+            if cached is not None:
+                self._unitCurve = cached[1]
+            else:
+                self._unitCurve = self._fitAirfoiltoPoints(self._layout)
+                if key is not None:
+                    FITTED_CURVE_CACHE.put(key, self._points,
+                                           self._unitCurve)
+        return self._unitCurve
+
     def _AirfoilPointsSeligFormat(self, SeligProfile):
-        """Extracts airfoil coordinates from a file
+        """Extracts airfoil coordinates from the Selig database
 
-        Assumes input selig files are specified in the Selig format, i.e.,
-        header line, followed by x column, z column, from upper trailing edge
-        to lower trailing edge.
+        Points are read from the precompiled binary store (see
+        airconics.selig_database) where possible, falling back to parsing the
+        text file. Assumes input selig files are specified in the Selig
+        format, i.e., header line, followed by x column, z column, from upper
+        trailing edge to lower trailing edge.
 
         Parameters
         ----------
@@ -207,20 +488,21 @@ class Airfoil(object):
         z - array of float
             z coordinates of airfoil curve
         """
-        res_pkg = 'airconics.coord_seligFmt'
-        SeligProfile = SeligProfile + '.dat'
-        assert(resource_exists(res_pkg, SeligProfile)),\
-            "Airfoil database for {} not found.".format(SeligProfile)
-
-        data = resource_string(res_pkg, SeligProfile)
-        data = data.split(b'\r\n')[1:-1]
-        N = len(data)
-        x = np.zeros(N)
-        z = np.zeros(N)
-        for i, line in enumerate(data):
-            vals = line.split()    # vals[0] = x coord, vals[1] = y coord
-            x[i] = float(vals[0])
-            z[i] = float(vals[1])
+        # Zero-copy lookup in the precompiled binary database:
+        points = selig_database.profile_points(SeligProfile)
+
+        if points is None:
+            # Not in the compiled store: fall back to parsing the text file
+            res_pkg = 'airconics.coord_seligFmt'
+            SeligProfile = SeligProfile + '.dat'
+            assert(resource_exists(res_pkg, SeligProfile)),\
+                "Airfoil database for {} not found.".format(SeligProfile)
+
+            data = resource_string(res_pkg, SeligProfile)
+            points = selig_database.parse_selig_data(data)
+
+        x = points[:, 0]
+        z = points[:, 1]
         return x, z
 
     def _NACA4cambercurve(self, MaxCamberLocTenthChord, MaxCamberPercChord):
@@ -358,46 +640,89 @@ class Airfoil(object):
 
         return x, z, xu, zu, xl, zl, RLE
 
-    def _TransformAirfoil(self):
-        """Given a normal airfoil, nose in origin, chord along
-        x axis, applies rotations, translation and (soon) smoothing
-        """
-        # TODO: Smoothing
-#        for i in range(self.SmoothingIterations):
-#            rs.FairCurve(self.Curve)
-
-        # Can assume that the chord is from 0,0,0 to 1,0,0 before translation
-        h_ChordLine = GC_MakeSegment(gp_Pnt(0, 0, 0),
-                                   gp_Pnt(1, 0, 0)).Value()
-        ChordLine = h_ChordLine
-
-        Curve = self.Curve
-
-#        Scaling:
-        Curve.Scale(gp_Pnt(0, 0, 0), self.ChordLength)
-        ChordLine.Scale(gp_Pnt(0, 0, 0), self.ChordLength)
+    def PlacementTrsf(self):
+        """Returns the transformation from the unit chord airfoil (nose in
+        origin, chord along x axis) to its placed position: scaling by
+        ChordLength, rotation by Rotation (dihedral) about the x axis, by
+        -Twist about the y axis and translation to LE, composed in one
+        gp_Trsf
 
-#        Rotations - Note that direction is opposite to Rhino
-#        Dihedral:
-        if self.Rotation:
-            Curve.Rotate(gp_OX(), np.radians(self.Rotation))
-            ChordLine.Rotate(gp_OX(), np.radians(self.Rotation))
+        Returns
+        -------
+        trsf : OCC.gp.gp_Trsf
+        """
+        if self._placement is None:
+            # gp_Trsf.Multiply(T) gives self * T, i.e. T is applied first
+            trsf = gp_Trsf()
+            trsf.SetTranslation(gp_Vec(*self.LE))
+#            Rotations - Note that direction is opposite to Rhino
+#            Twist:
+            if self.Twist:
+                twist = gp_Trsf()
+                twist.SetRotation(gp_OY(), -np.radians(self.Twist))
+                trsf.Multiply(twist)
+#            Dihedral:
+            if self.Rotation:
+                rotation = gp_Trsf()
+                rotation.SetRotation(gp_OX(), np.radians(self.Rotation))
+                trsf.Multiply(rotation)
+#            Scaling:
+            scale = gp_Trsf()
+            scale.SetScale(gp_Pnt(0, 0, 0), self.ChordLength)
+            trsf.Multiply(scale)
+            self._placement = trsf
+        return self._placement
+
+    def PlacementMatrix(self):
+        """Returns the placement transformation (see PlacementTrsf) as a
+        4 by 4 numpy matrix, for use with act.transform_points
 
-#        Twist:
-        if self.Twist:
-            Curve.Rotate(gp_OY(), -np.radians(self.Twist))
-            ChordLine.Rotate(gp_OY(), -np.radians(self.Twist))
+        Returns
+        -------
+        matrix : array of float, shape (4, 4)
+        """
+        a = np.radians(self.Rotation)
+        b = -np.radians(self.Twist)
+        Rx = np.array([[1., 0., 0.],
+                       [0., np.cos(a), -np.sin(a)],
+                       [0., np.sin(a), np.cos(a)]])
+        Ry = np.array([[np.cos(b), 0., np.sin(b)],
+                       [0., 1., 0.],
+                       [-np.sin(b), 0., np.cos(b)]])
+        matrix = np.eye(4)
+        matrix[:3, :3] = Ry.dot(Rx) * self.ChordLength
+        matrix[:3, 3] = self.LE
+        return matrix
+
+    def PlacedPoints(self):
+        """Returns the airfoil points in their placed (world) position,
+        for fitting curves directly in world coordinates
 
-#        Translation:
-#        self.Curve = Geom_BSplineCurve_DownCast(Curve.Translated(
-#                                                        gp_Vec(*self.LE))
-#                                                       )
-        Curve.Translate(gp_Vec(*self.LE))
-        ChordLine.Translate(gp_Vec(*self.LE))
+        Returns
+        -------
+        points : array of float, shape (N, 3)
+            x, y, z coordinates of the points
+        """
+        points3d = np.column_stack([self._points[:, 0],
+                                    np.zeros(len(self._points)),
+                                    self._points[:, 1]])
+        return act.transform_points(points3d, self.PlacementMatrix())
 
-        self.ChordLine = ChordLine
+    def _TransformAirfoil(self, Curve):
+        """Given a normal airfoil curve (or chord line), nose in origin,
+        chord along x axis, applies scaling, rotations, translation and (soon)
+        smoothing in place, as one composed transformation (PlacementTrsf)
 
-        return None
+        Returns
+        -------
+        Curve : OCC.Geom.Geom_Curve
+            The transformed input curve
+        """
+        # TODO: Smoothing
+#        for i in range(self.SmoothingIterations):
+#            rs.FairCurve(self.Curve)
+        Curve.Transform(self.PlacementTrsf())
+        return Curve
 
     def AddAirfoilFromSeligFile(self, SeligProfile, Smoothing=1):
         """Adds an airfoil generated by fitting a NURBS curve to a set
@@ -425,9 +750,7 @@ class Airfoil(object):
 
         self.Profile = {'SeligProfile': SeligProfile}
         x, z = self._AirfoilPointsSeligFormat(SeligProfile)
-        self._points = np.column_stack([x, z])
-        self.Curve = self._fitAirfoiltoPoints()
-        self._TransformAirfoil()
+        self._setPoints(np.column_stack([x, z]), fitArgs=(SeligProfile,))
         return None
 
     def AddNACA4(self, Naca4Profile, Smoothing=1):
@@ -467,15 +790,19 @@ class Airfoil(object):
         MaxCamberLocTenthChord = int(Naca4Profile[1])
         MaxThicknessPercChord  = int(Naca4Profile[2:])
 
-        x, z, xu, zu, xl, zl, RLE = \
-            self._NACA4digitPnts(MaxCamberPercChord,
-                                 MaxCamberLocTenthChord,
-                                 MaxThicknessPercChord)
-        self._points = np.column_stack([x, z])
-        self.Curve = self._fitAirfoiltoPoints()
+        args = (MaxCamberPercChord, MaxCamberLocTenthChord,
+                MaxThicknessPercChord)
+        x, z = self._NACA4digitPnts(*args)[:2]
+
+        # The chordwise sampling layout of the points (as in
+        # _NACA4cambercurve): parametrises the points for 'lsq' fits
+        ChordCoord, NCosPoints = act.coslin(MaxCamberLocTenthChord / 10.0
+                                            or 0.2)
+        layout = np.hstack([ChordCoord[::-1], ChordCoord[1:]])
+
+        self._setPoints(np.column_stack([x, z]), layout, fitArgs=args)
 #        if 'Smoothing' in locals():
 #            self.SmoothingIterations = Smoothing
-        self._TransformAirfoil()
         return None
 
     def AddCRMLinear(self, CRM_Epsilon, Smoothing=1):
@@ -501,12 +828,10 @@ class Airfoil(object):
 
         self.Profile = {'CRM_Epsilon': str(CRM_Epsilon)}
         x, z = CRMfoil.CRMlinear(CRM_Epsilon)
-        self._points = np.column_stack([x, z])
-        self.Curve = self._fitAirfoiltoPoints()
+        self._setPoints(np.column_stack([x, z]), fitArgs=(CRM_Epsilon,))
         # TODO: Smoothing..
 #        if 'Smoothing' in locals():
 #            self.SmoothingIterations = Smoothing
-        self._TransformAirfoil()
         return None
 
 #        def _FiniteTE(self):
@@ -521,7 +846,9 @@ class Airfoil(object):
         between Af1 (at Eps1) and Af2 (at Eps2). The BSpline Curve is then
         fitted to the resulting points with Airfoil._fitAirfoiltoPoints, and
         transformed to the orientation specified in self.Rotation, self.Twist,
-        self.ChordLength and self.LEPoint via the _TransformAirfoil function.
+        self.ChordLength and self.LEPoint via the _TransformAirfoil function,
+        when self.Curve is first accessed. Af1 and Af2 may be PointsOnly
+        airfoils.
 
         Parameters
         ----------
@@ -543,11 +870,10 @@ class Airfoil(object):
             0 (root of a lifting surface) to 1 (tip of a lifting surface), and
             also expected to be greater than Eps1
         """
-        # Linearly interpolate curve X,Z points at spanwise location epsilon:
-
-        x = Af1.points[:, 0] * (Eps2 - Eps) / (Eps2 - Eps1) + \
-            Af2.points[:, 0] * (Eps - Eps1) / (Eps2 - Eps1)
-        z = Af1.points[:, 1] * (Eps2 - Eps) + Af2.points[:, 1] * (Eps - Eps1)
+        # Linearly interpolate curve X,Z points at spanwise location epsilon
+        # (Af1 and Af2 are resampled first if their number of points differ):
+        points, params = InterpolateSectionsBatch([Eps], [Af1, Af2],
+                                                  [Eps1, Eps2])
 
         if Eps == Eps1:
             self.Profile = Af1.Profile
@@ -555,6 +881,280 @@ class Airfoil(object):
             self.Profile = Af2.Profile
         else:
             self.Profile = {'Interp': (Eps, Af1.Profile, Eps1, Af2.Profile, Eps2)}
-        self._points = np.column_stack([x, z])
-        self.Curve = self._fitAirfoiltoPoints()
-        self._TransformAirfoil()
+        self._setPoints(points[0])
+
+
+# Functions
+# -----------------------------------------------------------------------------
+def NACA4digitPntsBatch(MaxCamberPercChord, MaxCamberLocTenthChord,
+                        MaxThicknessPercChord, EnforceSharpTE=False,
+                        NCosPoints=24, NLinPoints=24):
+    """Generates the points of many NACA 4-digit airfoils in one pass.
+
+    Vectorised equivalent of Airfoil._NACA4digitPnts: the camber curve,
+    half-thickness distribution and upper/lower surfaces of all profiles are
+    computed together, e.g. for spanwise camber morphing or airfoil sweeps.
+
+    Parameters
+    ----------
+    MaxCamberPercChord : scalar or array of scalar, shape (N,)
+        Maximum camber, in percent of chord (the first digit). Negative
+        values give a flipped camber airfoil
+
+    MaxCamberLocTenthChord : scalar or array of scalar, shape (N,)
+        Location of maximum camber, in tenths of chord (the second digit)
+
+    MaxThicknessPercChord : scalar or array of scalar, shape (N,)
+        Maximum thickness, in percent of chord (the last two digits)
+
+    EnforceSharpTE : bool (default False)
+        If True, a wedge is removed from each airfoil to close the trailing
+        edge
+
+    NCosPoints, NLinPoints : int (default 24)
+        Chordwise sampling (see airconics.AirCONICStools.coslin)
+
+    Returns
+    -------
+    points : array of float, shape (N, M, 2)
+        The x, z coordinates of each airfoil, from the upper trailing edge to
+        the lower trailing edge, where M = 2 * (NCosPoints + NLinPoints) - 1.
+        Inputs are broadcast against each other, and N is 1 if all inputs
+        are scalar
+
+    Examples
+    --------
+    >>> # NACA 0310 to NACA 5310 in 11 steps of camber:
+    >>> pts = NACA4digitPntsBatch(np.linspace(0, 5, 11), 3, 10)
+    """
+    camber, camber_loc, thickness = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(MaxCamberPercChord, dtype=float)),
+        np.atleast_1d(np.asarray(MaxCamberLocTenthChord, dtype=float)),
+        np.atleast_1d(np.asarray(MaxThicknessPercChord, dtype=float)))
+    camber = camber.ravel()
+    # Using the original notation of Jacobs et al.(1933)
+    xmc = camber_loc.ravel() / 10.0
+    zcammax = camber / 100.0
+    tmax = thickness.ravel() / 100.0
+
+    # Protect against division by zero on airfoils like NACA0012
+    xmc = np.where(xmc == 0, 0.2, xmc)
+
+    # Sampling the chord line: one row per profile
+    ChordCoord, NCosPoints = act.coslin(xmc, NCosPoints, NLinPoints)
+
+    # Camber curve and its slope, cosine and linear sections
+    xmc = xmc[:, None]
+    zcammax = zcammax[:, None]
+    front = np.arange(ChordCoord.shape[1]) < NCosPoints
+    zcam = np.where(front,
+                    (zcammax / xmc ** 2) * (2 * xmc * ChordCoord -
+                                            ChordCoord ** 2),
+                    (zcammax / (1 - xmc) ** 2) * (1 - 2 * xmc +
+                                                  2 * xmc * ChordCoord -
+                                                  ChordCoord ** 2))
+    dzcamdx = np.where(front,
+                       (zcammax / xmc ** 2) * (2 * xmc - 2 * ChordCoord),
+                       (zcammax / (1 - xmc) ** 2) * (2 * xmc -
+                                                     2 * ChordCoord))
+
+    # Half-thickness polynomial (see Airfoil._NACA4halfthickness)
+    a0 = 0.2969 / 0.2
+    a1 = -0.1260 / 0.2
+    a2 = -0.3516 / 0.2
+    a3 = 0.2843 / 0.2
+    a4 = -0.1015 / 0.2
+    t = tmax[:, None] * (a0 * ChordCoord ** 0.5 + a1 * ChordCoord +
+                         a2 * ChordCoord ** 2.0 + a3 * ChordCoord ** 3.0 +
+                         a4 * ChordCoord ** 4.0)
+
+    # Add the thickness to the camber line
+    Theta = np.arctan(dzcamdx)
+    xu = ChordCoord - t * np.sin(Theta)
+    xl = ChordCoord + t * np.sin(Theta)
+    zu = zcam + t * np.cos(Theta)
+    zl = zcam - t * np.cos(Theta)
+
+    if EnforceSharpTE:
+        # Correct small abscissa positioning errors, and remove wedge
+        xu[:, -1] = ChordCoord[:, -1]
+        xl[:, -1] = ChordCoord[:, -1]
+        zu -= xu * zu[:, -1:]
+        zl -= xl * zl[:, -1:]
+
+    # Combine upper and lower (Top surface reversed from right to left)
+    x = np.hstack((xu[:, ::-1], xl[:, 1:]))   # Remove duplicate LE point
+    z = np.hstack((zu[:, ::-1], zl[:, 1:]))
+    return np.stack([x, z], axis=-1)
+
+
+def AirfoilParameters(points, layout=None):
+    """Returns curve parameter values of airfoil points, for B-spline
+    fitting and resampling.
+
+    Uses bspline.airfoil_parameters, falling back to a centripetal
+    parametrisation of the points if the abscissae are repeated on one
+    surface.
+
+    Parameters
+    ----------
+    points : array of float, shape (N, 2)
+        x, z airfoil points, from the upper trailing edge to the lower
+        trailing edge
+
+    layout : array of float, length N (default None)
+        Chordwise abscissa of the sampling layout from which the points were
+        generated (default: the x coordinates of the points)
+
+    Returns
+    -------
+    params : array of float, shape (N,)
+        Strictly increasing, from 0 to 1
+    """
+    if layout is None:
+        layout = points[:, 0]
+    params = bspline.airfoil_parameters(layout)
+    if not np.all(np.diff(params) > 0):
+        params = bspline.centripetal_parameters(points)
+    return params
+
+
+def ResampleAirfoilPoints(points, NPoints):
+    """Resamples airfoil points to NPoints points.
+
+    A least-squares cubic B-spline (see airconics.bspline.fit_poles) is
+    fitted to the points and evaluated at NPoints uniformly spaced values of
+    the AirfoilParameters, which clusters points quadratically towards the
+    leading edge. Any airfoils resampled to the same NPoints share the same
+    parameters.
+
+    Parameters
+    ----------
+    points : array of float, shape (N, 2)
+        x, z airfoil points, from the upper trailing edge to the lower
+        trailing edge
+
+    NPoints : int
+
+    Returns
+    -------
+    points : array of float, shape (NPoints, 2)
+
+    params : array of float, shape (NPoints,)
+        Parameter values of the resampled points
+    """
+    points = np.asarray(points, dtype=float)
+    params = np.linspace(0, 1, NPoints)
+    poles, knots = bspline.fit_poles(points, AirfoilParameters(points))
+    return bspline.evaluate(poles, knots, 3, params), params
+
+
+def InterpolateSectionsBatch(Epsilons, Anchors, AnchorEpsilons=None,
+                             NPoints=None):
+    """Linearly interpolates the points of airfoil sections between two or
+    more anchor airfoils, at all spanwise locations in one pass.
+
+    Parameters
+    ----------
+    Epsilons : array of float, shape (N,)
+        Spanwise locations of the sections
+
+    Anchors : list of airconics.Airfoil or of arrays of shape (M_k, 2)
+        The anchor airfoils (or their x, z points). These may be PointsOnly
+        airfoils
+
+    AnchorEpsilons : array of float, shape (len(Anchors),) (default None)
+        Increasing spanwise locations of the anchors: defaults to uniformly
+        spaced anchors from 0 to 1. Epsilons outside this range are linearly
+        extrapolated from the nearest two anchors
+
+    NPoints : int (default None)
+        Number of points per section. If None, the anchors are used as they
+        are if they all have the same number of points, and are otherwise
+        resampled to the largest number of points (see ResampleAirfoilPoints)
+
+    Returns
+    -------
+    points : array of float, shape (N, M, 2)
+        The x, z points of each section
+
+    params : array of float, shape (M,)
+        Parameter values shared by all sections, e.g. to fit all sections with
+        FitSectionsBatch
+    """
+    AnchorPoints = [np.asarray(getattr(Anchor, 'points', Anchor), dtype=float)
+                    for Anchor in Anchors]
+    assert(len(AnchorPoints) >= 2), "At least two anchor airfoils are required"
+    if AnchorEpsilons is None:
+        AnchorEpsilons = np.linspace(0, 1, len(AnchorPoints))
+    AnchorEpsilons = np.asarray(AnchorEpsilons, dtype=float)
+    assert(len(AnchorEpsilons) == len(AnchorPoints)), \
+        "Expected one AnchorEpsilon per anchor airfoil"
+    assert(np.all(np.diff(AnchorEpsilons) > 0)), \
+        "AnchorEpsilons must be increasing"
+
+    counts = set(len(pts) for pts in AnchorPoints)
+    if NPoints is None and len(counts) == 1:
+        AnchorPoints = np.stack(AnchorPoints)
+        params = AirfoilParameters(AnchorPoints.mean(axis=0))
+    else:
+        if NPoints is None:
+            NPoints = max(counts)
+        resampled = [ResampleAirfoilPoints(pts, NPoints)
+                     for pts in AnchorPoints]
+        AnchorPoints = np.stack([pts for pts, params in resampled])
+        params = resampled[0][1]
+
+    # Index of the anchor on the inboard side of each section, and weight of
+    # its outboard neighbour:
+    Epsilons = np.atleast_1d(np.asarray(Epsilons, dtype=float))
+    i = np.clip(np.searchsorted(AnchorEpsilons, Epsilons, side='right') - 1,
+                0, len(AnchorEpsilons) - 2)
+    w = ((Epsilons - AnchorEpsilons[i]) /
+         (AnchorEpsilons[i + 1] - AnchorEpsilons[i]))[:, None, None]
+    points = AnchorPoints[i] * (1 - w) + AnchorPoints[i + 1] * w
+    return points, params
+
+
+def FitSectionsBatch(points, params, degree=3, n_poles=None, AsCurves=False):
+    """Least-squares fits B-spline curves to many sections sampled at the same
+    parameter values, with a single shared basis and knot vector.
+
+    Parameters
+    ----------
+    points : array of float, shape (N, M, 2)
+        x, z points of N sections (e.g. from InterpolateSectionsBatch)
+
+    params : array of float, shape (M,)
+        Parameter values of the points, shared by all sections
+
+    degree : int (default 3)
+
+    n_poles : int (default None)
+        Number of poles of each curve (default M // 2)
+
+    AsCurves : bool (default False)
+        If True, OCC curves are also built for each section
+
+    Returns
+    -------
+    poles : array of float, shape (N, n_poles, 2)
+        x, z poles of each section
+
+    knots : array of float
+        The full knot vector of all sections
+
+    curves : list of OCC.Geom.Geom_BSplineCurve
+        Unit chord section curves in the xz plane (only returned if AsCurves)
+    """
+    knots, operator = bspline.fit_operator(params, degree, n_poles)
+    poles = np.matmul(operator, np.asarray(points, dtype=float))
+    if not AsCurves:
+        return poles, knots
+    curves = []
+    for section_poles in poles:
+        poles3d = np.column_stack([section_poles[:, 0],
+                                   np.zeros(len(section_poles)),
+                                   section_poles[:, 1]])
+        curves.append(act.bspline_from_arrays(poles3d, knots, degree))
+    return poles, knots, curves
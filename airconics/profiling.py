@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Hierarchical timing of geometry builds
+
+Build methods and the heavier AirCONICStools functions are wrapped in named
+spans. When profiling is enabled, the wall and CPU time and the number of
+calls of every span are accumulated in a tree which follows the nesting of
+the calls (e.g. Topology.Build > LiftingSurface.Build > Loft >
+AddSurfaceLoft):
+
+>>> from airconics import profiling
+>>> with profiling.profile() as profiler:
+...     Wing = LiftingSurface(...)
+>>> print(profiler.to_json())
+>>> profiler.to_folded('wing.folded')    # input for flamegraph.pl/speedscope
+
+Profiling is off by default, in which case span returns a shared no-op
+context manager and timed functions call straight through. It can also be
+enabled by setting the environment variable AIRCONICS_PROFILE=1.
+"""
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from functools import wraps
+
+
+class SpanNode(object):
+    """Accumulated timings of one span, at one position in the call tree
+
+    Attributes
+    ----------
+    name : string
+
+    count : int
+        Number of times the span was entered
+
+    wall, cpu : scalar
+        Total wall clock and process CPU time spent in the span (seconds),
+        including child spans
+
+    children : OrderedDict
+        Mapping of name to SpanNode of the spans entered inside this one
+    """
+    __slots__ = ('name', 'count', 'wall', 'cpu', 'children')
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.wall = 0.
+        self.cpu = 0.
+        self.children = OrderedDict()
+
+    def child(self, name):
+        """Returns the child node name, creating it if required"""
+        try:
+            return self.children[name]
+        except KeyError:
+            node = self.children[name] = SpanNode(name)
+            return node
+
+    @property
+    def self_wall(self):
+        """Wall time spent in the span itself, excluding child spans"""
+        return max(self.wall - sum(child.wall
+                                   for child in self.children.values()), 0.)
+
+    def to_dict(self):
+        """Returns the subtree as nested dicts (see Profiler.to_json)"""
+        return OrderedDict([('name', self.name),
+                            ('count', self.count),
+                            ('wall', self.wall),
+                            ('cpu', self.cpu),
+                            ('children', [child.to_dict() for child in
+                                          self.children.values()])])
+
+    def folded(self, prefix=()):
+        """Yields (stack, self wall time) for all nodes of the subtree"""
+        stack = prefix + (self.name,)
+        yield stack, self.self_wall
+        for child in self.children.values():
+            for item in child.folded(stack):
+                yield item
+
+
+class _NullSpan(object):
+    """The span returned while profiling is disabled: does nothing"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+    __slots__ = ('profiler', 'name', 'node', 'parent', 'wall0', 'cpu0')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        local = self.profiler._local
+        self.parent = getattr(local, 'node', None) or self.profiler.root
+        self.node = self.parent.child(self.name)
+        local.node = self.node
+        self.cpu0 = time.process_time()
+        self.wall0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.wall0
+        cpu = time.process_time() - self.cpu0
+        node = self.node
+        node.count += 1
+        node.wall += wall
+        node.cpu += cpu
+        self.profiler._local.node = self.parent
+        return False
+
+
+class Profiler(object):
+    """Collects the timings of spans into a tree, rooted at self.root
+
+    Attributes
+    ----------
+    enabled : bool
+        Spans are only timed while enabled is True
+
+    root : SpanNode
+        Spans entered outside any other span are children of root (spans
+        entered in other threads are also added here)
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """Discards all timings"""
+        self.root = SpanNode('root')
+        self._local = threading.local()
+
+    def span(self, name):
+        """Returns a context manager timing the enclosed code as span name,
+        nested in the currently open span"""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name)
+
+    def to_dict(self):
+        """Returns the timings as nested dicts with keys name, count, wall,
+        cpu and children"""
+        return self.root.to_dict()
+
+    def to_json(self, filename=None, indent=2):
+        """Returns (and optionally writes to filename) the timings tree as
+        JSON (see to_dict)"""
+        output = json.dumps(self.to_dict(), indent=indent)
+        if filename is not None:
+            with open(filename, 'w') as fout:
+                fout.write(output)
+        return output
+
+    def to_folded(self, filename=None):
+        """Returns (and optionally writes to filename) the timings in the
+        'folded stacks' format read by flame graph tools (flamegraph.pl,
+        speedscope): one line 'root;span;child <microseconds>' per node, with
+        the time spent in the node itself"""
+        lines = ['{} {}'.format(';'.join(stack), int(round(wall * 1e6)))
+                 for stack, wall in self.root.folded()
+                 if len(stack) > 1]
+        output = '\n'.join(lines) + '\n'
+        if filename is not None:
+            with open(filename, 'w') as fout:
+                fout.write(output)
+        return output
+
+
+# The profiler used by all airconics spans
+PROFILER = Profiler(enabled=os.environ.get('AIRCONICS_PROFILE', '0') != '0')
+
+
+def span(name):
+    """Returns a context manager which times the enclosed code in PROFILER
+    (a shared no-op if profiling is disabled)
+
+    Examples
+    --------
+    >>> with profiling.span('Loft'):
+    ...     Surf = act.AddSurfaceLoft(Sections)
+    """
+    if not PROFILER.enabled:
+        return NULL_SPAN
+    return _Span(PROFILER, name)
+
+
+def timed(name=None):
+    """Decorator timing every call of a function or method as a span
+
+    Parameters
+    ----------
+    name : string (default None)
+        The name of the span. Defaults to the qualified name of the function,
+        e.g. 'Fuselage.BuildFuselageOML'
+    """
+    def decorator(funct):
+        span_name = name or funct.__qualname__
+
+        @wraps(funct)
+        def Timed(*args, **kwargs):
+            if not PROFILER.enabled:
+                return funct(*args, **kwargs)
+            with _Span(PROFILER, span_name):
+                return funct(*args, **kwargs)
+        return Timed
+    return decorator
+
+
+def enable():
+    PROFILER.enabled = True
+
+
+def disable():
+    PROFILER.enabled = False
+
+
+def reset():
+    PROFILER.reset()
+
+
+@contextmanager
+def profile(reset=True):
+    """Enables profiling inside the context, and yields the Profiler
+
+    Parameters
+    ----------
+    reset : bool (default True)
+        Discards any previous timings on entry
+    """
+    enabled = PROFILER.enabled
+    if reset:
+        PROFILER.reset()
+    PROFILER.enabled = True
+    try:
+        yield PROFILER
+    finally:
+        PROFILER.enabled = enabled
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+Precompiled binary store of the Selig airfoil coordinate database
+
+All of the profiles found in airconics/coord_seligFmt are parsed once and
+written to a single flat float64 file (x, z pairs of every profile, one after
+the other) plus a small index of profile names and row offsets. The flat file
+is opened with numpy.memmap, so that looking up a profile is an O(1),
+zero-copy slice with no text parsing.
+
+The store is compiled on first use (or ahead of time with
+`python -m airconics.selig_database`) and is recompiled automatically if the
+.dat files change. It is written next to the .dat files if that directory is
+writable, otherwise to the user cache directory ($XDG_CACHE_HOME/airconics or
+~/.cache/airconics).
+"""
+import os
+import tempfile
+import numpy as np
+from pkg_resources import resource_filename
+
+
+COORDS_FILENAME = 'selig_coords.bin'
+INDEX_FILENAME = 'selig_index.npz'
+
+# The single open database for this process (see load_database)
+_DATABASE = None
+
+
+def selig_directory():
+    """Returns the directory containing the Selig format .dat files"""
+    return resource_filename('airconics', 'coord_seligFmt')
+
+
+def user_cache_directory():
+    """Returns the airconics directory in the user cache directory
+    ($XDG_CACHE_HOME/airconics or ~/.cache/airconics), for generated data"""
+    cache_root = os.environ.get('XDG_CACHE_HOME',
+                                os.path.join(os.path.expanduser('~'),
+                                             '.cache'))
+    return os.path.join(cache_root, 'airconics')
+
+
+def _candidate_directories():
+    """Directories in which the compiled store may be found, in order of
+    preference"""
+    return [selig_directory(), user_cache_directory()]
+
+
+def _dat_files(directory):
+    return sorted(f for f in os.listdir(directory) if f.endswith('.dat'))
+
+
+def data_signature(directory=None):
+    """Returns a string which changes whenever a .dat file in the Selig
+    directory is added, removed or modified.
+
+    Parameters
+    ----------
+    directory : string (default None)
+        The directory containing the .dat files. Defaults to the package
+        coord_seligFmt directory
+
+    Returns
+    -------
+    signature : string
+    """
+    if directory is None:
+        directory = selig_directory()
+    count = 0
+    total_size = 0
+    latest = 0
+    for entry in os.scandir(directory):
+        if entry.name.endswith('.dat'):
+            stat = entry.stat()
+            count += 1
+            total_size += stat.st_size
+            latest = max(latest, stat.st_mtime_ns)
+    return '{}:{}:{}'.format(count, total_size, latest)
+
+
+def parse_selig_data(data):
+    """Parses the raw bytes of a Selig format file.
+
+    Assumes a header line, followed by x column, z column, from upper trailing
+    edge to lower trailing edge (lines separated by '\\r\\n').
+
+    Parameters
+    ----------
+    data : bytes
+        The file contents
+
+    Returns
+    -------
+    points : array of float, shape (N, 2)
+        x, z coordinates of the airfoil curve
+    """
+    data = data.split(b'\r\n')[1:-1]
+    N = len(data)
+    points = np.zeros([N, 2])
+    for i, line in enumerate(data):
+        vals = line.split()    # vals[0] = x coord, vals[1] = y coord
+        points[i, 0] = float(vals[0])
+        points[i, 1] = float(vals[1])
+    return points
+
+
+def write_atomic(path, write_funct):
+    """Writes a file by calling write_funct(fileobject) on a temporary file
+    in the same directory and renaming it into place"""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fout:
+            write_funct(fout)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def build_database(directory=None, source_directory=None):
+    """Parses every Selig .dat file and writes the binary store.
+
+    Files which cannot be parsed are left out of the store (they are listed in
+    the 'skipped' entry of the index), and are handled by the text parser
+    when requested.
+
+    Parameters
+    ----------
+    directory : string (default None)
+        Output directory. If None, the first writable directory of the
+        package coord_seligFmt directory and the user cache directory is used
+
+    source_directory : string (default None)
+        Directory containing the .dat files (default: package coord_seligFmt)
+
+    Returns
+    -------
+    directory : string
+        The directory to which the store was written
+    """
+    if source_directory is None:
+        source_directory = selig_directory()
+
+    signature = data_signature(source_directory)
+    names = []
+    skipped = []
+    blocks = []
+    for filename in _dat_files(source_directory):
+        with open(os.path.join(source_directory, filename), 'rb') as fin:
+            data = fin.read()
+        try:
+            points = parse_selig_data(data)
+        except (ValueError, IndexError):
+            skipped.append(filename[:-4])
+            continue
+        names.append(filename[:-4])
+        blocks.append(points)
+
+    offsets = np.zeros(len(blocks) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(block) for block in blocks])
+    coords = np.ascontiguousarray(np.vstack(blocks), dtype='<f8')
+
+    if directory is None:
+        directories = _candidate_directories()
+    else:
+        directories = [directory]
+
+    for outdir in directories:
+        try:
+            if not os.path.isdir(outdir):
+                os.makedirs(outdir)
+            write_atomic(os.path.join(outdir, COORDS_FILENAME),
+                          lambda fout: fout.write(coords.tobytes()))
+            write_atomic(os.path.join(outdir, INDEX_FILENAME),
+                          lambda fout: np.savez(fout,
+                                                names=np.array(names),
+                                                offsets=offsets,
+                                                skipped=np.array(skipped),
+                                                signature=signature))
+            return outdir
+        except (IOError, OSError):
+            continue
+    raise IOError("Could not write the Selig database to any of {}"
+                  .format(directories))
+
+
+class SeligDatabase(object):
+    """Read-only view of the compiled Selig coordinate store
+
+    Parameters
+    ----------
+    directory : string
+        Directory containing the compiled store (see build_database)
+
+    Attributes
+    ----------
+    names : array of string
+        Names of all profiles in the store, sorted alphabetically
+
+    offsets : array of int, length len(names) + 1
+        Row offsets of each profile in coords
+
+    coords : numpy.memmap of float, shape (Npoints, 2)
+        x, z coordinates of all profiles, stacked
+
+    signature : string
+        The data_signature of the .dat files at compile time
+    """
+    def __init__(self, directory):
+        with np.load(os.path.join(directory, INDEX_FILENAME)) as index:
+            self.names = index['names']
+            self.offsets = index['offsets']
+            self.skipped = set(index['skipped'].tolist())
+            self.signature = str(index['signature'])
+        self.coords = np.memmap(os.path.join(directory, COORDS_FILENAME),
+                                dtype='<f8', mode='r',
+                                shape=(int(self.offsets[-1]), 2))
+        self.directory = directory
+        self._lookup = {name: i for i, name in enumerate(self.names.tolist())}
+
+    def __contains__(self, name):
+        return name in self._lookup
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, name):
+        i = self._lookup[name]
+        return self.coords[self.offsets[i]:self.offsets[i + 1]]
+
+    def get(self, name, default=None):
+        """Returns the (N, 2) read-only array of x, z points of profile name,
+        or default if the profile is not in the store"""
+        i = self._lookup.get(name)
+        if i is None:
+            return default
+        return self.coords[self.offsets[i]:self.offsets[i + 1]]
+
+
+def load_database(rebuild=False):
+    """Opens (compiling first, if required) the Selig coordinate store.
+
+    The store is opened once per process; it is recompiled if it is missing
+    or if the .dat files have changed since it was compiled.
+
+    Parameters
+    ----------
+    rebuild : bool (default False)
+        Forces recompilation of the store
+
+    Returns
+    -------
+    db : SeligDatabase
+    """
+    global _DATABASE
+    if _DATABASE is not None and not rebuild:
+        return _DATABASE
+
+    signature = data_signature()
+    db = None
+    if not rebuild:
+        for directory in _candidate_directories():
+            try:
+                candidate = SeligDatabase(directory)
+            except (IOError, OSError, KeyError, ValueError):
+                continue
+            if candidate.signature == signature:
+                db = candidate
+                break
+
+    if db is None:
+        db = SeligDatabase(build_database())
+
+    _DATABASE = db
+    return db
+
+
+def profile_points(SeligProfile):
+    """Returns the x, z coordinates of a Selig profile from the compiled store
+
+    Parameters
+    ----------
+    SeligProfile : string
+        The base name of the profile, e.g. 'b707a'
+
+    Returns
+    -------
+    points : array of float, shape (N, 2), or None
+        Read-only view of the profile points: None if the profile is not in
+        the store (i.e. the profile does not exist or could not be compiled)
+    """
+    try:
+        db = load_database()
+    except (IOError, OSError):
+        return None
+    return db.get(SeligProfile)
+
+
+if __name__ == '__main__':
+    outdir = build_database()
+    print("Selig database written to {}".format(outdir))
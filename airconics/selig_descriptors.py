@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Geometric descriptor index of the Selig airfoil database
+
+A table of descriptors (maximum thickness and its location, maximum camber
+and its location, leading edge radius, trailing edge thickness and area) is
+computed with numpy from the raw coordinates of every profile in the compiled
+Selig store (see airconics.selig_database). The table is cached next to the
+store in a small .npz file, which is rebuilt only when the .dat files change,
+and is queried by nearest neighbour search:
+
+>>> from airconics import selig_descriptors
+>>> selig_descriptors.nearest_profiles(k=3, thickness=0.12, camber=0.02,
+...                                    camber_loc=0.4)
+
+A scipy.spatial.cKDTree is used for the search if scipy is installed,
+otherwise the distances to all profiles are computed directly (the table is
+small, so that this is also fast).
+"""
+import os
+import numpy as np
+
+from . import selig_database
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+
+DESCRIPTORS_FILENAME = 'selig_descriptors.npz'
+
+# Column names of the descriptor table. All values are fractions of chord
+# (area: fraction of chord squared)
+DESCRIPTORS = ('thickness', 'thickness_loc', 'camber', 'camber_loc',
+               'le_radius', 'te_thickness', 'area')
+
+# Chordwise stations at which the surfaces are compared (cosine spacing)
+_STATIONS = 0.5 * (1 - np.cos(np.linspace(0, np.pi, 201)))
+
+# Chordwise station at which the leading edge radius is estimated
+_LE_RADIUS_STATION = 0.005
+
+# The single open index for this process (see load_descriptor_index)
+_INDEX = None
+
+
+def profile_descriptors(points):
+    """Computes the geometric descriptors of an airfoil from its coordinates
+
+    Parameters
+    ----------
+    points : array of float, shape (N, 2)
+        x, z airfoil points in Selig order (from the upper trailing edge,
+        round the leading edge, to the lower trailing edge). The points need
+        not be normalised to unit chord
+
+    Returns
+    -------
+    descriptors : array of float, shape (len(DESCRIPTORS),)
+        see DESCRIPTORS. The camber is measured midway between the upper and
+        lower surfaces at equal x, and is signed (negative for a profile with
+        negative camber). The leading edge radius is estimated from the
+        thickness near the leading edge, assuming t(x)^2 = 8 r x
+
+    Notes
+    -----
+    The chord is taken from the leading edge (the point of minimum x) to
+    x = max(x). Profiles ordered from the lower trailing edge are detected
+    and handled.
+    """
+    points = np.asarray(points, dtype=float)
+    iLE = np.argmin(points[:, 0])
+    xLE, zLE = points[iLE]
+    chord = np.max(points[:, 0]) - xLE
+    x = (points[:, 0] - xLE) / chord
+    z = (points[:, 1] - zLE) / chord
+
+    # Both surfaces, from the leading edge to the trailing edge:
+    upper = np.argsort(x[:iLE + 1], kind='stable')
+    lower = iLE + np.argsort(x[iLE:], kind='stable')
+    zu = np.interp(_STATIONS, x[upper], z[upper])
+    zl = np.interp(_STATIONS, x[lower], z[lower])
+    if np.mean(zu) < np.mean(zl):
+        zu, zl = zl, zu
+
+    thickness = zu - zl
+    camber = (zu + zl) / 2.
+    it = np.argmax(thickness)
+    ic = np.argmax(np.abs(camber))
+    t_le = np.interp(_LE_RADIUS_STATION, _STATIONS, thickness)
+
+    # Shoelace formula over the closed polygon of the points
+    area = 0.5 * np.abs(np.dot(x, np.roll(z, -1)) - np.dot(z, np.roll(x, -1)))
+
+    return np.array([thickness[it], _STATIONS[it],
+                     camber[ic], _STATIONS[ic],
+                     t_le ** 2 / (8 * _LE_RADIUS_STATION),
+                     np.abs(z[0] - z[-1]),
+                     area])
+
+
+def build_descriptor_table(directory=None):
+    """Computes the descriptors of every profile in the Selig store, and
+    writes them to the descriptor file.
+
+    Parameters
+    ----------
+    directory : string (default None)
+        Output directory. Defaults to the directory of the compiled Selig
+        store, or the user cache directory if that is not writable
+
+    Returns
+    -------
+    names : array of string
+        Profile names (profiles with degenerate coordinates are left out)
+
+    table : array of float, shape (len(names), len(DESCRIPTORS))
+    """
+    db = selig_database.load_database()
+    names = []
+    rows = []
+    for i, name in enumerate(db.names.tolist()):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            row = profile_descriptors(db.coords[db.offsets[i]:
+                                                db.offsets[i + 1]])
+        if np.all(np.isfinite(row)):
+            names.append(name)
+            rows.append(row)
+    names = np.array(names)
+    table = np.array(rows)
+
+    if directory is None:
+        directories = [db.directory, selig_database.user_cache_directory()]
+    else:
+        directories = [directory]
+    for outdir in directories:
+        try:
+            if not os.path.isdir(outdir):
+                os.makedirs(outdir)
+            selig_database.write_atomic(
+                os.path.join(outdir, DESCRIPTORS_FILENAME),
+                lambda fout: np.savez(fout, names=names, table=table,
+                                      columns=np.array(DESCRIPTORS),
+                                      signature=db.signature))
+            break
+        except (IOError, OSError):
+            continue
+    return names, table
+
+
+class DescriptorIndex(object):
+    """Nearest neighbour index of airfoil profiles by geometric descriptors
+
+    Parameters
+    ----------
+    names : array of string
+
+    table : array of float, shape (len(names), len(DESCRIPTORS))
+
+    Attributes
+    ----------
+    scales : array of float, shape (len(DESCRIPTORS),)
+        Standard deviation of each descriptor over the table: query
+        distances are measured in these units unless weights are given
+    """
+    def __init__(self, names, table):
+        self.names = np.asarray(names)
+        self.table = np.asarray(table, dtype=float)
+        self.scales = self.table.std(axis=0)
+        self.scales[self.scales == 0] = 1.
+        self._lookup = {name: i for i, name in enumerate(self.names.tolist())}
+        # KD-trees of the normalised table, by tuple of descriptor columns
+        self._trees = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._lookup
+
+    def descriptors(self, name):
+        """Returns a dictionary of the descriptors of profile name"""
+        return dict(zip(DESCRIPTORS, self.table[self._lookup[name]].tolist()))
+
+    def query(self, k=5, weights=None, **targets):
+        """Returns the profiles closest to the target descriptors
+
+        Parameters
+        ----------
+        k : int (default 5)
+            Number of profiles to return
+
+        weights : dict (default None)
+            Relative weight of each target descriptor in the distance
+            (default 1 for all)
+
+        **targets : scalar
+            Target values of any of the DESCRIPTORS (fractions of chord), e.g.
+            thickness=0.12, camber=0.02, camber_loc=0.4. Descriptors which are
+            not given are ignored
+
+        Returns
+        -------
+        results : list of (name, distance) tuples
+            The k closest profiles, ranked by distance
+        """
+        unknown = set(targets) - set(DESCRIPTORS)
+        if unknown:
+            raise ValueError("Unknown descriptor(s) {}: expected any of {}"
+                             .format(sorted(unknown), DESCRIPTORS))
+        if not targets:
+            raise ValueError("At least one target descriptor is required")
+        if k < 1:
+            raise ValueError("k must be at least 1, got {}".format(k))
+        weights = weights or {}
+        columns = tuple(i for i, name in enumerate(DESCRIPTORS)
+                        if name in targets)
+        scale = np.array([weights.get(DESCRIPTORS[i], 1.) / self.scales[i]
+                          for i in columns])
+        target = np.array([targets[DESCRIPTORS[i]] for i in columns]) * scale
+        k = min(k, len(self.names))
+
+        if cKDTree is not None:
+            key = (columns, scale.tobytes())
+            tree = self._trees.get(key)
+            if tree is None:
+                tree = cKDTree(self.table[:, columns] * scale)
+                self._trees[key] = tree
+            distances, indices = tree.query(target, k=k)
+            distances = np.atleast_1d(distances)
+            indices = np.atleast_1d(indices)
+        else:
+            all_distances = np.linalg.norm(
+                self.table[:, columns] * scale - target, axis=1)
+            indices = np.argpartition(all_distances, k - 1)[:k]
+            indices = indices[np.argsort(all_distances[indices],
+                                         kind='stable')]
+            distances = all_distances[indices]
+        return list(zip(self.names[indices].tolist(), distances.tolist()))
+
+
+def load_descriptor_index(rebuild=False):
+    """Opens (computing first, if required) the descriptor index of the
+    Selig database.
+
+    The index is loaded once per process; the table is recomputed if it is
+    missing or if the .dat files have changed since it was computed.
+
+    Parameters
+    ----------
+    rebuild : bool (default False)
+        Forces recomputation of the descriptor table
+
+    Returns
+    -------
+    index : DescriptorIndex
+    """
+    global _INDEX
+    if _INDEX is not None and not rebuild:
+        return _INDEX
+
+    db = selig_database.load_database()
+    index = None
+    if not rebuild:
+        for directory in [db.directory,
+                          selig_database.user_cache_directory()]:
+            try:
+                with np.load(os.path.join(directory,
+                                          DESCRIPTORS_FILENAME)) as data:
+                    if (str(data['signature']) == db.signature and
+                            tuple(data['columns'].tolist()) == DESCRIPTORS):
+                        index = DescriptorIndex(data['names'], data['table'])
+                        break
+            except (IOError, OSError, KeyError, ValueError):
+                continue
+
+    if index is None:
+        index = DescriptorIndex(*build_descriptor_table())
+
+    _INDEX = index
+    return index
+
+
+def nearest_profiles(k=5, weights=None, **targets):
+    """Returns the names of the k Selig profiles closest to the target
+    descriptors, ranked by distance (see DescriptorIndex.query)
+
+    Examples
+    --------
+    >>> nearest_profiles(k=3, thickness=0.12, camber=0.02, camber_loc=0.4)
+    """
+    index = load_descriptor_index()
+    return [name for name, distance in index.query(k, weights, **targets)]
+
+
+if __name__ == '__main__':
+    names, table = build_descriptor_table()
+    print("Descriptors of {} profiles written".format(len(names)))
@@ -11,6 +11,7 @@ from .base import AirconicsCollection
 from .liftingsurface import LiftingSurface
 from .fuselage_oml import Fuselage
 from .engine import Engine
+from . import profiling
 from OCC.Core.gp import gp_Ax2
 # import copy
 # import numpy as np
@@ -204,6 +205,7 @@ class Topology(AirconicsCollection):
                     output += ', '
         return output
 
+    @profiling.timed()
     def Build(self):
         """Recursively builds all sub components in the current topology tree
         if self.construct_geometry is true. Will also mirror components
@@ -219,7 +221,8 @@ class Topology(AirconicsCollection):
             for name, part in self.items():
                 part.Build()
 
-        self.MirrorSubtree()
+        with profiling.span('MirrorSubtree'):
+            self.MirrorSubtree()
 
     def MirrorSubtree(self):
         """Mirrors the geometry where required, based on the current topology
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of Airfoil placement
+
+Compares the previous sequential placement of the airfoil curve and chord
+line (Scale, Rotate, Rotate and Translate on each object) with a single
+composed gp_Trsf (Airfoil.PlacementTrsf), and with the numpy placement of
+the raw points (Airfoil.PlacedPoints).
+
+Usage: python benchmarks/bench_airfoil_transform.py
+"""
+import timeit
+import numpy as np
+from OCC.Core.GC import GC_MakeSegment
+from OCC.Core.Geom import Geom_BSplineCurve
+from OCC.Core.gp import gp_Pnt, gp_Vec, gp_OX, gp_OY
+
+from airconics.primitives import Airfoil
+
+
+def sequential_transform(Af, Curve):
+    """The previous implementation, for reference"""
+    Curve.Scale(gp_Pnt(0, 0, 0), Af.ChordLength)
+    if Af.Rotation:
+        Curve.Rotate(gp_OX(), np.radians(Af.Rotation))
+    if Af.Twist:
+        Curve.Rotate(gp_OY(), -np.radians(Af.Twist))
+    Curve.Translate(gp_Vec(*Af.LE))
+    return Curve
+
+
+def composed_transform(Af, Curve):
+    # Build the transformation anew each time, as for a new section
+    Af._placement = None
+    Curve.Transform(Af.PlacementTrsf())
+    return Curve
+
+
+def place(transform, Af, UnitCurve):
+    Curve = Geom_BSplineCurve.DownCast(UnitCurve.Copy())
+    ChordLine = GC_MakeSegment(gp_Pnt(0, 0, 0), gp_Pnt(1, 0, 0)).Value()
+    transform(Af, Curve)
+    transform(Af, ChordLine)
+
+
+def main(number=2000):
+    Af = Airfoil(LeadingEdgePoint=[1., 2., 3.], ChordLength=2.5,
+                 Rotation=10, Twist=5, Naca4Profile='2412')
+    UnitCurve = Af._fitUnitCurve()
+
+    results = [
+        ('sequential (curve + chord line)',
+         lambda: place(sequential_transform, Af, UnitCurve)),
+        ('composed gp_Trsf (curve + chord line)',
+         lambda: place(composed_transform, Af, UnitCurve)),
+        ('numpy points (PlacedPoints)', Af.PlacedPoints)]
+    for name, funct in results:
+        best = min(timeit.repeat(funct, number=number, repeat=5))
+        print("{:<40} {:8.2f} us/section".format(name, best / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the bounding box modes of act.ObjectsExtents
+
+Times the 'fast', 'triangulation' and 'optimal' bounding boxes of a
+transonic airliner wing, uncached and cached, and reports how much larger
+each box is than the optimal one.
+
+Usage: python benchmarks/bench_bounding_box.py
+"""
+import timeit
+import numpy as np
+
+import airconics.AirCONICStools as act
+from airconics.liftingsurface import LiftingSurface
+from airconics.examples.wing_example_transonic_airliner import *
+
+
+def best_time(funct, number=20, repeat=5):
+    return min(timeit.repeat(funct, number=number, repeat=repeat)) / number
+
+
+def main():
+    Wing = LiftingSurface((0, 0, 0), mySweepAngleFunctionAirliner,
+                          myDihedralFunctionAirliner,
+                          myTwistFunctionAirliner,
+                          myChordFunctionAirliner,
+                          myAirfoilFunctionAirliner)
+    shape = Wing['Surface']
+
+    optimal = np.array(act.ObjectsExtents(shape, mode='optimal',
+                                          use_cache=False))
+    print("{:>14} {:>14} {:>12} {:>18}".format(
+        'mode', 'uncached (ms)', 'cached (us)', 'size / optimal - 1'))
+    for mode in ['fast', 'triangulation', 'optimal']:
+        uncached = best_time(lambda: act.ObjectsExtents(shape, mode=mode,
+                                                        use_cache=False))
+        act.ObjectsExtents(shape, mode=mode)
+        cached = best_time(lambda: act.ObjectsExtents(shape, mode=mode),
+                           number=1000)
+        extents = np.array(act.ObjectsExtents(shape, mode=mode))
+        excess = np.max((extents[3:] - extents[:3]) /
+                        (optimal[3:] - optimal[:3]) - 1)
+        print("{:>14} {:>14.3f} {:>12.2f} {:>18.2e}".format(
+            mode, uncached * 1e3, cached * 1e6, excess))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of direct B-spline skinning against BRepOffsetAPI_ThruSections
+
+Lofts increasing numbers of compatible (least-squares fitted) NACA sections
+with act.AddSurfaceLoft, with and without the direct skinning path.
+
+Usage: python benchmarks/bench_loft.py
+"""
+import timeit
+import numpy as np
+
+import airconics.AirCONICStools as act
+from airconics.primitives import Airfoil
+
+
+def sections(n):
+    """n compatible sections of a tapered, swept wing"""
+    eps = np.linspace(0, 1, n)
+    return [Airfoil([0.5 * e, 10 * e, 0], ChordLength=1 - 0.6 * e,
+                    Naca4Profile='2412', FitMethod='lsq').Curve
+            for e in eps]
+
+
+def best_time(funct, repeat=3):
+    return min(timeit.repeat(funct, number=1, repeat=repeat))
+
+
+def main():
+    print("{:>10} {:>16} {:>12}".format('Nsections', 'ThruSections (s)',
+                                        'direct (s)'))
+    for n in [5, 11, 21, 41]:
+        curves = sections(n)
+        thru = best_time(lambda: act.AddSurfaceLoft(curves, solid=False))
+        direct = best_time(lambda: act.AddSurfaceLoft(curves, solid=False,
+                                                      direct=True))
+        print("{:>10} {:>16.4f} {:>12.4f}".format(n, thru, direct))
+
+
+if __name__ == '__main__':
+    main()
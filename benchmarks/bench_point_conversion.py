@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of the conversion of numpy point arrays to and from
+TColgp_Array1OfPnt
+
+Compares the per-point cost of act.point_array_to_TColgp_PntArrayType with
+the previous row by row implementation, and of reading the points back with
+act.TColgp_PntArrayType_to_point_array.
+
+Usage: python benchmarks/bench_point_conversion.py
+"""
+import timeit
+import numpy as np
+from OCC.Core.gp import gp_Pnt
+from OCC.Core.TColgp import TColgp_Array1OfPnt
+
+import airconics.AirCONICStools as act
+
+
+def legacy_point_array_to_TColgp(array, _type=TColgp_Array1OfPnt):
+    """The previous implementation, for reference"""
+    try:
+        dims = np.shape(array)
+        if dims[0] == 3:
+            array = array.T
+        elif dims[1] != 3:
+            raise ValueError("Array must have dimension Npnts x 3 (x, y, z)")
+        N = np.shape(array)[0]
+        pt_arr = _type(1, N)
+        for i, pt in enumerate(array):
+            pt_arr.SetValue(i + 1, gp_Pnt(*pt.tolist()))
+    except:
+        N = len(array)
+        pt_arr = _type(1, N)
+        for i, pt in enumerate(array):
+            pt_arr.SetValue(i + 1, pt)
+    return pt_arr
+
+
+def legacy_TColgp_to_point_array(pt_arr):
+    """Row by row read back, for reference"""
+    N = pt_arr.Length()
+    array = np.zeros([N, 3])
+    for i in range(N):
+        pnt = pt_arr.Value(i + 1)
+        array[i] = [pnt.X(), pnt.Y(), pnt.Z()]
+    return array
+
+
+def per_point_time(funct, arg, npoints, repeat=5):
+    number = max(1, 20000 // npoints)
+    best = min(timeit.repeat(lambda: funct(arg), number=number,
+                             repeat=repeat))
+    return best / number / npoints
+
+
+def main():
+    print("{:>8} {:>22} {:>22}".format(
+        'Npoints', 'to TColgp (us/pt)', 'to numpy (us/pt)'))
+    print("{:>8} {:>10} {:>11} {:>10} {:>11}".format(
+        '', 'legacy', 'bulk', 'legacy', 'bulk'))
+    for npoints in [10, 100, 1000, 10000]:
+        array = np.random.rand(npoints, 3)
+        pt_arr = act.point_array_to_TColgp_PntArrayType(array)
+        times = [
+            per_point_time(legacy_point_array_to_TColgp, array, npoints),
+            per_point_time(act.point_array_to_TColgp_PntArrayType, array,
+                           npoints),
+            per_point_time(legacy_TColgp_to_point_array, pt_arr, npoints),
+            per_point_time(act.TColgp_PntArrayType_to_point_array, pt_arr,
+                           npoints)]
+        print("{:>8} {:>10.3f} {:>11.3f} {:>10.3f} {:>11.3f}".format(
+            npoints, *[t * 1e6 for t in times]))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,8 +4,13 @@ Created on Tue Apr 19 16:11:18 2016
 
 @author: pchambers
 """
+import os
 import pytest
 
+# Tests build geometry from scratch, unless they enable the part cache
+# explicitly (see test_part_cache.py)
+os.environ.setdefault('AIRCONICS_PART_CACHE', '0')
+
 
 def pytest_addoption(parser):
     parser.addoption("--examples", action="store_true",
@@ -30,6 +30,15 @@ def test_coslin():
     assert(np.all(np.abs(abscissa - ans) < 1e-10))
 
 
+def test_coslin_array():
+    # One abscissa per transition point, each equal to the scalar version
+    transitions = np.array([0.2, 0.5, 0.9])
+    abscissas, NCosPoints = act.coslin(transitions, 8, 8)
+    assert(abscissas.shape == (3, 16))
+    for i, transition in enumerate(transitions):
+        assert(np.all(abscissas[i] == act.coslin(transition, 8, 8)[0]))
+
+
 def test_Objects_Extents():
     box = act.BRepPrimAPI_MakeBox(1, 1, 1).Shape()
     X = np.array(act.ObjectsExtents(box))
@@ -37,6 +46,44 @@ def test_Objects_Extents():
     assert(np.all(np.abs(X - expected) < 1e-5))
 
 
+@pytest.mark.parametrize('mode', act.BBOX_MODES)
+def test_Objects_Extents_modes(mode):
+    box = act.BRepPrimAPI_MakeBox(1, 2, 3).Shape()
+    X = np.array(act.ObjectsExtents([box], mode=mode, use_cache=False))
+    assert(np.all(np.abs(X - [0, 0, 0, 1, 2, 3]) < 1e-5))
+
+    with pytest.raises(ValueError):
+        act.ObjectsExtents(box, mode='exact')
+
+
+def test_Objects_Extents_cache():
+    act.BBOX_CACHE.clear()
+    box = act.BRepPrimAPI_MakeBox(1, 1, 1).Shape()
+    first = act.ObjectsExtents(box)
+    assert(act.ObjectsExtents(box) == first)
+    info = act.BBOX_CACHE.info()
+    assert(info.hits == 1 and info.misses == 1 and info.currsize == 1)
+
+    # A transformed shape is not confused with the original
+    moved = act.translate_topods_from_vector(box, gp_Vec(1, 0, 0), copy=False)
+    X = np.array(act.ObjectsExtents(moved))
+    assert(np.all(np.abs(X - [1, 0, 0, 2, 1, 1]) < 1e-5))
+    assert(act.BBOX_CACHE.info().misses == 2)
+
+
+def test_Objects_Extents_cache_weak():
+    import gc
+    import weakref
+    act.BBOX_CACHE.clear()
+    box = act.BRepPrimAPI_MakeBox(1, 1, 1).Shape()
+    act.ObjectsExtents(box)
+    # The cache does not keep the shape alive
+    ref = weakref.ref(box)
+    del box
+    gc.collect()
+    assert(ref() is None)
+
+
 def test_points_to_bspline_nparray():
     # This is just to check my function will succeed to create a bspline - 
     #  Hopefully PythonOCC tests will test the values of curves generated
@@ -51,6 +98,58 @@ def test_points_to_bspline_nparray():
     o = spline
 
 
+def test_point_array_to_TColgp_PntArrayType():
+    rng = np.random.RandomState(0)
+    pnts = rng.rand(20, 3)
+    pt_arr = act.point_array_to_TColgp_PntArrayType(pnts)
+    assert(pt_arr.Length() == 20)
+    assert(np.all(act.TColgp_PntArrayType_to_point_array(pt_arr) == pnts))
+
+    # Transposed input
+    pt_arr = act.point_array_to_TColgp_PntArrayType(pnts.T)
+    assert(np.all(act.TColgp_PntArrayType_to_point_array(pt_arr) == pnts))
+
+    # Sequence of gp_Pnt
+    gp_pnts = [gp_Pnt(*pnt) for pnt in pnts.tolist()]
+    pt_arr = act.point_array_to_TColgp_PntArrayType(gp_pnts)
+    assert(np.all(act.TColgp_PntArrayType_to_point_array(pt_arr) == pnts))
+
+    # Three points are read one per row
+    pt_arr = act.point_array_to_TColgp_PntArrayType(pnts[:3])
+    assert(np.all(act.TColgp_PntArrayType_to_point_array(pt_arr) ==
+                  pnts[:3]))
+
+    with pytest.raises(ValueError):
+        act.point_array_to_TColgp_PntArrayType(rng.rand(20, 2))
+
+
+def test_bspline_to_arrays():
+    pnts = np.array([[0, 0, 0], [1, 0, 2], [2, 0, 3], [4, 0, 3], [5, 0, 5]])
+    spline = act.points_to_bspline(pnts)
+    poles, knots, degree, weights = act.bspline_to_arrays(spline)
+    assert(degree == spline.Degree())
+    assert(len(poles) == spline.NbPoles())
+    assert(weights is None)
+    copy = act.bspline_from_arrays(poles, knots, degree)
+    for u in np.linspace(spline.FirstParameter(), spline.LastParameter(), 7):
+        assert(copy.Value(u).Distance(spline.Value(u)) < 1e-12)
+
+
+def test_points_to_bspline_lsq():
+    t = np.linspace(0, np.pi, 41)
+    pnts = np.column_stack([np.cos(t), np.zeros_like(t), np.sin(t)])
+    spline = act.points_to_bspline_lsq(pnts, params=t / np.pi, deg=3,
+                                       n_poles=12)
+    assert(spline.Degree() == 3)
+    assert(spline.NbPoles() == 12)
+    # End points are interpolated, interior points approximated
+    start, end = spline.StartPoint(), spline.EndPoint()
+    assert(start.Distance(gp_Pnt(1, 0, 0)) < 1e-12)
+    assert(end.Distance(gp_Pnt(-1, 0, 0)) < 1e-12)
+    mid = spline.Value(0.5)
+    assert(mid.Distance(gp_Pnt(0, 0, 1)) < 1e-4)
+
+
 def test_project_curve_to_plane():
     # Projects a line of length 1 from above the XOY plane, and tests points
     # on the resulting line
@@ -142,3 +241,153 @@ def check_valid_object(handle):
     # This will raise an error if the object creation didn't work - don't need
     #  to add an assert statement here
     o = handle
+
+
+def test_skin_bspline_sections():
+    # Compatible sections: scaled and translated copies of one open curve
+    poles = np.array([[1, 0, 0], [0.5, 0, 0.1], [0, 0, 0], [0.5, 0, -0.1],
+                      [1, 0, -0.01]])
+    knots = np.array([0, 0, 0, 0, 0.5, 1, 1, 1, 1])
+    curves = [act.bspline_from_arrays(poles * c + [0, y, 0], knots, 3)
+              for y, c in [(0, 1), (1, 0.8), (2, 0.7), (3, 0.5)]]
+    assert(act.compatible_bspline_sections(curves))
+
+    direct = act.AddSurfaceLoft(curves, solid=False, direct=True)
+    thru = act.AddSurfaceLoft(curves, solid=False)
+    area_direct = act.CalculateSurfaceArea(direct)
+    area_thru = act.CalculateSurfaceArea(thru)
+    assert(abs(area_direct / area_thru - 1) < 1e-2)
+    Xd = np.array(act.ObjectsExtents(direct, mode='optimal'))
+    Xt = np.array(act.ObjectsExtents(thru, mode='optimal'))
+    assert(np.all(np.abs(Xd - Xt) < 1e-3))
+
+    # Incompatible sections fall back to ThruSections
+    other = act.bspline_from_arrays(poles + [0, 4, 0],
+                                    [0, 0, 0, 0, 0.3, 1, 1, 1, 1], 3)
+    assert(not act.compatible_bspline_sections(curves + [other]))
+    with pytest.raises(ValueError):
+        act.skin_bspline_sections(curves + [other])
+    assert(act.AddSurfaceLoft(curves + [other], solid=False,
+                              direct=True) is not None)
+
+
+def test_CutSections():
+    from airconics.liftingsurface import LiftingSurface
+    from airconics.examples.straight_wing import (
+        SimpleChordFunction, SimpleDihedralFunction, SimpleSweepFunction,
+        SimpleAirfoilFunction, SimpleTwistFunction)
+    wing = LiftingSurface(ChordFunct=SimpleChordFunction,
+                          DihedralFunct=SimpleDihedralFunction,
+                          SweepFunct=SimpleSweepFunction,
+                          AirfoilFunct=SimpleAirfoilFunction,
+                          TwistFunct=SimpleTwistFunction,
+                          ScaleFactor=5,
+                          ChordFactor=0.2)
+    stations = np.linspace(0.1, 0.9, 5)
+    cuts = act.CutSections(wing['Surface'], stations)
+    assert(cuts.leading_edge.shape == (5, 3))
+    # Rectangular wing of chord 1 with a 12% thick NACA0012 profile:
+    assert(np.allclose(cuts.chord, 1, atol=1e-2))
+    assert(np.allclose(cuts.thickness, 0.12, atol=5e-3))
+    assert(np.allclose(cuts.leading_edge[:, 1], cuts.y))
+    assert(np.all(cuts.trailing_edge[:, 0] > cuts.leading_edge[:, 0]))
+
+    # Repeated stations are cut once, and give the same result:
+    repeated = act.CutSections(wing['Surface'], [0.5, 0.3, 0.5])
+    assert(np.allclose(repeated.chord[[0, 2]], cuts.chord[2]))
+    assert(np.allclose(repeated.thickness[[0, 2]], cuts.thickness[2]))
+
+    # Consistent with the single station cut:
+    Section, HChord = act.CutSect(wing['Surface'], stations[2])
+    assert(abs(HChord.Value(HChord.FirstParameter()).X() -
+               cuts.trailing_edge[2, 0]) < 1e-2)
+
+
+def naca4_points(code, n=100):
+    """Closed NACA 4 digit contour of unit chord, from the upper trailing
+    edge around the leading edge to the lower trailing edge"""
+    m, p, t = int(code[0]) / 100., int(code[1]) / 10., int(code[2:]) / 100.
+    x = 0.5 * (1 - np.cos(np.linspace(0, np.pi, n)))
+    yt = 5 * t * (0.2969 * np.sqrt(x) - 0.126 * x - 0.3516 * x ** 2 +
+                  0.2843 * x ** 3 - 0.1036 * x ** 4)
+    fore = x < p
+    yc = np.where(fore, m / p ** 2 * (2 * p * x - x ** 2),
+                  m / (1 - p) ** 2 * (1 - 2 * p + 2 * p * x - x ** 2))
+    theta = np.arctan(np.where(fore, 2 * m / p ** 2 * (p - x),
+                               2 * m / (1 - p) ** 2 * (p - x)))
+    xu, zu = x - yt * np.sin(theta), yc + yt * np.cos(theta)
+    xl, zl = x + yt * np.sin(theta), yc - yt * np.cos(theta)
+    xs = np.hstack([xu[::-1], xl[1:]])
+    zs = np.hstack([zu[::-1], zl[1:]])
+    return np.column_stack([xs, np.zeros_like(xs), zs])
+
+
+def test_section_chord_thickness_cambered():
+    # The aft lower surface of a NACA 9412 lies above its chord line
+    points = naca4_points('9412') * 2 + [1, 0, 3]
+    LE, TE, chord, thickness = act.section_chord_thickness(points)
+    assert(chord == pytest.approx(2, rel=2e-3))
+    assert(thickness == pytest.approx(0.24, rel=1e-2))
+
+    # Edges of a section may be found in any order and direction
+    pieces = [points[120:], points[:60], points[59:121][::-1]]
+    contour = act._order_contour(pieces)
+    assert(act.section_chord_thickness(contour)[3] ==
+           pytest.approx(thickness))
+
+
+def test_CurveSampler():
+    from OCC.Core.gp import gp_Ax2, gp_Elips
+    from OCC.Core.GC import GC_MakeCircle
+    from OCC.Core.Geom import Geom_Ellipse
+    r = 2.
+    circle = GC_MakeCircle(gp_Ax2(gp_Pnt(0, 0, 0), gp_Dir(0, 0, 1)),
+                           r).Value()
+    sampler = act.CurveSampler(circle)
+    samples = sampler.sample(9, tangents=True, curvature=True)
+    assert(samples.points.shape == (9, 3))
+    assert(np.allclose(np.linalg.norm(samples.points, axis=1), r))
+    assert(np.allclose(np.sum(samples.points * samples.tangents, axis=1), 0))
+    assert(np.allclose(samples.curvature, 1 / r))
+    steps = np.linalg.norm(np.diff(samples.points, axis=0), axis=1)
+    assert(np.allclose(steps, steps[0]))
+
+    # The same points from an edge and a wire:
+    edge = act.make_edge(circle)
+    for curve in [edge, act.make_wire(edge)]:
+        points = act.sample_curve(curve, 9)
+        assert(np.allclose(np.linalg.norm(points, axis=1), r))
+
+    # Curvature spacing is densest where the ellipse is most curved
+    ellipse = Geom_Ellipse(gp_Elips(gp_Ax2(gp_Pnt(0, 0, 0),
+                                           gp_Dir(0, 0, 1)), 4, 1))
+    points = act.sample_curve(ellipse, 41, spacing='curvature')
+    steps = np.linalg.norm(np.diff(points, axis=0), axis=1)
+    assert(steps[0] < steps[10])
+
+    with pytest.raises(ValueError):
+        sampler.parameters(5, spacing='random')
+
+
+def test_curve_plane_intersections():
+    from OCC.Core.Geom import Geom_Plane
+    from OCC.Core.gp import gp_Pln
+    pnts = np.array([[0, 0, 0], [4, 1, 0], [-2, 2, 0], [3, 3, 0]])
+    curves = [act.points_to_BezierCurve(pnts),
+              act.bspline_from_arrays(pnts, [0, 0, 0, 0, 1, 1, 1, 1], 3)]
+    for curve in curves:
+        index, params, points = act.curve_plane_intersections(curve,
+                                                              [1., 10.])
+        assert(np.all(index == 0) and points.shape == (3, 3))
+
+        # Same points as GeomAPI_IntCS, which also returns every point
+        plane = Geom_Plane(gp_Pln(gp_Pnt(1, 0, 0), gp_Dir(1, 0, 0)))
+        P = act.points_from_intersection(plane, curve)
+        assert(len(P) == 3)
+        expected = np.array(sorted(pnt.Coord() for pnt in P))
+        assert(np.allclose(np.array(sorted(map(tuple, points))), expected,
+                           atol=1e-6))
+
+        first = act.points_at_coordinate(curve, [1., 10.])
+        assert(np.allclose(first[0], points[0]))
+        assert(np.all(np.isnan(first[1])))
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the CRM section tables
+"""
+import numpy as np
+import pytest
+from airconics import CRMfoil
+
+
+def test_CRM_tables_readonly():
+    with pytest.raises(ValueError):
+        CRMfoil.XROOT[0] = 2.
+    # Results are new arrays
+    x, z = CRMfoil.CRMlinear(0.)
+    x[0] = 2.
+    assert(CRMfoil.XROOT[0] == 1)
+
+
+def test_CRMlinearBatch():
+    Epsilons = np.linspace(0, 1, 11)
+    points = CRMfoil.CRMlinearBatch(Epsilons)
+    assert(points.shape == (11, len(CRMfoil.XROOT), 2))
+    for i, Epsilon in enumerate(Epsilons):
+        assert(np.all(points[i] ==
+                      np.column_stack(CRMfoil.CRMlinear(Epsilon))))
@@ -118,3 +118,16 @@ def test_AirconicsCollection_Write_SingleExport(create_AirconicsShape, filename_
 #        assert(f in outfiles_expect)
 
 
+def test_AirconicsShape_Extents(create_AirconicsShape):
+    shape = create_AirconicsShape
+    extents = shape.Extents()
+    assert(abs(extents[0] + 1) < 1e-5 and abs(extents[3] - 1) < 1e-5)
+    assert(shape.Extents() is extents)
+
+    # Changing a component invalidates the stored extents
+    shape['cube'] = BRepPrimAPI_MakeBox(gp_Pnt(0, 0, 0), 2, 1, 1).Shape()
+    assert(abs(shape.Extents()[3] - 2) < 1e-5)
+    del shape['cube']
+    assert(abs(shape.Extents()[3] - 1) < 1e-5)
+    vmin, vmax = shape.Extents(as_vec=True)
+    assert(abs(vmax.X() - 1) < 1e-5)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the numpy B-spline fitting utilities
+"""
+import numpy as np
+import pytest
+from airconics import bspline
+
+
+def test_basis_partition_of_unity():
+    knots = bspline.clamped_knots(10, 3)
+    N = bspline.basis_matrix(np.linspace(0, 1, 37), knots, 3)
+    assert(N.shape == (37, 10))
+    assert(np.all(N >= 0))
+    assert(np.allclose(N.sum(axis=1), 1))
+    # Clamped: the curve interpolates the end poles
+    assert(N[0, 0] == 1 and N[-1, -1] == 1)
+
+
+def test_knots_to_multiplicities():
+    knots = bspline.clamped_knots(8, 3)
+    unique_knots, mults = bspline.knots_to_multiplicities(knots)
+    assert(mults[0] == 4 and mults[-1] == 4)
+    assert(np.all(mults[1:-1] == 1))
+    assert(np.all(bspline.multiplicities_to_knots(unique_knots, mults) ==
+                  knots))
+
+
+@pytest.mark.parametrize("degree", [2, 3, 5])
+def test_fit_reproduces_spline(degree):
+    # A fit of points sampled from a B-spline with the same knots should
+    # recover its poles exactly
+    n_poles = 12
+    knots = bspline.clamped_knots(n_poles, degree)
+    poles = np.random.RandomState(0).rand(n_poles, 3)
+    params = np.linspace(0, 1, 40)
+    points = bspline.evaluate(poles, knots, degree, params)
+    fitted, fitted_knots = bspline.fit_poles(points, params, degree, n_poles)
+    assert(np.all(fitted_knots == knots))
+    assert(np.allclose(fitted, poles))
+
+
+def test_fit_operator_cached():
+    params = np.linspace(0, 1, 20)
+    knots1, operator1 = bspline.fit_operator(params, 3, 8)
+    knots2, operator2 = bspline.fit_operator(params.copy(), 3, 8)
+    assert(operator1 is operator2)
+    assert(not operator1.flags.writeable)
+
+
+def test_airfoil_parameters():
+    x = np.hstack([np.linspace(1, 0, 11), np.linspace(0, 1, 11)[1:]])
+    params = bspline.airfoil_parameters(x)
+    assert(params[0] == 0 and params[-1] == 1)
+    assert(params[10] == 0.5)
+    assert(np.all(np.diff(params) > 0))
+
+
+def test_interpolate_poles():
+    params = np.array([0, 0.1, 0.3, 0.6, 1.])
+    points = np.random.RandomState(0).rand(5, 7, 3)
+    poles, knots, degree = bspline.interpolate_poles(points, params, 3)
+    assert(degree == 3 and len(knots) == 5 + 3 + 1)
+    for j in range(7):
+        values = bspline.evaluate(poles[:, j], knots, degree, params)
+        assert(np.allclose(values, points[:, j]))
+
+    # Two points: linear interpolation
+    poles, knots, degree = bspline.interpolate_poles(points[:2], [0, 1], 3)
+    assert(degree == 1 and np.allclose(poles, points[:2]))
+
+
+def test_solve_coordinate():
+    knots = np.array([0, 0, 0, 0, 1, 1, 1, 1.])
+    # x goes 0 -> 2 -> 0.5 -> 3: three crossings of x = 1
+    poles = np.array([[0, 0, 0], [4, 1, 0], [-2, 2, 0], [3, 3, 0.]])
+    index, params = bspline.solve_coordinate(poles, knots, 3, [1., 10.])
+    assert(np.all(index == 0) and len(params) == 3)
+    assert(np.all(np.diff(params) > 0))
+    x = bspline.evaluate(poles, knots, 3, params)[:, 0]
+    assert(np.allclose(x, 1, atol=1e-12))
+
+    # Rational quarter circle, intersected with many stations at once
+    weights = np.array([1, np.sqrt(0.5), 1])
+    poles = np.array([[1, 0, 0], [1, 1, 0], [0, 1, 0.]])
+    knots = np.array([0, 0, 0, 1, 1, 1.])
+    X = np.linspace(0, 1, 11)
+    index, params = bspline.solve_coordinate(poles, knots, 2, X, weights)
+    assert(np.all(index == np.arange(11)))
+    points = bspline.evaluate(poles, knots, 2, params, weights)
+    assert(np.allclose(points[:, 0], X))
+    assert(np.allclose(np.linalg.norm(points, axis=1), 1))
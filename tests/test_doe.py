@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the design of experiments runner
+"""
+import os
+import csv
+from airconics import doe
+from airconics.base import AirconicsShape
+
+from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox
+import pytest
+
+
+def box_factory(Length, Width):
+    """A cheap part for testing: a unit height box, failing for negative
+    lengths"""
+    if Length <= 0:
+        raise ValueError("Length must be positive")
+    box = AirconicsShape(components={
+        'Box': BRepPrimAPI_MakeBox(Length, Width, 1).Shape()})
+    box.LSP_area = Length * Width
+    return box
+
+
+def crash_factory(Length, Width):
+    """Kills the worker process for one design"""
+    if Length == 2 and Width == 2:
+        os._exit(1)
+    return box_factory(Length, Width)
+
+
+def read_rows(filename):
+    with open(filename, 'r', newline='') as fin:
+        return list(csv.DictReader(fin))
+
+
+def test_parameter_grid():
+    designs = doe.parameter_grid(Length=[1, 2, 3], Width=[1, 2])
+    assert(len(designs) == 6)
+    assert(designs[0] == {'Length': 1, 'Width': 1})
+    assert(designs[-1] == {'Length': 3, 'Width': 2})
+
+
+def test_latin_hypercube():
+    designs = doe.latin_hypercube(10, seed=0, Length=(1, 2), Width=(0, 10))
+    assert(designs == doe.latin_hypercube(10, seed=0, Length=(1, 2),
+                                          Width=(0, 10)))
+    # One sample in each tenth of each range:
+    lengths = sorted(d['Length'] for d in designs)
+    widths = sorted(d['Width'] for d in designs)
+    for i in range(10):
+        assert(1 + i / 10. <= lengths[i] < 1 + (i + 1) / 10.)
+        assert(i <= widths[i] < i + 1)
+
+
+@pytest.mark.parametrize('max_workers', [0, 2])
+def test_run_doe(tmpdir, max_workers):
+    filename = str(tmpdir.join('doe.csv'))
+    designs = doe.parameter_grid(Length=[-1, 1, 2], Width=[1, 2])
+    status = doe.run_doe(box_factory, designs, filename,
+                         max_workers=max_workers, export=['step'])
+    assert(sorted(status.values()) == ['failed'] * 2 + ['ok'] * 4)
+
+    rows = read_rows(filename)
+    assert(len(rows) == 6)
+    for row in rows:
+        if float(row['Length']) > 0:
+            assert(row['status'] == 'ok')
+            assert(float(row['LSP_area']) ==
+                   float(row['Length']) * float(row['Width']))
+            assert(os.path.isfile(str(tmpdir.join(row['design_id'] +
+                                                  '.stp'))))
+        else:
+            assert(row['status'] == 'failed')
+            assert('ValueError' in row['error'])
+
+
+def test_run_doe_resume(tmpdir):
+    filename = str(tmpdir.join('doe.csv'))
+    designs = doe.parameter_grid(Length=[-1, 1, 2], Width=[1, 2])
+    doe.run_doe(box_factory, designs[:3], filename, max_workers=0)
+
+    # Simulate a crash while writing a row
+    with open(filename, 'a') as fout:
+        fout.write('0123456789abcdef')
+
+    status = doe.run_doe(box_factory, designs, filename, max_workers=0)
+    assert(len(status) == 6)
+    rows = read_rows(filename)
+    assert(len([row for row in rows if row['status']]) == 6)
+
+    # Failed designs are only rerun on request
+    status = doe.run_doe(box_factory, designs, filename, max_workers=0,
+                         retry_failed=True)
+    assert(len([row for row in read_rows(filename)
+                if row['status']]) == 8)
+
+    with pytest.raises(ValueError):
+        doe.run_doe(box_factory, designs, filename, metrics=['AR'])
+
+
+def test_run_doe_crash(tmpdir):
+    filename = str(tmpdir.join('doe.csv'))
+    designs = doe.parameter_grid(Length=[1, 2, 3, 4], Width=[1, 2, 3])
+    status = doe.run_doe(crash_factory, designs, filename, max_workers=2)
+    assert(status[doe.design_id({'Length': 2, 'Width': 2})] == 'crashed')
+    assert(sorted(status.values()) == ['crashed'] + ['ok'] * 11)
+    assert(len(read_rows(filename)) == 12)
@@ -5,7 +5,10 @@ Created on Thu Jan 14 15:10:50 2016
 @author: pchambers
 """
 import numpy as np
-from airconics.liftingsurface import LiftingSurface, airfoilfunct
+from airconics import liftingsurface
+from airconics.liftingsurface import (LiftingSurface, airfoilfunct,
+                                      SpanwiseTable, adaptive_station_indices,
+                                      planform_metrics)
 from airconics.primitives import Airfoil
 import airconics.AirCONICStools as act
 from airconics.examples.wing_example_transonic_airliner import *
@@ -138,6 +141,24 @@ def test_ProjectedArea(simple_wing):
     assert(np.abs(simple_wing.CalculateProjectedArea() - 5) < 1e-5)
 
 
+def test_ProjectedArea_methods():
+    """Tests that the polygon and loft projected areas agree for a swept,
+    tapered, twisted wing with dihedral"""
+    wing = LiftingSurface(ChordFunct=myChordFunctionAirliner,
+                          DihedralFunct=myDihedralFunctionAirliner,
+                          SweepFunct=mySweepAngleFunctionAirliner,
+                          AirfoilFunct=myAirfoilFunctionAirliner,
+                          TwistFunct=myTwistFunctionAirliner,
+                          ScaleFactor=44.56,
+                          SegmentNo=11)
+    polygon_area = wing.CalculateProjectedArea()
+    loft_area = wing.CalculateProjectedArea(method='loft')
+    assert(np.abs(polygon_area - loft_area) < 1e-6 * loft_area)
+    assert(polygon_area == wing.LSP_area)
+    with pytest.raises(ValueError):
+        wing.CalculateProjectedArea(method='trapezoid')
+
+
 def test_SemiSpan(simple_wing):
     """For a simple straight wing with AR 5 and chord 1, calculate the
     semi span and test the output is equal to the expected value"""
@@ -253,4 +274,296 @@ def test_update_ApexPoint():
 #     assert((Wing.ChordFunct(1) * Wing.ScaleFactor * Wing.ChordFactor) ==
 #         Winglet.ChordFunct(0) * Winglet.ScaleFactor * Winglet.ChordFactor)
 
-#     # Test the length of the LE curve is the correct spanfraction
\ No newline at end of file
+#     # Test the length of the LE curve is the correct spanfraction
+
+
+def test_DeferBuild(simple_wing):
+    """Tests that parameter changes inside DeferBuild rebuild the wing once"""
+    builds = []
+    Build = simple_wing.Build
+
+    def counted_Build():
+        builds.append(1)
+        Build()
+    simple_wing.Build = counted_Build
+
+    with simple_wing.DeferBuild():
+        simple_wing.ChordFactor = 0.25
+        simple_wing.NSegments = 5
+        simple_wing.SweepFunct = (lambda eps: np.ones_like(eps) * 15)
+        assert(len(builds) == 0)
+    assert(len(builds) == 1)
+    assert(simple_wing.RebuildsSaved == 2)
+    assert(len(simple_wing.Sections) == 6)
+
+    # Explicit deferred mode
+    simple_wing.defer_build = True
+    simple_wing.ChordFactor = 0.2
+    simple_wing.SweepFunct = SimpleSweepFunction
+    assert(len(builds) == 1)
+    assert(simple_wing.FlushBuild() == 1)
+    assert(len(builds) == 2)
+    assert(simple_wing.RebuildsSaved == 3)
+    assert(np.abs(simple_wing.LSP_area - 5 * 5 * 0.2) < 1e-5)
+
+
+def test_incremental_build(simple_wing):
+    """Tests that parameter changes only rerun the affected build stages, and
+    that changing the ScaleFactor rescales the existing geometry"""
+    wing = simple_wing
+    assert(set(wing.StageTimings) == set(wing.BuildStages))
+
+    LE_calls = []
+    GenerateLeadingEdge = wing.GenerateLeadingEdge
+
+    def counted_GenerateLeadingEdge():
+        LE_calls.append(1)
+        return GenerateLeadingEdge()
+    wing.GenerateLeadingEdge = counted_GenerateLeadingEdge
+
+    # The leading edge is reused for a change of chord:
+    wing.ChordFactor = 0.25
+    assert(len(LE_calls) == 0)
+    assert(np.abs(wing.LSP_area - 5 * 5 * 0.25) < 1e-5)
+
+    # A change of scale does not rebuild any stage:
+    timings = dict(wing.StageTimings)
+    wing.ScaleFactor = 10
+    assert(wing.StageTimings == timings)
+    assert(np.abs(wing.LSP_area - 10 * 10 * 0.25) < 1e-5)
+    assert(np.abs(wing.ActualSemiSpan - 10) < 1e-5)
+    assert(np.abs(wing.AR - 4) < 1e-5)
+    assert(np.abs(wing.RootChord - 2.5) < 1e-5)
+    wing.ScaleFactor = 5
+    assert(np.abs(wing.CalculateSemiSpan() - 5) < 1e-5)
+    assert(np.abs(wing.LSP_area - 5 * 5 * 0.25) < 1e-5)
+
+    wing.NSegments = 5
+    assert(len(LE_calls) == 1)
+    assert(len(wing.Sections) == 6)
+
+
+def test_ScaleFactor_from_zero():
+    """Tests that rescaling a built surface whose ScaleFactor is zero
+    rebuilds it instead of dividing by zero"""
+    wing = LiftingSurface(ChordFunct=SimpleChordFunction,
+                          DihedralFunct=SimpleDihedralFunction,
+                          SweepFunct=SimpleSweepFunction,
+                          AirfoilFunct=SimpleAirfoilFunction,
+                          TwistFunct=SimpleTwistFunction,
+                          ScaleFactor=1,
+                          ChordFactor=0.2,
+                          SegmentNo=5)
+    # e.g. left by a failed attempt to scale the components to zero:
+    wing._ScaleFactor = 0
+    wing.ScaleFactor = 5
+    assert(np.abs(wing.LSP_area - 5 * 5 * 0.2) < 1e-5)
+    assert(np.abs(wing.CalculateSemiSpan() - 5) < 1e-5)
+
+
+def test_parallel_sections():
+    """Tests that sections generated by worker processes match the serial
+    sections, and that unpicklable functions fall back to serial"""
+    kwargs = dict(ChordFunct=myChordFunctionAirliner,
+                  DihedralFunct=myDihedralFunctionAirliner,
+                  SweepFunct=mySweepAngleFunctionAirliner,
+                  AirfoilFunct=myAirfoilFunctionAirliner,
+                  TwistFunct=myTwistFunctionAirliner,
+                  SegmentNo=7)
+    serial = LiftingSurface(**kwargs)
+    parallel = LiftingSurface(max_workers=2, **kwargs)
+    assert(len(parallel.Sections) == len(serial.Sections))
+    for Af_p, Af_s in zip(parallel.Sections, serial.Sections):
+        for u in [0, 0.5, 1]:
+            assert(Af_p.Curve.Value(u).Distance(Af_s.Curve.Value(u)) < 1e-9)
+    assert(np.abs(parallel.LSP_area - serial.LSP_area) < 1e-9)
+
+    # The worker pool is reused by later builds
+    executor = liftingsurface._SECTION_EXECUTOR
+    assert(executor is not None)
+    parallel.Build()
+    assert(liftingsurface._SECTION_EXECUTOR is executor)
+
+    kwargs['TwistFunct'] = lambda eps: np.zeros_like(eps)
+    fallback = LiftingSurface(max_workers=2, **kwargs)
+    assert(len(fallback.Sections) == len(serial.Sections))
+
+    liftingsurface.shutdown_section_workers()
+    assert(liftingsurface._SECTION_EXECUTOR is None)
+
+
+def test_SpanwiseTable():
+    """Tests that spanwise functions are evaluated once, vectorised where
+    possible, and only reevaluated when changed"""
+    calls = []
+
+    def NumpyFunct(eps):
+        calls.append(eps)
+        return 2 * np.asarray(eps)
+
+    def ScalarFunct(eps):
+        calls.append(eps)
+        return 1 if eps < 0.5 else 2
+
+    table = SpanwiseTable()
+    Stations = np.linspace(0, 1, 5)
+    assert(table.Update(Stations, A=NumpyFunct, B=ScalarFunct) == ['A', 'B'])
+    assert(table.Vectorised == {'A': True, 'B': False})
+    # One call for NumpyFunct, one failed probe and 5 + 4 calls for
+    # ScalarFunct:
+    assert(len(calls) == 11)
+    assert(np.all(table.Values('A') == 2 * Stations))
+    assert(np.all(table.Values('B', midpoints=True) == [1, 1, 2, 2]))
+
+    assert(table.Update(Stations, A=NumpyFunct, B=ScalarFunct) == [])
+    assert(len(calls) == 11)
+    assert(table.Update(Stations, A=NumpyFunct, B=np.cos) == ['B'])
+    assert(np.allclose(table.Values('B'), np.cos(Stations)))
+
+
+def test_LiftingSurface_SpanwiseTable(simple_wing):
+    """Tests that the wing functions are tabulated at the sections"""
+    table = simple_wing.Table
+    assert(len(table.Stations) == len(simple_wing.Sections))
+    assert(table.Vectorised['Sweep'])
+    assert(not table.Vectorised['Chord'])
+    assert(np.all(table.Values('Chord') == 1))
+    assert(simple_wing.StageTimings['SpanwiseTable'] >= 0)
+
+
+def test_Build_reevaluates_functions():
+    """Tests that an explicit Build reevaluates spanwise functions whose
+    output depends on mutable state"""
+    chord = [1.]
+
+    def MutableChordFunct(Epsilon):
+        return chord[0] * np.ones_like(Epsilon)
+
+    wing = LiftingSurface(ChordFunct=MutableChordFunct,
+                          DihedralFunct=SimpleDihedralFunction,
+                          SweepFunct=SimpleSweepFunction,
+                          AirfoilFunct=SimpleAirfoilFunction,
+                          TwistFunct=SimpleTwistFunction,
+                          ScaleFactor=5,
+                          ChordFactor=0.2,
+                          SegmentNo=5)
+    assert(np.abs(wing.LSP_area - 5 * 5 * 0.2) < 1e-5)
+    chord[0] = 2.
+    wing.Build()
+    assert(np.all(wing.Table.Values('Chord') == 2))
+    assert(np.abs(wing.LSP_area - 5 * 5 * 0.4) < 1e-5)
+
+
+def test_adaptive_station_indices():
+    """Tests that stations are only placed where the sampled values deviate
+    from linear interpolation"""
+    Stations = np.linspace(0, 1, 101)
+    Straight = np.column_stack([Stations, 2 * Stations])
+    assert(np.all(adaptive_station_indices(Stations, Straight, 1e-6, 10) ==
+                  [0, 100]))
+
+    # A single kink at epsilon = 0.3
+    Kinked = np.column_stack([Stations, np.maximum(Stations - 0.3, 0)])
+    assert(np.all(adaptive_station_indices(Stations, Kinked, 1e-6, 10) ==
+                  [0, 30, 100]))
+
+    # The cap on the number of segments takes priority over the tolerance
+    Curved = Stations ** 2
+    assert(len(adaptive_station_indices(Stations, Curved, 1e-9, 4)) == 5)
+
+
+def test_adaptive_stations():
+    """Tests that a straight wing is lofted from its two end sections, and
+    that a cranked wing places sections at the cranks"""
+    wing = LiftingSurface(ChordFunct=SimpleChordFunction,
+                          DihedralFunct=SimpleDihedralFunction,
+                          SweepFunct=SimpleSweepFunction,
+                          AirfoilFunct=SimpleAirfoilFunction,
+                          TwistFunct=SimpleTwistFunction,
+                          ScaleFactor=5,
+                          ChordFactor=0.2,
+                          StationTolerance=1e-4)
+    assert(len(wing.Sections) == 2)
+    assert(np.abs(wing.LSP_area - 5 * 5 * 0.2) < 1e-5)
+
+    wing = LiftingSurface(ChordFunct=myChordFunctionAirliner,
+                          DihedralFunct=myDihedralFunctionAirliner,
+                          SweepFunct=mySweepAngleFunctionAirliner,
+                          AirfoilFunct=myAirfoilFunctionAirliner,
+                          TwistFunct=myTwistFunctionAirliner,
+                          SegmentNo=20,
+                          StationTolerance=3e-3)
+    assert(len(wing.Sections) <= 21)
+    assert(len(wing.Sections) == len(wing.Table.Stations))
+    # The sweep changes abruptly at epsilon = 0.1 and 0.2:
+    for crank in [0.1, 0.2]:
+        assert(np.min(np.abs(wing.Table.Stations - crank)) < 0.01)
+
+
+def test_planform_metrics():
+    """Tests the metrics of a trapezoidal planform against the analytical
+    values"""
+    eps = np.linspace(0, 1, 6)
+    LEPoints = np.column_stack([0.2 * eps, eps, np.zeros_like(eps)])
+    Chords = 1 - 0.5 * eps      # taper ratio 0.5
+    metrics = planform_metrics(LEPoints, Chords, np.zeros_like(eps),
+                               2 * Chords, ScaleFactor=2)
+    taper = 0.5
+    assert(np.abs(metrics['LSP_area'] - 0.75 * 4) < 1e-12)
+    assert(np.abs(metrics['ActualSemiSpan'] - 2) < 1e-12)
+    assert(np.abs(metrics['AR'] - 4. / 3) < 1e-12)
+    assert(np.abs(metrics['RootChord'] - 2) < 1e-12)
+    MAC = 2 * 2. / 3 * (1 + taper + taper ** 2) / (1 + taper)
+    assert(np.abs(metrics['MAC'] - MAC) < 1e-12)
+    assert(np.abs(metrics['SA'] - 2 * 0.75 * 4) < 1e-12)
+
+
+def test_CalculateMetrics():
+    """Tests that the geometry-free metrics match those of the built
+    surface"""
+    wing = LiftingSurface(ChordFunct=myChordFunctionAirliner,
+                          DihedralFunct=myDihedralFunctionAirliner,
+                          SweepFunct=mySweepAngleFunctionAirliner,
+                          AirfoilFunct=myAirfoilFunctionAirliner,
+                          TwistFunct=myTwistFunctionAirliner,
+                          ScaleFactor=44.56,
+                          SegmentNo=11)
+    metrics = wing.CalculateMetrics()
+    assert(np.abs(metrics['LSP_area'] - wing.LSP_area) < 1e-6 * wing.LSP_area)
+    assert(np.abs(metrics['RootChord'] - wing.RootChord) < 1e-9)
+    assert(np.abs(metrics['ActualSemiSpan'] - wing.ActualSemiSpan) <
+           1e-2 * wing.ActualSemiSpan)
+    assert(np.abs(metrics['AR'] - wing.AR) < 2e-2 * wing.AR)
+    assert(np.abs(metrics['SA'] - wing.SA) < 5e-2 * wing.SA)
+    assert(0 < metrics['MAC'] < metrics['RootChord'])
+
+    # The fast path assumes the airfoilfunct chord convention, which the
+    # airliner AirfoilFunct follows
+    fast = wing.CalculateMetrics(PerimeterRatio=2.1)
+    assert(np.abs(fast['LSP_area'] - wing.LSP_area) < 1e-6 * wing.LSP_area)
+    assert(np.abs(fast['MAC'] - metrics['MAC']) < 1e-9)
+
+
+def test_CalculateMetrics_keeps_built_state():
+    """Tests that CalculateMetrics does not change the leading edge or the
+    tabulated functions of a built surface"""
+    sweep = [0.]
+
+    def MutableSweepFunct(Epsilon):
+        return sweep[0] * np.ones_like(Epsilon)
+
+    wing = LiftingSurface(ChordFunct=SimpleChordFunction,
+                          DihedralFunct=SimpleDihedralFunction,
+                          SweepFunct=MutableSweepFunct,
+                          AirfoilFunct=SimpleAirfoilFunction,
+                          TwistFunct=SimpleTwistFunction,
+                          ScaleFactor=5,
+                          ChordFactor=0.2,
+                          SegmentNo=5)
+    LEPoints = wing.LEPoints.copy()
+    Sweeps = wing.Table.Values('Sweep').copy()
+    sweep[0] = 30.
+    metrics = wing.CalculateMetrics(PerimeterRatio=2.1)
+    assert(np.all(wing.LEPoints == LEPoints))
+    assert(np.all(wing.Table.Values('Sweep') == Sweeps))
+    assert(metrics['ActualSemiSpan'] < wing.ActualSemiSpan)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the persistent part cache
+"""
+import os
+import numpy as np
+from airconics import part_cache
+from airconics.part_cache import PartCache, stable_hash, UnhashableParameter
+from airconics.liftingsurface import LiftingSurface
+import airconics.AirCONICStools as act
+from airconics.examples.straight_wing import *
+
+from OCC.Core.gp import gp_Pnt
+from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox
+import pytest
+
+
+def make_scaled(k):
+    def Scaled(Epsilon):
+        return k * Epsilon
+    return Scaled
+
+
+def test_stable_hash():
+    assert(stable_hash(1, 'a', [1.5, 2]) == stable_hash(1, 'a', [1.5, 2]))
+    assert(stable_hash(1) != stable_hash(1.))
+    assert(stable_hash({'a': 1, 'b': 2}) == stable_hash({'b': 2, 'a': 1}))
+    assert(stable_hash(np.arange(3.)) != stable_hash(np.arange(3)))
+    assert(stable_hash(gp_Pnt(1, 2, 3)) == stable_hash(gp_Pnt(1, 2, 3)))
+
+    # Functions hash by code and closure values, not identity
+    assert(stable_hash(make_scaled(2)) == stable_hash(make_scaled(2)))
+    assert(stable_hash(make_scaled(2)) != stable_hash(make_scaled(3)))
+    assert(stable_hash(SimpleChordFunction) !=
+           stable_hash(SimpleTwistFunction))
+
+    with pytest.raises(UnhashableParameter):
+        stable_hash(object())
+
+
+def test_put_get(tmpdir):
+    cache = PartCache(directory=str(tmpdir), maxsize=2 ** 30, enabled=True)
+    box = BRepPrimAPI_MakeBox(1, 2, 3).Shape()
+    cache.put('abc', {'Box': box, 'Empty': None},
+              {'Area': 2.5, 'Point': gp_Pnt(1, 2, 3),
+               'Array': np.arange(3.)})
+    components, outputs = cache.get('abc')
+    assert(components['Empty'] is None)
+    xmin, ymin, zmin, xmax, ymax, zmax = act.ObjectsExtents(components['Box'])
+    assert(np.allclose([xmax - xmin, ymax - ymin, zmax - zmin], [1, 2, 3],
+                       atol=1e-5))
+    assert(outputs['Area'] == 2.5)
+    assert(outputs['Point'].IsEqual(gp_Pnt(1, 2, 3), 1e-12))
+    assert(np.array_equal(outputs['Array'], np.arange(3.)))
+
+    assert(cache.get('missing') is None)
+    info = cache.info()
+    assert(info.hits == 1 and info.misses == 1 and info.currsize > 0)
+
+
+def test_eviction(tmpdir):
+    cache = PartCache(directory=str(tmpdir), maxsize=2 ** 30, enabled=True)
+    box = BRepPrimAPI_MakeBox(1, 1, 1).Shape()
+    cache.put('first', {'Box': box}, {})
+    size = cache.info().currsize
+
+    # Room for two entries only: the least recently used is evicted
+    cache.maxsize = int(2.5 * size)
+    manifest = os.path.join(str(tmpdir), 'first', part_cache.MANIFEST_FILENAME)
+    os.utime(manifest, (0, 0))
+    cache.put('second', {'Box': box}, {})
+    assert(cache.get('first') is not None)
+    cache.put('third', {'Box': box}, {})
+    assert(cache.get('second') is None)
+    assert(cache.get('first') is not None)
+    assert(cache.evictions == 1)
+
+    cache.clear()
+    assert(cache.info().currsize == 0)
+
+
+def test_cached_LiftingSurface(tmpdir, monkeypatch):
+    cache = PartCache(directory=str(tmpdir), maxsize=2 ** 30, enabled=True)
+    monkeypatch.setattr(part_cache, 'PART_CACHE', cache)
+    kwargs = dict(ChordFunct=SimpleChordFunction,
+                  DihedralFunct=SimpleDihedralFunction,
+                  SweepFunct=SimpleSweepFunction,
+                  AirfoilFunct=SimpleAirfoilFunction,
+                  TwistFunct=SimpleTwistFunction,
+                  ScaleFactor=5,
+                  ChordFactor=0.2,
+                  SegmentNo=11)
+    wing = LiftingSurface(**kwargs)
+    assert(cache.hits == 0 and cache.misses == 1)
+
+    cached = LiftingSurface(**kwargs)
+    assert(cache.hits == 1)
+    assert(cached.LSP_area == pytest.approx(wing.LSP_area))
+    assert(cached.RootChord == pytest.approx(wing.RootChord))
+    assert(set(cached.keys()) == set(wing.keys()))
+    assert(len(cached.Sections) == len(wing.Sections))
+
+    # Parameter changes still rebuild
+    cached.ChordFactor = 0.3
+    assert(cache.misses == 2)
+    assert(cached.LSP_area == pytest.approx(1.5 * wing.LSP_area, rel=1e-3))
+
+
+def test_key_global_settings(monkeypatch):
+    from airconics.primitives import Airfoil
+    from airconics import selig_database
+    cache = PartCache(enabled=True)
+    wing = LiftingSurface(ChordFunct=SimpleChordFunction,
+                          DihedralFunct=SimpleDihedralFunction,
+                          SweepFunct=SimpleSweepFunction,
+                          AirfoilFunct=SimpleAirfoilFunction,
+                          TwistFunct=SimpleTwistFunction,
+                          construct_geometry=False)
+    key = cache.key(wing)
+    assert(cache.key(wing) == key)
+
+    # Class level Airfoil fit settings and Selig data change the key
+    monkeypatch.setattr(Airfoil, 'FitMethod', 'lsq')
+    assert(cache.key(wing) != key)
+    monkeypatch.undo()
+    assert(cache.key(wing) == key)
+
+    monkeypatch.setattr(selig_database, 'data_signature', lambda: '0:0:0')
+    assert(cache.key(wing) != key)
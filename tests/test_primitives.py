@@ -7,9 +7,15 @@ Tests for airconics airfoil primitives.
 @author: pchambers
 """
 import pytest
-from airconics.primitives import Airfoil
+from airconics.primitives import (Airfoil, FITTED_CURVE_CACHE,
+                                  FittedCurveCache, NACA4digitPntsBatch,
+                                  ResampleAirfoilPoints,
+                                  InterpolateSectionsBatch, FitSectionsBatch)
+from airconics import bspline
 import numpy as np
 from OCC.Core.Geom import Geom_BSplineCurve
+from OCC.Core.gp import gp_Pnt
+from OCC.Core.GeomAPI import GeomAPI_ProjectPointOnCurve
 
 
 @pytest.fixture(params=[
@@ -200,6 +206,181 @@ def test_Selig_Airfoil_Assertions():
         Af = Airfoil(SeligProfile='SomeImaginaryAirfoil')
 
 
+def test_fitted_curve_cache():
+    FITTED_CURVE_CACHE.clear()
+    Af1 = Airfoil(Naca4Profile='2412')
+    Af2 = Airfoil(LeadingEdgePoint=[1., 1., 1.], ChordLength=2,
+                  Naca4Profile='2412')
+    # Curves are fitted on first access
+    assert(FITTED_CURVE_CACHE.info().misses == 0)
+    Af1.Curve, Af2.Curve
+    info = FITTED_CURVE_CACHE.info()
+    assert(info.misses == 1)
+    assert(info.hits == 1)
+    assert(info.currsize == 1)
+
+    # The cached curve is copied: transforming Af2 must not move Af1
+    start_pt = get_Airfoil_startpoint(Af1)
+    assert(np.all(np.abs(start_pt - np.array([1., 0., 0.00126])) < 1e-5))
+    assert(np.all(np.abs(Af2.points - Af1.points) < 1e-12))
+
+    # Flipped camber is a different profile
+    Af3 = Airfoil(Naca4Profile='-2412')
+    Af3.Curve
+    assert(FITTED_CURVE_CACHE.info().misses == 2)
+    assert(not np.allclose(Af3.points, Af1.points))
+
+
+def test_Airfoil_lazy_geometry():
+    Af = Airfoil(Naca4Profile='0012')
+    Curve = Af.Curve
+    assert(Af.Curve is Curve)
+    # Changing any transform attribute rebuilds the curve and chord line
+    Af.LE = [1., 2., 3.]
+    Af.ChordLength = 2
+    assert(Af.Curve is not Curve)
+    start_pt = get_Airfoil_startpoint(Af)
+    assert(np.all(np.abs(start_pt - np.array([3., 2., 3.])) < 1e-2))
+    ChordEnd = Af.ChordLine.EndPoint()
+    assert(np.allclose([ChordEnd.X(), ChordEnd.Y(), ChordEnd.Z()],
+                       [3., 2., 3.]))
+
+    # So does setting new points
+    Curve = Af.Curve
+    Af.points = Airfoil(Naca4Profile='2412', PointsOnly=True).points
+    assert(Af.Curve is not Curve)
+
+
+def test_Airfoil_PointsOnly():
+    FITTED_CURVE_CACHE.clear()
+    Af1 = Airfoil(Naca4Profile='0012', PointsOnly=True)
+    Af2 = Airfoil(Naca4Profile='2412', PointsOnly=True)
+    assert(Af1.Curve is None)
+    assert(Af1.points.shape == (95, 2))
+    Af = Airfoil(InterpProfile=True, Epsilon=0.5, Af1=Af1, Af2=Af2,
+                 PointsOnly=True)
+    assert(Af.Curve is None)
+    assert(np.allclose(Af.points, (Af1.points + Af2.points) / 2.))
+    assert(FITTED_CURVE_CACHE.info().misses == 0)
+
+
+def test_fitted_curve_cache_eviction():
+    cache = FittedCurveCache(maxsize=2)
+    Af = Airfoil(Naca4Profile='0012')
+    for i in range(3):
+        cache.put(('profile', i), Af.points, Af.Curve)
+    info = cache.info()
+    assert(info.evictions == 1)
+    assert(info.currsize == 2)
+    assert(cache.get(('profile', 0)) is None)
+    points, curve = cache.get(('profile', 2))
+    assert(type(curve) == Geom_BSplineCurve)
+
+
+@pytest.mark.parametrize("EnforceSharpTE", [False, True])
+def test_NACA4digitPntsBatch(EnforceSharpTE):
+    # The batch generator should match the points of individual Airfoils
+    profiles = ['0012', '2412', '-5310', '6425']
+    cambers = [0, 2, -5, 6]
+    locations = [0, 4, 3, 4]
+    thicknesses = [12, 12, 10, 25]
+    batch = NACA4digitPntsBatch(cambers, locations, thicknesses,
+                                EnforceSharpTE=EnforceSharpTE)
+    assert(batch.shape == (4, 95, 2))
+    for i, profile in enumerate(profiles):
+        Af = Airfoil(Naca4Profile=profile, EnforceSharpTE=EnforceSharpTE)
+        assert(np.all(np.abs(batch[i] - Af.points) < 1e-12))
+
+
+@pytest.mark.parametrize("profile", [{'Naca4Profile': '2412'},
+                                     {'SeligProfile': 'b707a'},
+                                     {'CRM_Epsilon': 0.3}])
+def test_Airfoil_lsq_fit(profile):
+    Af = Airfoil(FitMethod='lsq', **profile)
+    ref = Airfoil(**profile)
+    assert(Af.FitMethod == 'lsq' and ref.FitMethod == 'approximate')
+    # The least-squares curve passes close to the airfoil points
+    N = len(Af.points)
+    assert(Af.Curve.NbPoles() == N // 2)
+    for x, z in Af.points[::5]:
+        Pnt = gp_Pnt(x, 0, z)
+        Proj = GeomAPI_ProjectPointOnCurve(Pnt, Af.Curve)
+        assert(Proj.LowerDistance() < 2e-3)
+
+
+def test_Airfoil_lsq_fit_shared_knots():
+    Af1 = Airfoil(Naca4Profile='0012', FitMethod='lsq')
+    Af2 = Airfoil(Naca4Profile='2412', FitMethod='lsq')
+    assert(Af1.Curve.NbKnots() == Af2.Curve.NbKnots())
+    for i in range(1, Af1.Curve.NbKnots() + 1):
+        assert(Af1.Curve.Knot(i) == Af2.Curve.Knot(i))
+
+
+def test_AddLinear2_normalisation():
+    Af1 = Airfoil(Naca4Profile='0012', PointsOnly=True)
+    Af2 = Airfoil(Naca4Profile='4412', PointsOnly=True)
+    Af = Airfoil(InterpProfile=True, Epsilon=0.25, Af1=Af1, Af2=Af2,
+                 Eps1=0, Eps2=0.5, PointsOnly=True)
+    # Both x and z are interpolated half way between Af1 and Af2
+    assert(np.allclose(Af.points, (Af1.points + Af2.points) / 2.))
+
+
+def test_ResampleAirfoilPoints():
+    Af = Airfoil(Naca4Profile='0012', PointsOnly=True)
+    points, params = ResampleAirfoilPoints(Af.points, 201)
+    assert(points.shape == (201, 2))
+    assert(np.allclose(points[[0, -1]], Af.points[[0, -1]]))
+    # The resampled points lie on the NACA 0012 thickness distribution
+    x = np.clip(points[:, 0], 0, 1)
+    zt = 0.6 * (0.2969 * np.sqrt(x) - 0.1260 * x - 0.3516 * x ** 2 +
+                0.2843 * x ** 3 - 0.1015 * x ** 4)
+    assert(np.all(np.abs(np.abs(points[:, 1]) - zt) < 1e-4))
+
+
+def test_InterpolateSectionsBatch():
+    Root = Airfoil(Naca4Profile='2412', PointsOnly=True)
+    Kink = Airfoil(Naca4Profile='0012', PointsOnly=True)
+    Tip = Airfoil(SeligProfile='b707a', PointsOnly=True)
+    NPoints = len(Tip.points)
+    Epsilons = np.linspace(0, 1, 9)
+    points, params = InterpolateSectionsBatch(Epsilons, [Root, Kink, Tip],
+                                              [0, 0.5, 1])
+    assert(points.shape == (9, NPoints, 2))
+    assert(params.shape == (NPoints,))
+    # Anchor sections are reproduced, intermediate sections are linear
+    assert(np.all(points[4] ==
+                  ResampleAirfoilPoints(Kink.points, NPoints)[0]))
+    assert(np.allclose(points[2], (points[0] + points[4]) / 2.))
+    assert(np.allclose(points[6], (points[4] + points[8]) / 2.))
+
+    # All sections are fitted with one basis
+    poles, knots = FitSectionsBatch(points, params)
+    assert(poles.shape == (9, NPoints // 2, 2))
+    for i in range(9):
+        fitted = bspline.evaluate(poles[i], knots, 3, params)
+        assert(np.all(np.abs(fitted - points[i]) < 2e-3))
+
+
+def test_Airfoil_placement():
+    Af = Airfoil(LeadingEdgePoint=[1., 2., 3.], ChordLength=2.5,
+                 Rotation=10, Twist=5, Naca4Profile='2412')
+    matrix = Af.PlacementMatrix()
+    # The composed transformation is the same as the numpy matrix
+    trsf = Af.PlacementTrsf()
+    for i in range(3):
+        for j in range(4):
+            assert(np.abs(trsf.Value(i + 1, j + 1) - matrix[i, j]) < 1e-12)
+
+    ChordEnd = Af.ChordLine.EndPoint()
+    assert(np.allclose([ChordEnd.X(), ChordEnd.Y(), ChordEnd.Z()],
+                       matrix[:3, :3].dot([1., 0., 0.]) + matrix[:3, 3]))
+
+    # The placed points lie on the placed curve
+    for pnt in Af.PlacedPoints()[::10]:
+        Proj = GeomAPI_ProjectPointOnCurve(gp_Pnt(*pnt), Af.Curve)
+        assert(Proj.LowerDistance() < 1e-3 * Af.ChordLength)
+
+
 # END OF TESTS
 
 # ---------------------------------------------------------------------------
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the build timing spans
+"""
+import json
+from airconics import profiling
+from airconics.liftingsurface import LiftingSurface
+from airconics.examples.straight_wing import *
+
+
+@profiling.timed()
+def outer():
+    inner()
+    inner()
+
+
+@profiling.timed('Inner')
+def inner():
+    with profiling.span('Innermost'):
+        pass
+
+
+def test_disabled():
+    assert(not profiling.PROFILER.enabled)
+    assert(profiling.span('a') is profiling.NULL_SPAN)
+    profiling.reset()
+    outer()
+    assert(len(profiling.PROFILER.root.children) == 0)
+
+
+def test_span_tree():
+    with profiling.profile() as profiler:
+        outer()
+        outer()
+    assert(not profiling.PROFILER.enabled)
+
+    node = profiler.root.children['outer']
+    assert(node.count == 2)
+    assert(node.children['Inner'].count == 4)
+    assert(node.children['Inner'].children['Innermost'].count == 4)
+    assert(node.wall >= node.children['Inner'].wall)
+
+    tree = json.loads(profiler.to_json())
+    assert(tree['children'][0]['name'] == 'outer')
+    assert(tree['children'][0]['children'][0]['count'] == 4)
+
+    lines = profiler.to_folded().split()
+    assert('root;outer;Inner;Innermost' in lines)
+
+
+def test_LiftingSurface_spans():
+    with profiling.profile() as profiler:
+        LiftingSurface(ChordFunct=SimpleChordFunction,
+                       DihedralFunct=SimpleDihedralFunction,
+                       SweepFunct=SimpleSweepFunction,
+                       AirfoilFunct=SimpleAirfoilFunction,
+                       TwistFunct=SimpleTwistFunction)
+    build = profiler.root.children['LiftingSurface.Build']
+    assert(build.count == 1)
+    assert(set(LiftingSurface.BuildStages) <= set(build.children))
+    assert('AddSurfaceLoft' in build.children['Loft'].children)
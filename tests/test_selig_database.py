@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the precompiled Selig airfoil coordinate database
+"""
+import os
+import numpy as np
+import pytest
+from pkg_resources import resource_string
+from airconics import selig_database
+
+
+def test_profile_points_match_text_file():
+    # The compiled store should give exactly the points of the text parser
+    data = resource_string('airconics.coord_seligFmt', 'b707a.dat')
+    expected = selig_database.parse_selig_data(data)
+    points = selig_database.profile_points('b707a')
+    assert(points.shape == expected.shape)
+    assert(np.all(points == expected))
+
+
+def test_profile_points_readonly():
+    points = selig_database.profile_points('goe613')
+    with pytest.raises(ValueError):
+        points[0, 0] = 10.
+
+
+def test_profile_points_missing():
+    assert(selig_database.profile_points('SomeImaginaryAirfoil') is None)
+
+
+def test_build_database(tmpdir):
+    outdir = tmpdir.strpath
+    assert(selig_database.build_database(outdir) == outdir)
+    assert(os.path.isfile(os.path.join(outdir,
+                                       selig_database.COORDS_FILENAME)))
+
+    db = selig_database.SeligDatabase(outdir)
+    assert('b707a' in db)
+    assert(db.signature == selig_database.data_signature())
+    assert(len(db) + len(db.skipped) ==
+           len([f for f in os.listdir(selig_database.selig_directory())
+                if f.endswith('.dat')]))
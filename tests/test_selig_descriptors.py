@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the Selig airfoil descriptor index
+"""
+import numpy as np
+import pytest
+from airconics import selig_descriptors
+from airconics.primitives import NACA4digitPntsBatch
+
+
+def test_profile_descriptors_naca():
+    points = NACA4digitPntsBatch(2, 4, 12, NCosPoints=100,
+                                 NLinPoints=100)[0]
+    descriptors = dict(zip(selig_descriptors.DESCRIPTORS,
+                           selig_descriptors.profile_descriptors(points)))
+    assert(np.abs(descriptors['thickness'] - 0.12) < 1e-3)
+    assert(np.abs(descriptors['thickness_loc'] - 0.3) < 0.02)
+    # Camber is measured midway between the surfaces at the same x, so is
+    # only close to the NACA mean line
+    assert(np.abs(descriptors['camber'] - 0.02) < 2e-3)
+    assert(np.abs(descriptors['camber_loc'] - 0.4) < 0.01)
+    # NACA 4 digit leading edge radius is 1.1019 t^2
+    assert(np.abs(descriptors['le_radius'] / (1.1019 * 0.12 ** 2) - 1) < 0.1)
+    assert(np.abs(descriptors['te_thickness'] - 0.00252) < 1e-4)
+    assert(np.abs(descriptors['area'] - 0.0822) < 1e-3)
+
+
+def test_descriptor_index_query():
+    index = selig_descriptors.load_descriptor_index()
+    assert(len(index) > 1000)
+    # A profile is its own nearest neighbour
+    targets = index.descriptors('goe613')
+    name, distance = index.query(k=3, **targets)[0]
+    assert(name == 'goe613' and distance == 0)
+
+    results = index.query(k=10, thickness=0.12, camber=0.02, camber_loc=0.4)
+    assert(len(results) == 10)
+    distances = [distance for name, distance in results]
+    assert(distances == sorted(distances))
+    assert(selig_descriptors.nearest_profiles(
+        k=10, thickness=0.12, camber=0.02, camber_loc=0.4) ==
+        [name for name, distance in results])
+
+    with pytest.raises(ValueError):
+        index.query(chord=1)
+    with pytest.raises(ValueError):
+        index.query(k=0, thickness=0.12)
+
+
+def test_descriptor_index_cached():
+    index = selig_descriptors.load_descriptor_index()
+    assert(selig_descriptors.load_descriptor_index() is index)